@@ -0,0 +1,195 @@
+"""Compact binary format of editable annotations.
+
+Annotations are saved to a sidecar file next to the mask,
+so reopened image has the same editable items.
+
+File layout (little endian)::
+
+    magic b'DLMA', version u16, number of records u32
+    record: kind u8, color u32 (ARGB), radius f32, number of parts u32
+    part: number of points u32, points f32[2 * number of points]
+
+Parts are subpaths of stroke centerline, points of polygon,
+rings of simplified stroke outline or pairs of first and last + 1
+pixel of filled runs.
+"""
+from PyQt5 import QtGui, QtWidgets
+from PyQt5.QtCore import Qt
+
+import os
+import struct
+import typing
+
+import numpy as np
+
+from .BrushTool import RegionItem, StrokeItem
+from .FillTool import FillItem
+from .PolygonTool import PolygonItem
+from .Geometry import arrayToPolygon, outlineRings, polygonToArray, ringsToPath
+
+
+MAGIC = b'DLMA'
+VERSION = 3
+SUFFIX = '.dlm'
+
+STROKE = 1
+POLYGON = 2
+REGION = 3
+FILL = 4
+
+_HEADER = struct.Struct('<4sHI')
+_RECORD = struct.Struct('<BIfI')
+_PART = struct.Struct('<I')
+
+
+def sidecarPath(mask_path: str) -> str:
+    """Return path of annotations file for mask.
+
+    :param mask_path: path of saved mask
+    """
+    return os.path.splitext(mask_path)[0] + SUFFIX
+
+
+def isAnnotation(item: QtWidgets.QGraphicsItem) -> bool:
+    """Check if item is markup item, which can be saved.
+
+    :param item: item placed on scene
+    """
+    return item.parentItem() is None and isinstance(
+        item, (StrokeItem, RegionItem, FillItem, QtWidgets.QGraphicsPolygonItem))
+
+
+def annotationItems(scene: QtWidgets.QGraphicsScene) -> typing.List[QtWidgets.QGraphicsItem]:
+    """Return items, which can be saved, in painting order.
+
+    :param scene: scene with markup items
+    """
+    return [item for item in scene.items(Qt.AscendingOrder) if isAnnotation(item)]
+
+
+def _geometry(item: QtWidgets.QGraphicsItem) -> typing.Tuple[int, QtGui.QColor, float, object]:
+    """Return kind, color, radius and copy of path, polygon or runs of item."""
+    if isinstance(item, StrokeItem):
+        return STROKE, QtGui.QColor(item.color), item.radius, QtGui.QPainterPath(item.path())
+    if isinstance(item, RegionItem):
+        return REGION, QtGui.QColor(item.color), 0., item.path()
+    if isinstance(item, FillItem):
+        # runs are replaced, not changed in place
+        return FILL, QtGui.QColor(item.color), 0., item.runs
+    return POLYGON, QtGui.QColor(item.brush().color()), 0., item.polygon()
+
+
+def _parts(kind: int, shape: object) -> list:
+    """Return list of point arrays of item geometry."""
+    if kind == STROKE:
+        return [polygonToArray(p) for p in shape.toSubpathPolygons()]
+    if kind == REGION:
+        return [polygonToArray(p) for p in outlineRings(shape)]
+    if kind == FILL:
+        rows, starts, ends = shape.T
+        return [np.stack([starts, rows, ends, rows], axis=1).reshape(-1, 2)]
+    return [polygonToArray(shape)]
+
+
+def copyGeometry(items: typing.Iterable[QtWidgets.QGraphicsItem]) -> list:
+    """Copy geometry of items, so it can be encoded in another thread.
+
+    Paths and polygons are implicitly shared, so copying is cheap.
+
+    :param items: StrokeItems, RegionItems, FillItems and QGraphicsPolygonItems
+    """
+    return [_geometry(item) for item in items]
+
+
+def dumpsGeometry(geometry: list) -> bytes:
+    """Encode geometry copied by :func:`copyGeometry`.
+
+    :param geometry: geometry of items
+    """
+    chunks = []
+    for kind, color, radius, shape in geometry:
+        parts = _parts(kind, shape)
+        chunks.append(_RECORD.pack(kind, color.rgba(), radius, len(parts)))
+        for points in parts:
+            chunks.append(_PART.pack(len(points)))
+            chunks.append(points.astype('<f4').tobytes())
+    return _HEADER.pack(MAGIC, VERSION, len(geometry)) + b''.join(chunks)
+
+
+def dumps(items: typing.Iterable[QtWidgets.QGraphicsItem]) -> bytes:
+    """Encode items.
+
+    :param items: StrokeItems, RegionItems, FillItems and QGraphicsPolygonItems
+    """
+    return dumpsGeometry(copyGeometry(items))
+
+
+def loads(
+        data: bytes,
+        scene: QtWidgets.QGraphicsScene = None) -> typing.List[QtWidgets.QGraphicsItem]:
+    """Decode items.
+
+    :param data: encoded items
+    :param scene: scene, which created items are added to
+    """
+    magic, version, count = _HEADER.unpack_from(data)
+    if magic != MAGIC or version > VERSION:
+        raise ValueError("Unsupported annotations format")
+    offset = _HEADER.size
+    items = []
+    for _ in range(count):
+        kind, rgba, radius, nparts = _RECORD.unpack_from(data, offset)
+        offset += _RECORD.size
+        parts = []
+        for _ in range(nparts):
+            npoints, = _PART.unpack_from(data, offset)
+            offset += _PART.size
+            points = np.frombuffer(data, '<f4', 2 * npoints, offset)
+            offset += 8 * npoints
+            parts.append(arrayToPolygon(points.reshape(-1, 2)))
+        color = QtGui.QColor.fromRgba(rgba)
+        items.append(_createItem(kind, color, radius, parts))
+    if scene is not None:
+        for item in items:
+            scene.addItem(item)
+    return items
+
+
+def _createItem(
+        kind: int,
+        color: QtGui.QColor,
+        radius: float,
+        parts: typing.List[QtGui.QPolygonF]) -> QtWidgets.QGraphicsItem:
+    if kind == STROKE:
+        item = StrokeItem(parts[0].first(), radius, color)
+        for polygon in parts:
+            item.addPolygon(polygon)
+        return item
+    if kind == REGION:
+        return RegionItem(ringsToPath(parts), color)
+    if kind == POLYGON:
+        return PolygonItem(parts[0], color)
+    if kind == FILL:
+        points = polygonToArray(parts[0]).reshape(-1, 4)
+        return FillItem(np.stack([points[:, 1], points[:, 0], points[:, 2]], axis=1), color)
+    raise ValueError(f"Unknown annotation kind {kind}")
+
+
+def save(path: str, items: typing.Iterable[QtWidgets.QGraphicsItem]):
+    """Write items to file.
+
+    :param path: output file path
+    :param items: StrokeItems, RegionItems, FillItems and QGraphicsPolygonItems
+    """
+    with open(path, 'wb') as f:
+        f.write(dumps(items))
+
+
+def load(path: str, scene: QtWidgets.QGraphicsScene = None) -> typing.List[QtWidgets.QGraphicsItem]:
+    """Read items from file.
+
+    :param path: annotations file path
+    :param scene: scene, which created items are added to
+    """
+    with open(path, 'rb') as f:
+        return loads(f.read(), scene)
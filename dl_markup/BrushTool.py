@@ -2,6 +2,12 @@ from PyQt5 import QtGui, QtCore, QtWidgets
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QCursor, QPixmap, QPainter
 
+from collections import OrderedDict
+
+from .Geometry import strokeOutline
+
+from typing import List
+
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from .Canvas import Canvas
@@ -76,24 +82,23 @@ class CylinderItem(QtWidgets.QGraphicsItem):
             item.setBrush(self.__brush)
 
     def __compute_bounding_rect(self):
-        x = [
-            self.__begin.x() - self.__radius,
-            self.__begin.x() + self.__radius,
-            self.__end.x() - self.__radius,
-            self.__end.x() + self.__radius,
-        ]
-        y = [
-            self.__begin.y() - self.__radius,
-            self.__begin.y() + self.__radius,
-            self.__end.y() - self.__radius,
-            self.__end.y() + self.__radius,
-        ]
-        self.__bounding_rect = QtCore.QRectF(min(x), min(y), max(x), max(y))
+        """Cache exact bounds and outline of circles and rectangle."""
+        shape = QtGui.QPainterPath()
+        shape.setFillRule(Qt.WindingFill)
+        for item in (self.__ellipse_1, self.__ellipse_2, self.__polygon):
+            shape.addPath(item.shape())
+        self.__shape = shape
+        # shapes of parts include their outlines
+        self.__bounding_rect = shape.boundingRect()
 
     def boundingRect(self) -> QtCore.QRectF:
         """Create bounding box for current item."""
         return self.__bounding_rect
 
+    def shape(self) -> QtGui.QPainterPath:
+        """Return area covered by circles and rectangle."""
+        return self.__shape
+
     def paint(
             self,
             painter: QtGui.QPainter,
@@ -104,12 +109,214 @@ class CylinderItem(QtWidgets.QGraphicsItem):
             item.paint(painter, option, widget)
 
 
+class StrokeItem(QtWidgets.QGraphicsItem):
+    """Drawing item that represents one brush stroke.
+
+    Accumulates mouse positions from press to release into a single
+    QPainterPath, which is stroked with round caps and joins, so the
+    stroke looks like a chain of CylinderItems but costs one item.
+    """
+
+    def __init__(
+            self,
+            begin: QtCore.QPointF,
+            radius: float,
+            color: QtGui.QColor,
+            *args,
+            **kwargs):
+        """Initialize StrokeItem.
+
+        :param begin: first point of the stroke
+        :param radius: half of the line width
+        :param color: color of the stroke
+        """
+        super().__init__(*args, **kwargs)
+        self.__radius = radius
+        self.__color = QtGui.QColor(color)
+        self.__pen = QtGui.QPen(
+            self.__color,
+            2 * radius,
+            Qt.SolidLine,
+            Qt.RoundCap,
+            Qt.RoundJoin,
+        )
+        self.__path = QtGui.QPainterPath(begin)
+        self.__last = QtCore.QPointF(begin)
+        self.__bounding_rect = self.__segment_rect(begin, begin)
+        self.__shape = None
+
+    @property
+    def radius(self) -> float:
+        """Half of the line width."""
+        return self.__radius
+
+    @property
+    def color(self) -> QtGui.QColor:
+        """Color of the stroke."""
+        return self.__color
+
+    def path(self) -> QtGui.QPainterPath:
+        """Return stroke centerline."""
+        return self.__path
+
+    def __segment_rect(
+            self,
+            begin: QtCore.QPointF,
+            end: QtCore.QPointF) -> QtCore.QRectF:
+        """Compute area covered by segment drawn with current pen."""
+        return QtCore.QRectF(begin, end).normalized().adjusted(
+            -self.__radius, -self.__radius,
+            self.__radius, self.__radius,
+        )
+
+    def moveTo(self, point: QtCore.QPointF):
+        """Start new part of the stroke without connecting it to previous one.
+
+        :param point: first point of the new part
+        """
+        self.__add(point, connect=False)
+
+    def lineTo(self, point: QtCore.QPointF):
+        """Extend the stroke to the point.
+
+        :param point: next point of the stroke
+        """
+        self.__add(point, connect=True)
+
+    def lineToPoints(self, points: List[QtCore.QPointF]):
+        """Extend the stroke through points with single repaint request.
+
+        :param points: next points of the stroke
+        """
+        if not points:
+            return
+        rect = QtGui.QPolygonF([self.__last] + points).boundingRect().adjusted(
+            -self.__radius, -self.__radius,
+            self.__radius, self.__radius,
+        )
+        if not self.__bounding_rect.contains(rect):
+            self.prepareGeometryChange()
+            self.__bounding_rect = self.__bounding_rect.united(rect)
+        for point in points:
+            self.__path.lineTo(point)
+        self.__last = QtCore.QPointF(points[-1])
+        self.__shape = None
+        self.update(rect)
+
+    def addPolygon(self, polygon: QtGui.QPolygonF):
+        """Add new part of the stroke passing through all polygon points.
+
+        :param polygon: points of the new part
+        """
+        if polygon.isEmpty():
+            return
+        rect = polygon.boundingRect().adjusted(
+            -self.__radius, -self.__radius,
+            self.__radius, self.__radius,
+        )
+        self.prepareGeometryChange()
+        self.__bounding_rect = self.__bounding_rect.united(rect)
+        self.__path.addPolygon(polygon)
+        self.__last = QtCore.QPointF(polygon.last())
+        self.__shape = None
+        self.update(rect)
+
+    def __add(self, point: QtCore.QPointF, connect: bool):
+        begin = self.__last if connect else point
+        rect = self.__segment_rect(begin, point)
+        # geometry change is expensive for scene index,
+        # so notify scene only when stroke grows outside of its bounds
+        if not self.__bounding_rect.contains(rect):
+            self.prepareGeometryChange()
+            self.__bounding_rect = self.__bounding_rect.united(rect)
+        if connect:
+            self.__path.lineTo(point)
+        else:
+            self.__path.moveTo(point)
+        self.__last = QtCore.QPointF(point)
+        self.__shape = None
+        # repaint only new segment
+        self.update(rect)
+
+    def boundingRect(self) -> QtCore.QRectF:
+        """Create bounding box for current item."""
+        return self.__bounding_rect
+
+    def shape(self) -> QtGui.QPainterPath:
+        """Return area covered by the stroke."""
+        if self.__shape is None:
+            stroker = QtGui.QPainterPathStroker(self.__pen)
+            self.__shape = stroker.createStroke(self.__path)
+        return self.__shape
+
+    def paint(
+            self,
+            painter: QtGui.QPainter,
+            option: QtWidgets.QStyleOptionGraphicsItem,
+            widget: QtWidgets.QWidget):
+        """Paint item."""
+        painter.setPen(self.__pen)
+        painter.setBrush(Qt.NoBrush)
+        painter.drawPath(self.__path)
+
+
+class RegionItem(QtWidgets.QGraphicsPathItem):
+    """Drawing item that represents filled outline of simplified stroke.
+
+    Filling precomputed outline is cheaper than stroking
+    centerline with wide pen on every repaint.
+    """
+
+    def __init__(
+            self,
+            outline: QtGui.QPainterPath,
+            color: QtGui.QColor,
+            *args,
+            **kwargs):
+        """Initialize RegionItem.
+
+        :param outline: closed outline of the region
+        :param color: fill color
+        """
+        super().__init__(outline, *args, **kwargs)
+        self.__color = QtGui.QColor(color)
+        self.setBrush(self.__color)
+        self.setPen(QtGui.QPen(Qt.NoPen))
+
+    @property
+    def color(self) -> QtGui.QColor:
+        """Color of the region."""
+        return self.__color
+
+
 class Brush:
     """Round markup tool which cursor size fits the width of drawing line.
 
-    Draw CylinderItems when user hold and move the mouse on canvas.
+    Draw StrokeItem when user hold and move the mouse on canvas.
+    Whole stroke from press to release is a single undo step.
+
+    Mouse positions are collected and added to the stroke once per frame.
+    Positions closer than min_screen_distance pixels on screen to
+    the previous point are skipped, they don't change the stroke visibly.
     """
 
+    cursor_cache_size = 64
+    """Max number of cached cursors."""
+
+    frame_interval = 16
+    """Time in ms, during which mouse positions are collected."""
+
+    min_screen_distance = 1.5
+    """Min distance in screen pixels between points of stroke."""
+
+    simplify_tolerance = None
+    """Max deviation in pixels of simplified stroke outline.
+
+    If set, stroke is replaced with RegionItem on release.
+    """
+
+    _cursor_cache = OrderedDict()
+
     def __init__(self, canvas: 'Canvas', color: QtGui.QColor):
         """Initialize brush.
 
@@ -120,6 +327,14 @@ class Brush:
         self.color = color
         self.last_x, self.last_y = None, None
         self.mouse_pressed = False
+        self.stroke = None
+        # positions, which aren't added to the stroke yet,
+        # and flags whether they continue it
+        self.__pending = []
+        self.__timer = QtCore.QTimer()
+        self.__timer.setSingleShot(True)
+        self.__timer.setInterval(self.frame_interval)
+        self.__timer.timeout.connect(self.flush)
         self.radius = 20
 
     @property
@@ -138,28 +353,42 @@ class Brush:
         del self._radius
 
     def cursor(self):
-        """Each call redraw cursor.
+        """Return cursor for current brush size and zoom.
 
-        Every tool has unique cursor, which is updated (redrawn)
+        Every tool has unique cursor, which is updated
         after zooming, size changing or switching between tools.
+        Cursors are cached, so they are redrawn only for new sizes.
         """
-        return self._CircleCursor()
+        if hasattr(self.canvas, 'zoom'):
+            diameter = self.radius * self.canvas.zoom * 2
+        else:
+            diameter = self.radius * 2
+        # cursors differing less than a pixel look the same
+        key = int(round(diameter))
+        cursor = self._cursor_cache.get(key)
+        if cursor is None:
+            cursor = self._CircleCursor(key)
+            self._cursor_cache[key] = cursor
+            if len(self._cursor_cache) > self.cursor_cache_size:
+                self._cursor_cache.popitem(last=False)
+        else:
+            self._cursor_cache.move_to_end(key)
+        return cursor
+
+    @staticmethod
+    def _CircleCursor(diameter: int) -> QCursor:
+        """Draw a circle cursor of the given size.
 
-    def _CircleCursor(self):
-        """Draw a circle cursor of the same size as brush."""
-        pixmap_size = 128
+        :param diameter: diameter of circle on screen
+        """
+        # cursor is larger than 128 px only for large circles
+        pixmap_size = max(128, diameter + 2)
         pixmap = QPixmap(pixmap_size, pixmap_size)
         pixmap.fill(Qt.GlobalColor.transparent)
 
         # draw circle on pixmap among .begin() and .end() calls
         painter = QPainter()
         painter.begin(pixmap)
-        if hasattr(self.canvas, 'zoom'):
-            diameter = self.radius * self.canvas.zoom * 2
-            if diameter > pixmap_size:
-                print(f"Max displayed diameter {pixmap_size}")
-        else:
-            diameter = self.radius * 2
         left = (pixmap_size - diameter) // 2
         top = (pixmap_size - diameter) // 2
         # draw bbox in (left, top) with size (diameter, diameter)
@@ -168,7 +397,7 @@ class Brush:
         return QCursor(pixmap)
 
     def mouseMoveEvent(self, e):
-        """Draw cylinder between previous and current mouse positions.
+        """Extend current stroke to the mouse position.
 
         :param e: event object
         """
@@ -191,22 +420,66 @@ class Brush:
         if self.last_x is None:  # First event.
             self.last_x = scene_point.x()
             self.last_y = scene_point.y()
+            if self.stroke is not None or self.__pending:
+                # cursor returned to the scene, continue with a gap
+                self.__pending.append((scene_point, False))
             return  # Ignore the first time.
 
-        cylinder = CylinderItem(
-            QtCore.QPointF(self.last_x, self.last_y),
-            QtCore.QPointF(scene_point.x(), scene_point.y()),
-            self.radius,
-            pen=QtGui.QPen(self.color),
-            brush=QtGui.QBrush(self.color),
-            parent=canvas.scene.background_item,
-        )
-        canvas.undo_redo.insert_in_undo_redo_add(cylinder)
+        if self.stroke is None and not self.__pending:
+            self.__pending.append((QtCore.QPointF(self.last_x, self.last_y), False))
+        self.__pending.append((scene_point, True))
+        if not self.__timer.isActive():
+            self.__timer.start()
 
         # Update the origin for next time.
         self.last_x = scene_point.x()
         self.last_y = scene_point.y()
 
+    def minDistance(self) -> float:
+        """Return min distance in scene between points of stroke for current zoom."""
+        zoom = getattr(self.canvas, 'zoom', 1.)
+        # thin strokes keep their shape on any zoom
+        return min(self.min_screen_distance / zoom, self.radius / 4)
+
+    def flush(self):
+        """Add collected mouse positions to the stroke.
+
+        Positions, which are too close to the previous point, are skipped,
+        except the last one, so stroke always ends under the cursor.
+        """
+        self.__timer.stop()
+        pending, self.__pending = self.__pending, []
+        if not pending:
+            return
+        min_distance_2 = self.minDistance() ** 2
+        if self.stroke is None:
+            begin, _ = pending.pop(0)
+            self.stroke = self.createStroke(begin)
+        last = self.stroke.path().currentPosition()
+        points = []
+        for i, (point, connect) in enumerate(pending):
+            if not connect:
+                self.stroke.lineToPoints(points)
+                points = []
+                self.stroke.moveTo(point)
+                last = point
+                continue
+            delta = point - last
+            if delta.x() ** 2 + delta.y() ** 2 < min_distance_2 and i + 1 < len(pending):
+                continue
+            points.append(point)
+            last = point
+        self.stroke.lineToPoints(points)
+
+    def createStroke(self, begin: QtCore.QPointF) -> StrokeItem:
+        """Create new stroke on scene.
+
+        :param begin: first point of the stroke
+        """
+        stroke = StrokeItem(begin, self.radius, self.color)
+        self.canvas.scene.addItem(stroke)
+        return stroke
+
     def mousePressEvent(self, e):
         """Call on mouse press."""
         scene_point = self.canvas.mapToScene(e.pos())
@@ -215,14 +488,36 @@ class Brush:
         self.mouse_pressed = True
 
     def mouseReleaseEvent(self, e):
-        """Clear mouse position info.
+        """Commit current stroke to history and clear mouse position info.
 
         :param e: event object
         """
+        self.flush()
+        if self.stroke is not None:
+            if self.simplify_tolerance is not None:
+                self.stroke = self.simplify(self.stroke)
+            self.canvas.undo_redo.insert_in_undo_redo_add(self.stroke)
+            self.stroke = None
         self.last_x = None
         self.last_y = None
         self.mouse_pressed = False
 
+    def simplify(self, stroke: StrokeItem) -> QtWidgets.QGraphicsItem:
+        """Replace stroke with its simplified outline.
+
+        Stroke is kept if outline turns out to be empty.
+
+        :param stroke: finished stroke
+        """
+        outline = strokeOutline(stroke.path(), stroke.radius, self.simplify_tolerance)
+        if outline.isEmpty():
+            return stroke
+        region = RegionItem(outline, stroke.color)
+        scene = self.canvas.scene
+        scene.removeItem(stroke)
+        scene.addItem(region)
+        return region
+
     def keyPressEvent(self, e):
         """Change brush size by pressing '+' and '-' buttons.
 
@@ -238,4 +533,6 @@ class Brush:
 
     def clear(self):
         """Accurately free resources."""
-        pass
+        self.__timer.stop()
+        self.__pending.clear()
+        self.stroke = None
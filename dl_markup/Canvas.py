@@ -1,6 +1,5 @@
 from PyQt5 import QtGui, QtCore, QtWidgets
 from PyQt5.QtWidgets import QAbstractButton
-from PyQt5.QtCore import QCoreApplication
 
 from typing import List
 
@@ -8,6 +7,11 @@ from .Scene import Scene
 from .UndoRedo import UndoRedo
 from .BrushTool import Brush
 from .PolygonTool import Polygon
+from .FillTool import Fill
+from .SuperpixelTool import Superpixel
+from .SmartRegionTool import SmartRegion
+from .EraserTool import Eraser
+from .VertexIndex import VertexIndex
 
 
 class Canvas(QtWidgets.QGraphicsView):
@@ -17,6 +21,9 @@ class Canvas(QtWidgets.QGraphicsView):
     Store scene, undo_redo module and available tool.
     """
 
+    TOOLS = (Brush, Polygon, Fill, Superpixel, SmartRegion, Eraser)
+    """Tool classes in order of tool buttons."""
+
     def __init__(self, scene: Scene, undo_redo: UndoRedo):
         """Create a new canvas.
 
@@ -26,6 +33,13 @@ class Canvas(QtWidgets.QGraphicsView):
         super().__init__(scene)
         self.scene = scene
         self.undo_redo = undo_redo
+        # vertices of committed polygons for snapping
+        self.vertex_index = VertexIndex()
+        undo_redo.itemAdded.connect(self.vertex_index.addItem)
+        undo_redo.itemsDropped.connect(self.vertex_index.removeItems)
+        undo_redo.cleared.connect(self.vertex_index.clear)
+        # future of superpixels of background image, which is set by model
+        self.superpixels = None
         # green is default color
         self.tool = Brush(self, QtGui.QColor(0, 255, 0))
         self.setCursor(self.tool.cursor())
@@ -33,6 +47,15 @@ class Canvas(QtWidgets.QGraphicsView):
         self.zoom = 1.  # 0.5 <= zoom <= 2.5
         self.zoom_factor = 1.04
 
+    def paintEvent(self, e):
+        """Paint scene.
+
+        Reimplemented, so Profiler can time painting.
+
+        :param e: event object
+        """
+        super().paintEvent(e)
+
     def mouseMoveEvent(self, e):
         """Propagate event to sons and call tool handler.
 
@@ -58,9 +81,9 @@ class Canvas(QtWidgets.QGraphicsView):
         self.tool.mouseReleaseEvent(e)
 
     def keyPressEvent(self, e):
-        """Change tool size by pressing '+' and '-' buttons.
+        """Change tool parameter by pressing '+' and '-' buttons.
 
-        Implemented only for brush tool.
+        Brush and eraser change their size, fill changes its tolerance.
 
         :param e: event object
         """
@@ -70,33 +93,24 @@ class Canvas(QtWidgets.QGraphicsView):
     def changeTool(self, buttons: List[QAbstractButton]):
         """Switch between markup tools.
 
-        Press sender button and rise another.
-        Only support Brush and Polygon.
+        Press sender button and rise others. Buttons go in order
+        of TOOLS.
 
-        :param buttons: list of Brush and Polygon buttons
+        :param buttons: list of Brush, Polygon, Fill, Superpixel, SmartRegion and Eraser buttons
         """
-        assert len(buttons) == 2, "Support exactly 2 tools"
+        assert len(buttons) == len(self.TOOLS), "Support exactly one button per tool"
         sender = self.sender()
-        # select pressed and unpressed buttons
-        prev_button = buttons[sender is buttons[0]]
-        current_button = buttons[sender is buttons[1]]
-        # if it's not checked, ignore click
-        if not prev_button.isChecked():
-            current_button.setChecked(True)
-            return
-        tool_color = self.tool.color
-        brush_text = QCoreApplication.translate('View', 'Brush')
-        polygon_text = QCoreApplication.translate('View', 'Polygon')
-        # switch tool by button text
-        if sender.text() == brush_text:
-            if isinstance(self.tool, Polygon):
-                # clear canvas from intermidiate verticies and edges
-                self.tool.clear()
-            self.tool = Brush(self, tool_color)
-        elif sender.text() == polygon_text:
-            self.tool = Polygon(self, tool_color)
-        # rise prev button
-        prev_button.setChecked(False)
+        # click on pressed button keeps it pressed
+        sender.setChecked(True)
+        tool_class = self.TOOLS[buttons.index(sender)]
+        if type(self.tool) is not tool_class:
+            # clear canvas from unfinished work of previous tool
+            self.tool.clear()
+            self.tool = tool_class(self, self.tool.color)
+        # rise other buttons
+        for button in buttons:
+            if button is not sender:
+                button.setChecked(False)
 
     def changeToolColor(self, color: str):
         """Change tool color by their string description.
@@ -143,10 +157,18 @@ class Canvas(QtWidgets.QGraphicsView):
         self.scene.clear()
         self.undo_redo.clear()
 
-    def updateBackgroundImage(self, img_path: str):
+    def updateBackgroundImage(self, img: QtGui.QImage):
         """Update background image with clearing current segmentation.
 
+        :param img: decoded background image
+        """
+        self.clear()
+        self.scene.img = QtGui.QPixmap.fromImage(img)
+
+    def updateBackgroundTiles(self, img_path: str):
+        """Update background with huge image, which is decoded by visible tiles.
+
         :param img_path: path to new background image
         """
         self.clear()
-        self.scene.img = QtGui.QPixmap(img_path)
+        self.scene.setTiledImage(img_path)
@@ -0,0 +1,129 @@
+from PyQt5 import QtGui
+
+import numpy as np
+
+import typing
+
+
+def imageBuffer(image: QtGui.QImage, dtype: type) -> np.ndarray:
+    """Return writable array of image pixels sharing memory with image.
+
+    :param image: image with pixel size equal to dtype size
+    :param dtype: numpy type of pixel
+    """
+    ptr = image.bits()
+    ptr.setsize(image.sizeInBytes())
+    itemsize = np.dtype(dtype).itemsize
+    # rows can be padded, so cut them by image width
+    rows = np.frombuffer(ptr, dtype).reshape(
+        image.height(), image.bytesPerLine() // itemsize)
+    return rows[:, :image.width()]
+
+
+def imageToRgb(image: QtGui.QImage) -> np.ndarray:
+    """Convert image to array of packed 0xRRGGBB values.
+
+    :param image: image of any format
+    """
+    image = image.convertToFormat(QtGui.QImage.Format_RGB32)
+    return imageBuffer(image, np.uint32) & 0xFFFFFF
+
+
+def rgbToImage(rgb: np.ndarray) -> QtGui.QImage:
+    """Convert array of packed 0xRRGGBB values to image.
+
+    :param rgb: array of shape (height, width)
+    """
+    height, width = rgb.shape
+    image = QtGui.QImage(width, height, QtGui.QImage.Format_RGB32)
+    imageBuffer(image, np.uint32)[...] = rgb | 0xFF000000
+    return image
+
+
+class ClassMap:
+    """Mapping between mask colors and class ids.
+
+    Background (black) is class 0, other colors are
+    numbered from 1 in the given order.
+    """
+
+    background = '#000000'
+
+    def __init__(self, colors: typing.List[str]):
+        """Create mapping.
+
+        :param colors: colors of classes in '#RRGGBB' format
+        """
+        self.colors = [self.background] + list(colors)
+        rgb = np.array(
+            [QtGui.QColor(color).rgb() & 0xFFFFFF for color in self.colors],
+            dtype=np.uint32)
+        self.dtype = np.uint8 if len(self.colors) <= 256 else np.uint16
+        # sorted keys allow vectorized lookup with searchsorted
+        order = np.argsort(rgb)
+        self.__keys = rgb[order]
+        self.__ids = order.astype(self.dtype)
+        self.__rgb = rgb
+
+    def __len__(self) -> int:
+        """Return number of classes including background."""
+        return len(self.colors)
+
+    def colorTable(self) -> typing.List[int]:
+        """Return class colors as QImage color table."""
+        return [QtGui.QColor(color).rgb() for color in self.colors]
+
+    def toIds(self, image: QtGui.QImage) -> np.ndarray:
+        """Convert colored mask to class ids.
+
+        Colors, which are not in the mapping, become background.
+
+        :param image: colored mask
+        """
+        return self.rgbToIds(imageToRgb(image))
+
+    def rgbToIds(self, rgb: np.ndarray) -> np.ndarray:
+        """Convert array of packed 0xRRGGBB values to class ids.
+
+        :param rgb: array of packed colors
+        """
+        pos = np.searchsorted(self.__keys, rgb)
+        pos = np.minimum(pos, len(self.__keys) - 1)
+        known = self.__keys[pos] == rgb
+        return np.where(known, self.__ids[pos], 0).astype(self.dtype)
+
+    def idsToRgb(self, ids: np.ndarray) -> np.ndarray:
+        """Convert class ids to array of packed 0xRRGGBB values.
+
+        :param ids: array of class ids
+        """
+        return self.__rgb[ids]
+
+    def toIndexedImage(self, ids: np.ndarray) -> QtGui.QImage:
+        """Create palette image, which pixel values are class ids.
+
+        :param ids: array of class ids
+        """
+        if len(self) > 256:
+            raise ValueError("Palette image supports at most 256 classes")
+        height, width = ids.shape
+        image = QtGui.QImage(width, height, QtGui.QImage.Format_Indexed8)
+        image.setColorTable(self.colorTable())
+        imageBuffer(image, np.uint8)[...] = ids
+        return image
+
+    def save(self, ids: np.ndarray, path: str, fmt: str):
+        """Save class ids to file.
+
+        :param ids: array of class ids
+        :param path: output file path
+        :param fmt: 'png' for palette image or 'npy' for numpy array
+        """
+        if fmt == 'npy':
+            with open(path, 'wb') as f:
+                np.save(f, ids)
+        elif fmt == 'png':
+            if not self.toIndexedImage(ids).save(path, 'PNG'):
+                raise IOError(f"Can not write {path}")
+        else:
+            raise ValueError(f"Unknown mask format {fmt}")
@@ -8,6 +8,8 @@ from .Scene import Scene
 from .View import View
 from .Model import Model
 from .Canvas import Canvas
+from .Profiler import Profiler, ProfilerOverlay
+from .BrushTool import Brush
 
 from pathlib import Path
 
@@ -20,14 +22,26 @@ class DLMarkupApplication:
 
         :param args: command line arguments
         """
+        args = dict(args)
         self.app = QtWidgets.QApplication([])
         self._setTranslation()
-        scene = Scene(0, 0, 512, 512)
+        raster = args.pop('backend', 'vector') == 'raster'
+        bsp_depth = args.pop('bsp_depth', 0)
+        self.traceFile = args.pop('profile', None)
+        Brush.simplify_tolerance = args.pop('simplify', None)
+        self.profiler = None
+        if self.traceFile is not None:
+            # methods are instrumented before any object uses them
+            self.profiler = Profiler()
+            self.profiler.enable()
+        scene = Scene(0, 0, 512, 512, raster=raster, bsp_depth=bsp_depth)
         undo_redo = UndoRedo(scene)
         canvas = Canvas(scene, undo_redo)
         canvas.setViewport(QtWidgets.QOpenGLWidget())
-        model = Model(canvas, **args)
-        self.view = View(model, canvas)
+        self.model = Model(canvas, **args)
+        self.view = View(self.model, canvas)
+        if self.profiler is not None:
+            self.overlay = ProfilerOverlay(self.profiler, canvas)
 
     def _setTranslation(self):
         """Set up translation to locale language."""
@@ -44,4 +58,9 @@ class DLMarkupApplication:
     def run(self) -> int:
         """Run application."""
         self.view.show()
-        return self.app.exec_()
+        ret = self.app.exec_()
+        # don't lose masks, which are still being saved
+        self.model.close()
+        if self.profiler is not None:
+            self.profiler.dumpTrace(self.traceFile)
+        return ret
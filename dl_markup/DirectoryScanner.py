@@ -0,0 +1,251 @@
+from PyQt5 import QtCore
+
+import os
+import threading
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+
+class DirectoryScanner(QtCore.QObject):
+    """Find image files in background thread and watch for changes.
+
+    Directory is walked by :func:`os.scandir`, which doesn't call stat
+    for every entry, and found names are streamed in batches, so the
+    first images are available long before large directory is scanned.
+
+    Scanned directories are watched, and only directories reported
+    as changed are listed again, so changes are found without full rescan.
+    """
+
+    IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.bmp'})
+    """Lower case extensions of image files."""
+
+    found = QtCore.pyqtSignal(list)
+    """Emitted with batch of new image paths relative to scanned directory."""
+
+    removed = QtCore.pyqtSignal(list)
+    """Emitted with image paths, which disappeared from watched directory."""
+
+    finished = QtCore.pyqtSignal(int)
+    """Emitted with total number of found images, when scan is completed."""
+
+    _batchReady = QtCore.pyqtSignal(int, list)
+    _batchRemoved = QtCore.pyqtSignal(int, list)
+    _dirsFound = QtCore.pyqtSignal(int, list)
+    _scanFinished = QtCore.pyqtSignal(int, int)
+
+    def __init__(
+            self,
+            recursive: bool = False,
+            watch: bool = True,
+            batch_size: int = 4096,
+            batch_interval: float = 0.1,
+            watch_delay: int = 300,
+            *args,
+            **kwargs):
+        """Create scanner.
+
+        :param recursive: scan subdirectories
+        :param watch: report images added or removed after scan
+        :param batch_size: max number of names in batch
+        :param batch_interval: max time in seconds between batches
+        :param watch_delay: time in ms to collect change notifications before listing directories
+        """
+        super().__init__(*args, **kwargs)
+        self.recursive = recursive
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.__directory = None
+        self.__generation = 0
+        self.__stop = threading.Event()
+        # scans and updates are serialized, so only this thread touches __known
+        self.__executor = ThreadPoolExecutor(1, thread_name_prefix='dl_markup-scan')
+        self.__known = {}
+        self.__changed = set()
+        self.__watcher = None
+        if watch:
+            self.__watcher = QtCore.QFileSystemWatcher(self)
+            self.__watcher.directoryChanged.connect(self.__onDirectoryChanged)
+            self.__timer = QtCore.QTimer(self)
+            self.__timer.setSingleShot(True)
+            self.__timer.setInterval(watch_delay)
+            self.__timer.timeout.connect(self.__update)
+        self._batchReady.connect(self.__onBatch)
+        self._batchRemoved.connect(self.__onRemoved)
+        self._dirsFound.connect(self.__onDirsFound)
+        self._scanFinished.connect(self.__onFinished)
+
+    def start(self, directory: str):
+        """Cancel current scan and start scanning of directory.
+
+        :param directory: directory with images
+        """
+        self.cancel()
+        self.__directory = directory
+        self.__stop = threading.Event()
+        self.__executor.submit(self.__scan, directory, self.__generation, self.__stop)
+
+    def cancel(self):
+        """Stop current scan and watching, pending batches are dropped."""
+        self.__stop.set()
+        self.__generation += 1
+        self.__changed.clear()
+        if self.__watcher is not None:
+            self.__timer.stop()
+            paths = self.__watcher.directories()
+            if paths:
+                self.__watcher.removePaths(paths)
+
+    def submit(self, fn: typing.Callable, *args):
+        """Call function in scanning thread after the current scan or update.
+
+        :param fn: function, which works with files and shouldn't block GUI thread
+        :param args: function arguments
+        """
+        self.__executor.submit(fn, *args)
+
+    def isImage(self, name: str) -> bool:
+        """Check if file name has image extension.
+
+        :param name: file name
+        """
+        return os.path.splitext(name)[1].lower() in self.IMAGE_EXTENSIONS
+
+    def listDirectory(self, directory: str, relative: str = '') -> typing.Tuple[list, list]:
+        """List images and subdirectories of single directory.
+
+        Hidden subdirectories are skipped. Subdirectories are listed
+        only for recursive scan.
+
+        :param directory: scanned directory
+        :param relative: path of listed subdirectory relative to directory
+        :return: relative paths of images and of subdirectories
+        """
+        images, subdirs = [], []
+        with os.scandir(os.path.join(directory, relative)) as entries:
+            for entry in entries:
+                if self.recursive and not entry.name.startswith('.') and \
+                        entry.is_dir(follow_symlinks=False):
+                    subdirs.append(os.path.join(relative, entry.name))
+                elif self.isImage(entry.name) and entry.is_file():
+                    images.append(os.path.join(relative, entry.name))
+        return images, subdirs
+
+    def walk(self, directory: str, stop: threading.Event = None) -> typing.Iterator[str]:
+        """Yield image paths relative to directory.
+
+        :param directory: directory with images
+        :param stop: event, which interrupts walking
+        """
+        for _, images in self.__walk(directory, '', stop):
+            yield from images
+
+    def __walk(
+            self,
+            directory: str,
+            relative: str,
+            stop: threading.Event = None) -> typing.Iterator[typing.Tuple[str, list]]:
+        """Yield relative paths of subdirectories with their images."""
+        pending = [relative]
+        while pending:
+            if stop is not None and stop.is_set():
+                return
+            relative = pending.pop()
+            try:
+                images, subdirs = self.listDirectory(directory, relative)
+            except OSError as e:
+                print("Can not scan directory:", e)
+                continue
+            pending.extend(subdirs)
+            yield relative, images
+
+    def __scan(self, directory: str, generation: int, stop: threading.Event):
+        """Walk directory and emit batches (runs in scanning thread)."""
+        self.__known = {}
+        batch = []
+        total = 0
+        last_emit = time.monotonic()
+        for relative, images in self.__walk(directory, '', stop):
+            self.__known[relative] = set(images)
+            self._dirsFound.emit(generation, [os.path.join(directory, relative)])
+            for name in images:
+                batch.append(name)
+                if len(batch) >= self.batch_size or \
+                        time.monotonic() - last_emit >= self.batch_interval:
+                    self._batchReady.emit(generation, batch)
+                    total += len(batch)
+                    batch = []
+                    last_emit = time.monotonic()
+        if stop.is_set():
+            return
+        if batch:
+            self._batchReady.emit(generation, batch)
+            total += len(batch)
+        self._scanFinished.emit(generation, total)
+
+    def __rescan(self, directory: str, generation: int, stop: threading.Event, changed: list):
+        """List changed directories and emit differences (runs in scanning thread)."""
+        known = self.__known
+        added, removed, new_dirs = [], [], []
+        for relative in changed:
+            if stop.is_set():
+                return
+            if relative not in known:
+                # parent has been already updated
+                continue
+            try:
+                images, subdirs = self.listDirectory(directory, relative)
+            except OSError:
+                # directory has been removed
+                images, subdirs = [], []
+            images = set(images)
+            old = known[relative]
+            added.extend(images - old)
+            removed.extend(old - images)
+            known[relative] = images
+            # directories appear and disappear with their contents
+            old_subdirs = {d for d in known if d and os.path.dirname(d) == relative}
+            for subdir in set(subdirs) - old_subdirs:
+                for sub_relative, sub_images in self.__walk(directory, subdir, stop):
+                    known[sub_relative] = set(sub_images)
+                    new_dirs.append(os.path.join(directory, sub_relative))
+                    added.extend(sub_images)
+            for subdir in old_subdirs - set(subdirs):
+                prefix = subdir + os.sep
+                for d in [d for d in known if d == subdir or d.startswith(prefix)]:
+                    removed.extend(known.pop(d))
+        if new_dirs:
+            self._dirsFound.emit(generation, new_dirs)
+        if removed:
+            self._batchRemoved.emit(generation, sorted(removed))
+        if added:
+            self._batchReady.emit(generation, sorted(added))
+
+    def __onDirectoryChanged(self, path: str):
+        self.__changed.add(os.path.relpath(path, self.__directory))
+        # editors and copying tools produce bursts of notifications
+        self.__timer.start()
+
+    def __update(self):
+        # parents are listed before their subdirectories
+        relative = sorted('' if c == os.curdir else c for c in self.__changed)
+        self.__changed.clear()
+        self.__executor.submit(
+            self.__rescan, self.__directory, self.__generation, self.__stop, relative)
+
+    def __onDirsFound(self, generation: int, paths: list):
+        if generation == self.__generation and self.__watcher is not None:
+            self.__watcher.addPaths(paths)
+
+    def __onBatch(self, generation: int, batch: list):
+        if generation == self.__generation:
+            self.found.emit(batch)
+
+    def __onRemoved(self, generation: int, batch: list):
+        if generation == self.__generation:
+            self.removed.emit(batch)
+
+    def __onFinished(self, generation: int, total: int):
+        if generation == self.__generation:
+            self.finished.emit(total)
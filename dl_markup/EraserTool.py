@@ -0,0 +1,104 @@
+from PyQt5 import QtGui, QtCore, QtWidgets
+from PyQt5.QtCore import Qt
+
+import typing
+
+import numpy as np
+
+from . import Annotations
+from .BrushTool import Brush, RegionItem, StrokeItem
+from .FillTool import FillItem, pathRuns, subtractRuns
+from .Geometry import outlineRings, ringsToPath
+
+
+class Eraser(Brush):
+    """Round tool that erases markup under its stroke.
+
+    Stroke is drawn like brush stroke and erases on release, whole
+    stroke is a single undo step. Markup items under the stroke are
+    replaced with their remaining parts, only items found by scene
+    index near the stroke are processed. With raster backend stroke
+    is painted into mask with background color.
+    """
+
+    stroke_color = QtGui.QColor(255, 255, 255, 128)
+    """Color of stroke, which is being drawn."""
+
+    background = QtGui.QColor(0, 0, 0)
+    """Color of mask pixels without markup."""
+
+    def createStroke(self, begin: QtCore.QPointF) -> StrokeItem:
+        """Create new translucent stroke on scene.
+
+        :param begin: first point of the stroke
+        """
+        stroke = StrokeItem(begin, self.radius, self.stroke_color)
+        self.canvas.scene.addItem(stroke)
+        return stroke
+
+    def mouseReleaseEvent(self, e):
+        """Erase markup under current stroke.
+
+        :param e: event object
+        """
+        self.flush()
+        stroke, self.stroke = self.stroke, None
+        self.last_x = None
+        self.last_y = None
+        self.mouse_pressed = False
+        if stroke is None:
+            return
+        self.canvas.scene.removeItem(stroke)
+        self.erase(stroke.mapToScene(stroke.shape()))
+
+    def erase(self, footprint: QtGui.QPainterPath):
+        """Subtract area from markup as a single undo step.
+
+        :param footprint: erased area in scene coordinates
+        """
+        scene = self.canvas.scene
+        if scene.mask_item is not None:
+            region = RegionItem(footprint, self.background)
+            scene.addItem(region)
+            self.canvas.undo_redo.insert_in_undo_redo_add(region)
+            return
+        erased = None
+        pairs = []
+        for item in scene.items(footprint, Qt.IntersectsItemShape, Qt.AscendingOrder):
+            if not Annotations.isAnnotation(item):
+                continue
+            if isinstance(item, FillItem):
+                if erased is None:
+                    erased = pathRuns(footprint)
+                runs = subtractRuns(item.runs, erased)
+                if np.array_equal(runs, item.runs):
+                    continue
+                pairs.append((item, FillItem(runs, item.color) if len(runs) else None))
+            else:
+                pairs.append((item, self.__remainder(item, footprint)))
+        if pairs:
+            self.canvas.undo_redo.insert_in_undo_redo_replace(pairs)
+
+    @staticmethod
+    def __remainder(
+            item: QtWidgets.QGraphicsItem,
+            footprint: QtGui.QPainterPath) -> typing.Optional[RegionItem]:
+        """Return region of item outside of footprint."""
+        if isinstance(item, StrokeItem):
+            area, color = item.shape(), item.color
+        elif isinstance(item, RegionItem):
+            area, color = item.path(), item.color
+        else:
+            area = QtGui.QPainterPath()
+            area.addPolygon(item.polygon())
+            color = item.brush().color()
+        remainder = item.mapToScene(area).subtracted(footprint)
+        if remainder.isEmpty():
+            return None
+        return RegionItem(ringsToPath(outlineRings(remainder)), color)
+
+    def clear(self):
+        """Remove stroke, which is being drawn."""
+        if self.stroke is not None and self.stroke.scene() is not None:
+            self.stroke.scene().removeItem(self.stroke)
+        super().clear()
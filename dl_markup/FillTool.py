@@ -0,0 +1,438 @@
+from PyQt5 import QtGui, QtCore, QtWidgets
+from PyQt5.QtCore import Qt
+
+import typing
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .Canvas import Canvas
+
+
+def imageArray(image: QtGui.QImage) -> np.ndarray:
+    """Return pixels of 32-bit image as array of shape (height, width) without copying.
+
+    Array refers to image buffer, so image should be alive while array
+    is used. Image of other format is converted and copied.
+
+    :param image: image in Format_RGB32 or Format_ARGB32(_Premultiplied)
+    """
+    if image.depth() != 32:
+        return imageArray(image.convertToFormat(QtGui.QImage.Format_RGB32)).copy()
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    array = np.frombuffer(ptr, np.uint32).reshape(image.height(), image.bytesPerLine() // 4)
+    return array[:, :image.width()]
+
+
+def channelArray(pixels: np.ndarray) -> np.ndarray:
+    """Return color channels of 32-bit pixels as array of shape (height, width, 3) without copying.
+
+    :param pixels: pixels of shape (height, width) as 0xAARRGGBB, e.g. from :func:`imageArray`
+    :return: blue, green and red bytes of every pixel
+    """
+    # bytes of 0xAARRGGBB pixel in memory are B, G, R, A
+    return pixels[..., None].view(np.uint8)[..., :3]
+
+
+def maskRuns(mask: np.ndarray) -> np.ndarray:
+    """Return runs of true pixels of mask ordered by row and column.
+
+    :param mask: boolean array of shape (height, width)
+    :return: runs as array of shape (n, 3) with row, first and last + 1 column
+    """
+    height, width = mask.shape
+    # false columns around rows, so runs never wrap
+    padded = np.zeros((height, width + 2), bool)
+    padded[:, 1:-1] = mask
+    edges = np.flatnonzero(padded[:, 1:] != padded[:, :-1])
+    rows, starts = np.divmod(edges[::2], width + 1)
+    ends = edges[1::2] - rows * (width + 1)
+    return np.stack([rows, starts, ends], axis=1).astype(np.int32)
+
+
+def scaleRuns(runs: np.ndarray, shape: typing.Tuple[int, int], width: int, height: int) -> np.ndarray:
+    """Map runs of small mask to pixels of larger image.
+
+    Pixel of image belongs to mask pixel at its position scaled down.
+
+    :param runs: runs of mask as array of shape (n, 3) with row, first and last + 1 column
+    :param shape: height and width of mask
+    :param width: width of image
+    :param height: height of image
+    :return: runs of image ordered by row and column
+    """
+    rows, columns = shape
+    runs = np.asarray(runs, np.int64)
+    # mask row r covers image rows [ceil(r * height / rows), ceil((r + 1) * height / rows))
+    first = -(-runs[:, 0] * height // rows)
+    counts = -(-(runs[:, 0] + 1) * height // rows) - first
+    runs = np.repeat(runs, counts, axis=0)
+    offsets = np.arange(len(runs)) - np.repeat(np.cumsum(counts) - counts, counts)
+    runs[:, 0] = np.repeat(first, counts) + offsets
+    runs[:, 1:] = -(-runs[:, 1:] * width // columns)
+    return runs[np.lexsort((runs[:, 1], runs[:, 0]))].astype(np.int32)
+
+
+def mergeRuns(runs: np.ndarray) -> np.ndarray:
+    """Join touching runs of the same row.
+
+    :param runs: runs ordered by row and column, which don't overlap
+    """
+    if not len(runs):
+        return runs
+    touching = (runs[1:, 0] == runs[:-1, 0]) & (runs[1:, 1] == runs[:-1, 2])
+    starts = np.flatnonzero(np.concatenate([[True], ~touching]))
+    ends = np.append(starts[1:], len(runs)) - 1
+    merged = runs[starts].copy()
+    merged[:, 2] = runs[ends, 2]
+    return merged
+
+
+def runsMask(runs: np.ndarray, rect: QtCore.QRect) -> np.ndarray:
+    """Return pixels of runs inside rectangle.
+
+    :param runs: runs as array of shape (n, 3) with row, first and last + 1 column
+    :param rect: part of image
+    :return: boolean array of shape (rect height, rect width)
+    """
+    height, width = rect.height(), rect.width()
+    runs = np.asarray(runs, np.int64) - [rect.top(), rect.left(), rect.left()]
+    runs = runs[(0 <= runs[:, 0]) & (runs[:, 0] < height)]
+    runs[:, 1:] = runs[:, 1:].clip(0, width)
+    # run adds 1 to its first pixel and subtracts 1 after its last one
+    steps = np.zeros((height, width + 1), np.int32)
+    np.add.at(steps, (runs[:, 0], runs[:, 1]), 1)
+    np.add.at(steps, (runs[:, 0], runs[:, 2]), -1)
+    return np.cumsum(steps[:, :-1], axis=1) > 0
+
+
+def pathRuns(path: QtGui.QPainterPath) -> np.ndarray:
+    """Return runs of pixels covered by path.
+
+    Path is rasterized without antialiasing, like items
+    painted into mask buffer.
+
+    :param path: filled area in image coordinates
+    """
+    rect = path.boundingRect().toAlignedRect()
+    if rect.isEmpty():
+        return np.zeros((0, 3), np.int32)
+    image = QtGui.QImage(rect.width(), rect.height(), QtGui.QImage.Format_RGB32)
+    image.fill(0)
+    painter = QtGui.QPainter(image)
+    painter.setRenderHint(QtGui.QPainter.Antialiasing, False)
+    painter.translate(-rect.left(), -rect.top())
+    painter.fillPath(path, QtGui.QColor(255, 255, 255))
+    painter.end()
+    runs = maskRuns(imageArray(image) & 0xFFFFFF != 0)
+    return runs + np.array([rect.top(), rect.left(), rect.left()], np.int32)
+
+
+def subtractRuns(runs: np.ndarray, erased: np.ndarray) -> np.ndarray:
+    """Return pixels of runs, which are not erased.
+
+    Only pixels in bounds of erased runs are processed.
+
+    :param runs: runs ordered by row and column, which don't overlap
+    :param erased: runs of removed pixels
+    :return: runs ordered by row and column
+    """
+    if not len(runs) or not len(erased):
+        return runs
+    top, bottom = int(erased[:, 0].min()), int(erased[:, 0].max()) + 1
+    left, right = int(erased[:, 1].min()), int(erased[:, 2].max())
+    rect = QtCore.QRect(left, top, right - left, bottom - top)
+    rows = (top <= runs[:, 0]) & (runs[:, 0] < bottom)
+    outside, inside = runs[~rows], runs[rows]
+    # parts of runs at left and right of erased bounds are kept as is
+    left_parts, right_parts = inside.copy(), inside.copy()
+    left_parts[:, 2] = left_parts[:, 2].clip(max=left)
+    right_parts[:, 1] = right_parts[:, 1].clip(min=right)
+    kept = runsMask(inside, rect) & ~runsMask(erased, rect)
+    middle = maskRuns(kept) + np.array([top, left, left], np.int32)
+    runs = np.concatenate([outside, left_parts, middle, right_parts]).astype(np.int32)
+    runs = runs[runs[:, 1] < runs[:, 2]]
+    return mergeRuns(runs[np.lexsort((runs[:, 1], runs[:, 0]))])
+
+
+def runsRegion(runs: np.ndarray) -> QtGui.QRegion:
+    """Return region of pixels covered by runs.
+
+    Region doesn't depend on GUI, so it can be built in another thread.
+
+    :param runs: runs as array of shape (n, 3) with row, first and last + 1 column
+    """
+    region = QtGui.QRegion()
+    region.setRects([QtCore.QRect(x0, y, x1 - x0, 1) for y, x0, x1 in np.asarray(runs).tolist()])
+    return region
+
+
+def floodFill(
+        image: np.ndarray,
+        x: int,
+        y: int,
+        tolerance: int,
+        labels: np.ndarray = None,
+        band: int = 64) -> np.ndarray:
+    """Find 4-connected region of similar pixels around seed.
+
+    Pixel belongs to region, if every color channel differs from the
+    seed color by at most tolerance and, if labels are given, pixel has
+    the same label as seed. Region is found by scanline algorithm over
+    runs of such pixels. Runs are computed by numpy in bands of rows,
+    which region reaches, so small regions of large images are cheap.
+
+    :param image: pixels of shape (height, width) as 0xAARRGGBB
+    :param x: column of seed
+    :param y: row of seed
+    :param tolerance: max difference of color channels
+    :param labels: class of every pixel of shape (height, width)
+    :param band: number of rows, which are processed at once
+    :return: runs as array of shape (n, 3) with row, first and last + 1 column
+    """
+    height, width = image.shape
+    seed = int(image[y, x])
+    values = np.arange(256)
+    channels = channelArray(image)
+    luts = [
+        (np.abs(values - ((seed >> (8 * channel)) & 0xFF)) <= tolerance)
+        for channel in range(3)]
+    seed_label = None if labels is None else labels[y, x]
+    rows = {}
+
+    def computeBand(b: int):
+        top, bottom = b * band, min(height, (b + 1) * band)
+        pixels = channels[top:bottom]
+        inside = np.take(luts[0], pixels[..., 0])
+        for channel in (1, 2):
+            inside &= np.take(luts[channel], pixels[..., channel])
+        if labels is not None:
+            inside &= labels[top:bottom] == seed_label
+        runs = maskRuns(inside)
+        bounds = np.searchsorted(runs[:, 0], np.arange(bottom - top + 1)).tolist()
+        starts = runs[:, 1].tolist()
+        ends = runs[:, 2].tolist()
+        for i in range(bottom - top):
+            first, last = bounds[i], bounds[i + 1]
+            rows[top + i] = (starts[first:last], ends[first:last], [False] * (last - first))
+
+    def row(r: int) -> tuple:
+        runs = rows.get(r)
+        if runs is None:
+            computeBand(r // band)
+            runs = rows[r]
+        return runs
+
+    starts, ends, visited = row(y)
+    i = bisect_right(ends, x)
+    visited[i] = True
+    stack = [(y, starts[i], ends[i])]
+    region = []
+    while stack:
+        r, start, end = stack.pop()
+        region.append((r, start, end))
+        for neighbour in (r - 1, r + 1):
+            if not 0 <= neighbour < height:
+                continue
+            starts, ends, visited = row(neighbour)
+            # runs overlapping [start, end)
+            for j in range(bisect_right(ends, start), bisect_left(starts, end)):
+                if not visited[j]:
+                    visited[j] = True
+                    stack.append((neighbour, starts[j], ends[j]))
+    runs = np.array(region, np.int32).reshape(-1, 3)
+    return runs[np.lexsort((runs[:, 1], runs[:, 0]))]
+
+
+class FillItem(QtWidgets.QGraphicsItem):
+    """Drawing item that represents filled region of pixels.
+
+    Region is stored as runs of pixels and painted through clip region,
+    so large region costs one item and one fill.
+    """
+
+    def __init__(
+            self,
+            runs: np.ndarray,
+            color: QtGui.QColor,
+            region: QtGui.QRegion = None,
+            *args,
+            **kwargs):
+        """Initialize FillItem.
+
+        :param runs: array of shape (n, 3) with row, first and last + 1 column
+        :param color: fill color
+        :param region: region of runs, if it is already built
+        """
+        super().__init__(*args, **kwargs)
+        self.__runs = np.asarray(runs, np.int32).reshape(-1, 3)
+        self.__added = []  # runs added to region, which aren't merged yet
+        self.__color = QtGui.QColor(color)
+        self.__region = runsRegion(self.__runs) if region is None else region
+        self.__bounding_rect = QtCore.QRectF(self.__region.boundingRect())
+        self.__shape = None
+
+    @property
+    def runs(self) -> np.ndarray:
+        """Runs of pixels with row, first and last + 1 column."""
+        if self.__added:
+            runs = np.concatenate([self.__runs, *self.__added])
+            self.__runs = mergeRuns(runs[np.lexsort((runs[:, 1], runs[:, 0]))])
+            self.__added = []
+        return self.__runs
+
+    def addRuns(self, runs: np.ndarray, region: QtGui.QRegion = None):
+        """Extend the region by pixels, which don't belong to it.
+
+        Only the added region is united with current one,
+        runs are merged when they are requested.
+
+        :param runs: runs of added pixels, which don't overlap the region
+        :param region: region of added runs, if it is already built
+        """
+        runs = np.asarray(runs, np.int32).reshape(-1, 3)
+        self.prepareGeometryChange()
+        self.__added.append(runs)
+        self.__region = self.__region.united(runsRegion(runs) if region is None else region)
+        self.__bounding_rect = QtCore.QRectF(self.__region.boundingRect())
+        self.__shape = None
+
+    @property
+    def color(self) -> QtGui.QColor:
+        """Color of the region."""
+        return self.__color
+
+    def boundingRect(self) -> QtCore.QRectF:
+        """Create bounding box for current item."""
+        return self.__bounding_rect
+
+    def shape(self) -> QtGui.QPainterPath:
+        """Return area covered by the region."""
+        if self.__shape is None:
+            self.__shape = QtGui.QPainterPath()
+            self.__shape.addRegion(self.__region)
+        return self.__shape
+
+    def paint(
+            self,
+            painter: QtGui.QPainter,
+            option: QtWidgets.QStyleOptionGraphicsItem,
+            widget: QtWidgets.QWidget):
+        """Paint item."""
+        painter.save()
+        painter.setClipRegion(self.__region, Qt.IntersectClip)
+        painter.fillRect(self.__bounding_rect, self.__color)
+        painter.restore()
+
+
+class Fill(QtCore.QObject):
+    """Tool that fills region of similar colors under cursor.
+
+    Region is found in background thread, it doesn't cross borders
+    of existing markup. Filled region is a single item and a single
+    undo step.
+    """
+
+    tolerance = 24
+    """Max difference of color channels from the clicked pixel."""
+
+    _executor = None
+    _filled = QtCore.pyqtSignal(int, object)
+
+    def __init__(self, canvas: 'Canvas', color: QtGui.QColor):
+        """Initialize Fill.
+
+        :param canvas: canvas object for drawing
+        :param color: color of filled region
+        """
+        super().__init__()
+        self.canvas = canvas
+        self.color = color
+        self.__generation = 0
+        self._filled.connect(self.__onFilled)
+        self.canvas.setCursor(self.cursor())
+
+    @classmethod
+    def executor(cls) -> ThreadPoolExecutor:
+        """Return thread, which fills regions."""
+        if cls._executor is None:
+            cls._executor = ThreadPoolExecutor(1, thread_name_prefix='dl_markup-fill')
+        return cls._executor
+
+    def mousePressEvent(self, e):
+        """Start filling of region under cursor."""
+        if e.button() != Qt.LeftButton:
+            return
+        scene = self.canvas.scene
+        if scene.img is None:
+            print("Fill is not supported for tiled images")
+            return
+        point = self.canvas.mapToScene(e.pos())
+        x, y = int(point.x()), int(point.y())
+        image = scene.image
+        if not (0 <= x < image.width() and 0 <= y < image.height()):
+            return
+        # markup is recorded in GUI thread, mask and region are made in background thread
+        segm = scene.segmSnapshot()
+        self.__generation += 1
+        self.executor().submit(
+            self.__fill, self.__generation, image, segm, x, y, QtGui.QColor(self.color), self.tolerance)
+
+    def __fill(
+            self,
+            generation: int,
+            image: QtGui.QImage,
+            segm: typing.Callable[[], QtGui.QImage],
+            x: int,
+            y: int,
+            color: QtGui.QColor,
+            tolerance: int):
+        """Find region and send it to GUI thread (runs in fill thread)."""
+        mask = segm()
+        labels = imageArray(mask) if mask.size() == image.size() else None
+        runs = floodFill(imageArray(image), x, y, tolerance, labels)
+        self._filled.emit(generation, (runs, color, runsRegion(runs)))
+
+    def __onFilled(
+            self,
+            generation: int,
+            result: typing.Tuple[np.ndarray, QtGui.QColor, QtGui.QRegion]):
+        if generation != self.__generation:
+            # canvas has been cleared or tool has been changed
+            return
+        item = FillItem(*result)
+        self.canvas.scene.addItem(item)
+        self.canvas.undo_redo.insert_in_undo_redo_add(item)
+
+    def mouseMoveEvent(self, e):
+        """Skip event."""
+        pass
+
+    def mouseReleaseEvent(self, e):
+        """Skip event."""
+        pass
+
+    def keyPressEvent(self, e):
+        """Change tolerance by pressing '+' and '-' buttons.
+
+        :param e: event object
+        """
+        if e.key() == Qt.Key_Plus or e.key() == Qt.Key_Equal:
+            self.tolerance = min(255, self.tolerance + 4)
+        elif e.key() == Qt.Key_Minus:
+            self.tolerance = max(0, self.tolerance - 4)
+        else:
+            return
+        print("New fill tolerance:", self.tolerance)
+
+    def cursor(self):
+        """Pointing cursor shows clicked pixel."""
+        return Qt.PointingHandCursor
+
+    def clear(self):
+        """Drop region, which is being found."""
+        self.__generation += 1
@@ -0,0 +1,166 @@
+"""Vectorized operations on polylines and outlines."""
+from PyQt5 import QtCore, QtGui
+from PyQt5.QtCore import Qt
+
+import typing
+
+import numpy as np
+
+
+def polygonToArray(polygon: QtGui.QPolygonF) -> np.ndarray:
+    """Copy points of polygon to array of shape (n, 2).
+
+    :param polygon: polygon
+    """
+    ptr = polygon.data()
+    ptr.setsize(16 * len(polygon))
+    return np.frombuffer(ptr, np.float64).reshape(-1, 2).copy()
+
+
+def arrayToPolygon(points: np.ndarray) -> QtGui.QPolygonF:
+    """Create polygon from array of shape (n, 2).
+
+    :param points: coordinates of points
+    """
+    polygon = QtGui.QPolygonF(len(points))
+    ptr = polygon.data()
+    ptr.setsize(16 * len(points))
+    np.frombuffer(ptr, np.float64)[:] = np.asarray(points, np.float64).ravel()
+    return polygon
+
+
+def segmentDistances(points: np.ndarray, begin: np.ndarray, end: np.ndarray) -> np.ndarray:
+    """Return distances from points to segment.
+
+    :param points: array of shape (n, 2)
+    :param begin: first end of segment
+    :param end: second end of segment
+    """
+    direction = end - begin
+    length_2 = direction @ direction
+    offsets = points - begin
+    if length_2 == 0:
+        return np.hypot(offsets[:, 0], offsets[:, 1])
+    t = np.clip(offsets @ direction / length_2, 0., 1.)
+    nearest = offsets - t[:, None] * direction
+    return np.hypot(nearest[:, 0], nearest[:, 1])
+
+
+def simplify(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Simplify polyline by Ramer-Douglas-Peucker algorithm.
+
+    Every removed point is not farther than tolerance from the
+    simplified polyline, ends of polyline are kept.
+
+    :param points: array of shape (n, 2)
+    :param tolerance: max deviation in pixels
+    """
+    count = len(points)
+    if count < 3:
+        return points.copy()
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    ranges = [(0, count - 1)]
+    while ranges:
+        first, last = ranges.pop()
+        if last - first < 2:
+            continue
+        distances = segmentDistances(points[first + 1:last], points[first], points[last])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            middle = first + 1 + farthest
+            keep[middle] = True
+            ranges.append((first, middle))
+            ranges.append((middle, last))
+    return points[keep]
+
+
+def simplifyRing(points: np.ndarray, tolerance: float) -> np.ndarray:
+    """Simplify closed polyline by Ramer-Douglas-Peucker algorithm.
+
+    Ring is split at its first point and at the farthest point from it,
+    both halves are simplified separately.
+
+    :param points: array of shape (n, 2), the last point may repeat the first one
+    :param tolerance: max deviation in pixels
+    """
+    if len(points) > 1 and np.array_equal(points[0], points[-1]):
+        points = points[:-1]
+    if len(points) < 4:
+        return points.copy()
+    offsets = points - points[0]
+    split = int(np.argmax(np.einsum('ij,ij->i', offsets, offsets)))
+    first = simplify(points[:split + 1], tolerance)
+    second = simplify(np.concatenate([points[split:], points[:1]]), tolerance)
+    return np.concatenate([first, second[1:-1]])
+
+
+def strokeOutline(
+        path: QtGui.QPainterPath,
+        radius: float,
+        tolerance: float) -> QtGui.QPainterPath:
+    """Convert centerline drawn by round pen to filled outline.
+
+    Half of tolerance is spent on centerline simplification, a quarter on
+    flattening of round caps and joins and a quarter on outline simplification,
+    so outline deviates from the exact stroke by at most tolerance pixels.
+
+    :param path: centerline, may consist of several subpaths
+    :param radius: half of the line width
+    :param tolerance: max deviation in pixels
+    """
+    center = QtGui.QPainterPath()
+    # subpath of single point isn't converted to polygon
+    dots = [
+        QtCore.QPointF(path.elementAt(i).x, path.elementAt(i).y)
+        for i in range(path.elementCount())
+        if path.elementAt(i).isMoveTo() and (
+            i + 1 == path.elementCount() or path.elementAt(i + 1).isMoveTo())]
+    for polygon in path.toSubpathPolygons():
+        points = simplify(polygonToArray(polygon), tolerance / 2)
+        if (points == points[0]).all():
+            # stroker produces nothing for zero-length subpath, it's drawn as a dot
+            dots.append(QtCore.QPointF(*points[0]))
+            continue
+        center.addPolygon(arrayToPolygon(points))
+    stroker = QtGui.QPainterPathStroker(
+        QtGui.QPen(Qt.black, 2 * radius, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+    stroke = stroker.createStroke(center)
+    for dot in dots:
+        stroke.addEllipse(dot, radius, radius)
+    outline = stroke.simplified()
+    # curves are flattened with 0.5 px precision in device coordinates
+    scale = max(1., 2. / tolerance)
+    to_device = QtGui.QTransform.fromScale(scale, scale)
+    rings = []
+    for polygon in outline.toSubpathPolygons(to_device):
+        ring = simplifyRing(polygonToArray(polygon) / scale, tolerance / 4)
+        if len(ring) >= 3:
+            rings.append(arrayToPolygon(ring))
+    return ringsToPath(rings)
+
+
+def outlineRings(path: QtGui.QPainterPath) -> typing.List[QtGui.QPolygonF]:
+    """Return closed polygons of outline without repeated last points.
+
+    :param path: outline built from polygons
+    """
+    rings = []
+    for polygon in path.toSubpathPolygons():
+        if len(polygon) > 1 and polygon.first() == polygon.last():
+            polygon.remove(len(polygon) - 1)
+        rings.append(polygon)
+    return rings
+
+
+def ringsToPath(rings: typing.Iterable[QtGui.QPolygonF]) -> QtGui.QPainterPath:
+    """Create outline from closed polygons, holes are filled by odd-even rule.
+
+    :param rings: outer boundaries and holes
+    """
+    path = QtGui.QPainterPath()
+    path.setFillRule(Qt.OddEvenFill)
+    for ring in rings:
+        path.addPolygon(ring)
+        path.closeSubpath()
+    return path
@@ -0,0 +1,129 @@
+from PyQt5 import QtGui
+
+import threading
+import time
+import typing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ImageLoader:
+    """Decode images in background threads and cache them.
+
+    Decoded images are kept in LRU cache bounded by memory size,
+    so switching to prefetched image doesn't wait for decoding.
+    """
+
+    def __init__(
+            self,
+            max_bytes: int = 512 * 2**20,
+            max_workers: int = 2):
+        """Create loader.
+
+        :param max_bytes: max total size of cached images
+        :param max_workers: number of decoding threads
+        """
+        self.max_bytes = max_bytes
+        self.__executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix='dl_markup-decode')
+        self.__lock = threading.Lock()
+        self.__cache = OrderedDict()
+        self.__cache_bytes = 0
+        self.__pending = {}
+        self.__hits = 0
+        self.__misses = 0
+        self.__decodes = 0
+        self.__decode_time = 0.
+
+    def get(self, path: str) -> QtGui.QImage:
+        """Return decoded image.
+
+        If image is neither cached nor being decoded,
+        it is decoded in the calling thread.
+
+        :param path: image file path
+        """
+        with self.__lock:
+            image = self.__cache.get(path)
+            if image is not None:
+                self.__cache.move_to_end(path)
+                self.__hits += 1
+                return image
+            future = self.__pending.get(path)
+            if future is not None:
+                # decoding has already started, it's faster to wait for it
+                self.__hits += 1
+            else:
+                self.__misses += 1
+        if future is not None:
+            return future.result()
+        image = self.__decode(path)
+        self.__store(path, image)
+        return image
+
+    def prefetch(self, paths: typing.Iterable[str]):
+        """Start decoding of images, which aren't cached yet.
+
+        :param paths: image file paths in order of priority
+        """
+        with self.__lock:
+            for path in paths:
+                if path in self.__cache or path in self.__pending:
+                    continue
+                future = self.__executor.submit(self.__prefetch, path)
+                self.__pending[path] = future
+
+    def __prefetch(self, path: str) -> QtGui.QImage:
+        image = self.__decode(path)
+        self.__store(path, image)
+        with self.__lock:
+            self.__pending.pop(path, None)
+        return image
+
+    def __decode(self, path: str) -> QtGui.QImage:
+        start = time.perf_counter()
+        image = QtGui.QImage(path)
+        elapsed = time.perf_counter() - start
+        with self.__lock:
+            self.__decodes += 1
+            self.__decode_time += elapsed
+        return image
+
+    def __store(self, path: str, image: QtGui.QImage):
+        """Put image to cache and evict least recently used ones."""
+        size = image.sizeInBytes()
+        if image.isNull() or size > self.max_bytes:
+            return
+        with self.__lock:
+            if path in self.__cache:
+                return
+            self.__cache[path] = image
+            self.__cache_bytes += size
+            while self.__cache_bytes > self.max_bytes:
+                _, evicted = self.__cache.popitem(last=False)
+                self.__cache_bytes -= evicted.sizeInBytes()
+
+    def clear(self):
+        """Drop all cached images."""
+        with self.__lock:
+            self.__cache.clear()
+            self.__cache_bytes = 0
+
+    @property
+    def stats(self) -> dict:
+        """Cache statistics for tuning.
+
+        Contains number of hits and misses, hit rate,
+        number of decoded images, mean decode time in seconds
+        and size of cached images in bytes.
+        """
+        with self.__lock:
+            requests = self.__hits + self.__misses
+            return {
+                'hits': self.__hits,
+                'misses': self.__misses,
+                'hit_rate': self.__hits / requests if requests else 0.,
+                'decodes': self.__decodes,
+                'mean_decode_time': self.__decode_time / self.__decodes if self.__decodes else 0.,
+                'cached_bytes': self.__cache_bytes,
+            }
@@ -0,0 +1,417 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtCore import Qt
+
+import os
+import queue
+import struct
+import threading
+import time
+import typing
+
+from . import Annotations
+from .UndoRedo import AddCommand, PaintCommand
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .Canvas import Canvas
+
+
+class Journal:
+    """Crash-safe log of markup history of working image.
+
+    Every history change is appended to a per-image journal file by
+    background thread, which calls fsync for batches of records.
+    Journal starts with a snapshot of the scene, so it can be replayed
+    on its own. When image is switched, its journal is removed;
+    journals left after crash are replayed when image is opened again.
+    Journal is periodically compacted to a snapshot of current history:
+    GUI thread copies geometry of items or mask patches, writing thread
+    encodes them. History with replaced items can't be encoded, such
+    journal is compacted after the replace commands leave bounded history.
+    """
+
+    DIRECTORY = '.dl_markup_journal'
+    """Subdirectory of output directory with journals."""
+
+    SUFFIX = '.journal'
+
+    CLEAR, BASE, ADD, UNDO, REDO, REPLACE, MASK, PATCH = range(8)
+    """Record types: clear scene, add items without history,
+    add item by command, undo and redo actions, replace items by command,
+    set mask buffer without history, paint mask patch by command."""
+
+    _RECORD = struct.Struct('<BI')
+    _PAIR = struct.Struct('<II')
+    _RECT = struct.Struct('<iiii')
+
+    def __init__(
+            self,
+            canvas: 'Canvas',
+            sync_interval: float = 1.,
+            compact_records: int = 1000):
+        """Create journal and start writing thread.
+
+        :param canvas: canvas, which history is recorded
+        :param sync_interval: max time in seconds between fsync calls
+        :param compact_records: number of records, after which journal is compacted
+        """
+        self.canvas = canvas
+        self.sync_interval = sync_interval
+        self.compact_records = compact_records
+        self.path = None
+        self.__records = 0
+        self.__muted = False
+        self.__queue = queue.Queue()
+        self.__thread = threading.Thread(
+            target=self.__write, name='dl_markup-journal', daemon=True)
+        self.__thread.start()
+
+        undo_redo = canvas.undo_redo
+        undo_redo.itemAdded.connect(self.__onItemAdded)
+        undo_redo.itemsReplaced.connect(self.__onItemsReplaced)
+        undo_redo.undone.connect(
+            lambda count: self.__append(self.UNDO, struct.pack('<I', count)))
+        undo_redo.redone.connect(
+            lambda count: self.__append(self.REDO, struct.pack('<I', count)))
+        undo_redo.cleared.connect(lambda: self.__append(self.CLEAR))
+
+    @classmethod
+    def journalPath(cls, output_dir: str, image_name: str) -> str:
+        """Return journal path of image.
+
+        :param output_dir: directory of saved masks
+        :param image_name: name of image file
+        """
+        return os.path.join(output_dir, cls.DIRECTORY, image_name + cls.SUFFIX)
+
+    @classmethod
+    def unfinished(cls, output_dir: str) -> typing.List[str]:
+        """Return names of images, which have journals left after crash.
+
+        :param output_dir: directory of saved masks
+        """
+        directory = os.path.join(output_dir, cls.DIRECTORY)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            name[:-len(cls.SUFFIX)] for name in os.listdir(directory)
+            if name.endswith(cls.SUFFIX))
+
+    @classmethod
+    def _encode(cls, kind: int, payload: bytes = b'') -> bytes:
+        return cls._RECORD.pack(kind, len(payload)) + payload
+
+    @classmethod
+    def read(cls, path: str) -> typing.List[typing.Tuple[int, bytes]]:
+        """Read complete records of journal.
+
+        Record, which was partially written before crash, is skipped.
+
+        :param path: journal path
+        """
+        with open(path, 'rb') as f:
+            data = f.read()
+        records = []
+        offset = 0
+        while offset + cls._RECORD.size <= len(data):
+            kind, size = cls._RECORD.unpack_from(data, offset)
+            offset += cls._RECORD.size
+            if offset + size > len(data):
+                break
+            records.append((kind, data[offset:offset + size]))
+            offset += size
+        return records
+
+    @staticmethod
+    def _encodeImage(image: QtGui.QImage) -> bytes:
+        data = QtCore.QByteArray()
+        buffer = QtCore.QBuffer(data)
+        buffer.open(QtCore.QIODevice.WriteOnly)
+        image.save(buffer, 'PNG')
+        buffer.close()
+        return bytes(data)
+
+    @staticmethod
+    def _decodeImage(data: bytes) -> QtGui.QImage:
+        image = QtGui.QImage.fromData(data, 'PNG')
+        return image.convertToFormat(QtGui.QImage.Format_RGB32)
+
+    def begin(self, output_dir: str, image_name: str) -> bool:
+        """Start journal of new working image.
+
+        Journal, which is left after crash, is replayed.
+
+        :param output_dir: directory of saved masks
+        :param image_name: name of image file
+        :return: True, if unsaved changes were restored from journal
+        """
+        self.path = self.journalPath(output_dir, image_name)
+        restored = False
+        if os.path.exists(self.path):
+            records = self.read(self.path)
+            self.replay(records)
+            restored = bool(records)
+            print(f"Restored {len(records)} journal records from", self.path)
+        self.__records = 0
+        snapshot = self.snapshot()
+        if snapshot is not None:
+            self.__queue.put(('rewrite', self.path, snapshot))
+        elif not restored:
+            # history can't be encoded, but it starts with empty scene
+            self.__queue.put(('rewrite', self.path, lambda: self._encode(self.CLEAR)))
+        return restored
+
+    def replay(self, records: typing.List[typing.Tuple[int, bytes]]):
+        """Apply records to canvas without recording them.
+
+        :param records: pairs of record type and payload
+        """
+        canvas = self.canvas
+        self.__muted = True
+        try:
+            with canvas.scene.bulkInsert():
+                for kind, payload in records:
+                    if kind == self.CLEAR:
+                        canvas.clear()
+                    elif kind == self.BASE:
+                        items = Annotations.loads(payload, canvas.scene)
+                        canvas.vertex_index.addItems(items)
+                    elif kind == self.ADD:
+                        for item in Annotations.loads(payload):
+                            canvas.undo_redo.insert_in_undo_redo_add(item)
+                    elif kind == self.UNDO:
+                        canvas.undo_redo.undo(struct.unpack('<I', payload)[0])
+                    elif kind == self.REDO:
+                        canvas.undo_redo.redo(struct.unpack('<I', payload)[0])
+                    elif kind == self.REPLACE:
+                        canvas.undo_redo.insert_in_undo_redo_replace(self.__replacedItems(payload))
+                    elif kind == self.MASK:
+                        image = self._decodeImage(payload)
+                        canvas.scene.mask_item.setPatch(image.rect(), image)
+                    elif kind == self.PATCH:
+                        command = PaintCommand.restored(canvas.scene.mask_item, *self.__patches(payload))
+                        command.execute()
+                        canvas.undo_redo.insert_in_undo_redo(command)
+        finally:
+            self.__muted = False
+
+    def __replacedItems(
+            self,
+            payload: bytes) -> typing.List[typing.Tuple[QtWidgets.QGraphicsItem, QtWidgets.QGraphicsItem]]:
+        """Decode replaced items and find them on scene."""
+        pairs = []
+        offset = 0
+        while offset < len(payload):
+            old_size, new_size = self._PAIR.unpack_from(payload, offset)
+            offset += self._PAIR.size
+            old_data = payload[offset:offset + old_size]
+            offset += old_size
+            new = Annotations.loads(payload[offset:offset + new_size])
+            offset += new_size
+            # item is found by its encoding among items at its place
+            old, = Annotations.loads(old_data)
+            rect = old.boundingRect().adjusted(-1, -1, 1, 1)
+            for item in self.canvas.scene.items(rect, Qt.ContainsItemBoundingRect):
+                if Annotations.isAnnotation(item) and Annotations.dumps([item]) == old_data:
+                    pairs.append((item, new[0] if new else None))
+                    break
+        return pairs
+
+    def __patches(self, payload: bytes) -> typing.Tuple[QtCore.QRect, QtGui.QImage, QtGui.QImage]:
+        """Decode changed rectangle of mask and its patches before and after painting."""
+        rect = QtCore.QRect(*self._RECT.unpack_from(payload))
+        offset = self._RECT.size
+        before_size, after_size = self._PAIR.unpack_from(payload, offset)
+        offset += self._PAIR.size
+        before = self._decodeImage(payload[offset:offset + before_size])
+        offset += before_size
+        after = self._decodeImage(payload[offset:offset + after_size])
+        return rect, before, after
+
+    def snapshot(self, added: QtWidgets.QGraphicsItem = None) -> typing.Optional[typing.Callable[[], bytes]]:
+        """Capture current state of canvas.
+
+        Geometry of items or patches of mask are copied, returned function
+        encodes them as journal records and can be called in another thread.
+        Return None if history can't be encoded (replaced items).
+
+        :param added: item, which is being added by new command
+        """
+        scene = self.canvas.scene
+        undo, redo = self.canvas.undo_redo.commands
+        if added is not None:
+            # new command clears redo history
+            redo = []
+        if all(isinstance(command, PaintCommand) for command in undo + redo) and scene.mask_item is not None:
+            return self.__maskSnapshot(undo, redo, added)
+        if not all(isinstance(command, AddCommand) for command in undo + redo):
+            return None
+        undo = [command.item for command in undo]
+        redo = [command.item for command in redo]
+        if added is not None:
+            undo.append(added)
+        in_history = {id(item) for item in undo}
+        base = Annotations.copyGeometry(
+            item for item in Annotations.annotationItems(scene)
+            if id(item) not in in_history)
+        history = [Annotations.copyGeometry([item]) for item in undo + redo]
+
+        def encode() -> bytes:
+            records = [
+                self._encode(self.CLEAR),
+                self._encode(self.BASE, Annotations.dumpsGeometry(base)),
+            ]
+            for geometry in history:
+                records.append(self._encode(self.ADD, Annotations.dumpsGeometry(geometry)))
+            if redo:
+                records.append(self._encode(self.UNDO, struct.pack('<I', len(redo))))
+            return b''.join(records)
+        return encode
+
+    def __maskSnapshot(
+            self,
+            undo: typing.List[PaintCommand],
+            redo: typing.List[PaintCommand],
+            added: typing.Optional[QtWidgets.QGraphicsItem]) -> typing.Callable[[], bytes]:
+        """Capture mask buffer and patches of raster history."""
+        # shallow copy is detached on next painting into the mask
+        mask = QtGui.QImage(self.canvas.scene.mask_item.image)
+        undo = [command.patches for command in undo]
+        redo = [command.patches for command in redo]
+        added = None if added is None else Annotations.copyGeometry([added])
+
+        def encode() -> bytes:
+            # mask before history is restored from patches of undo commands
+            base = mask.copy()
+            painter = QtGui.QPainter(base)
+            painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+            for rect, before, _ in reversed(undo):
+                painter.drawImage(rect.topLeft(), before)
+            painter.end()
+            records = [
+                self._encode(self.CLEAR),
+                self._encode(self.MASK, self._encodeImage(base)),
+            ]
+            for rect, before, after in undo + redo:
+                before, after = self._encodeImage(before), self._encodeImage(after)
+                records.append(self._encode(self.PATCH, b''.join([
+                    self._RECT.pack(rect.x(), rect.y(), rect.width(), rect.height()),
+                    self._PAIR.pack(len(before), len(after)),
+                    before,
+                    after,
+                ])))
+            if added is not None:
+                records.append(self._encode(self.ADD, Annotations.dumpsGeometry(added)))
+            if redo:
+                records.append(self._encode(self.UNDO, struct.pack('<I', len(redo))))
+            return b''.join(records)
+        return encode
+
+    def compact(self, added: QtWidgets.QGraphicsItem = None):
+        """Replace journal with snapshot of current state.
+
+        :param added: item, which is being added by new command
+        """
+        if self.path is None:
+            return
+        snapshot = self.snapshot(added)
+        if snapshot is None:
+            return
+        self.__records = 0
+        self.__queue.put(('rewrite', self.path, snapshot))
+
+    def discard(self):
+        """Remove journal of working image, its changes are saved or rejected."""
+        if self.path is not None:
+            self.__queue.put(('remove', self.path, None))
+        self.path = None
+
+    def close(self):
+        """Write all records to disk and stop writing thread."""
+        self.__queue.put(None)
+        self.__thread.join()
+
+    def __onItemAdded(self, item: QtWidgets.QGraphicsItem):
+        # command adding item isn't in history yet
+        self.__append(self.ADD, Annotations.dumps([item]), added=item)
+
+    def __onItemsReplaced(
+            self,
+            pairs: typing.List[typing.Tuple[QtWidgets.QGraphicsItem, QtWidgets.QGraphicsItem]]):
+        chunks = []
+        for old, new in pairs:
+            old_data = Annotations.dumps([old])
+            new_data = Annotations.dumps([] if new is None else [new])
+            chunks.extend([self._PAIR.pack(len(old_data), len(new_data)), old_data, new_data])
+        # snapshot can't encode history with replaced items
+        self.__append(self.REPLACE, b''.join(chunks), compact=False)
+
+    def __append(
+            self,
+            kind: int,
+            payload: bytes = b'',
+            added: QtWidgets.QGraphicsItem = None,
+            compact: bool = True):
+        if self.__muted or self.path is None:
+            return
+        self.__queue.put(('append', self.path, self._encode(kind, payload)))
+        self.__records += 1
+        if compact and self.__records >= self.compact_records:
+            self.compact(added)
+
+    def __write(self):
+        """Apply queued operations to files (runs in writing thread)."""
+        file = None
+        file_path = None
+        last_sync = time.monotonic()
+        dirty = False
+        while True:
+            timeout = None
+            if dirty:
+                timeout = max(0., last_sync + self.sync_interval - time.monotonic())
+            try:
+                op = self.__queue.get(timeout=timeout)
+            except queue.Empty:
+                op = 'sync'
+            if op is None or op == 'sync' or (op[1] != file_path and file is not None):
+                # sync before switching files and on timeout
+                if file is not None and dirty:
+                    file.flush()
+                    os.fsync(file.fileno())
+                dirty = False
+                last_sync = time.monotonic()
+                if op is None:
+                    break
+                if op == 'sync':
+                    continue
+            action, path, data = op
+            try:
+                if action == 'append':
+                    if file_path != path:
+                        if file is not None:
+                            file.close()
+                        os.makedirs(os.path.dirname(path), exist_ok=True)
+                        file = open(path, 'ab')
+                        file_path = path
+                    file.write(data)
+                    dirty = True
+                    continue
+                if file_path == path:
+                    file.close()
+                    file, file_path = None, None
+                if action == 'rewrite':
+                    # snapshot is encoded here, not in GUI thread
+                    data = data()
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp_path = path + '.tmp'
+                    with open(tmp_path, 'wb') as tmp:
+                        tmp.write(data)
+                        tmp.flush()
+                        os.fsync(tmp.fileno())
+                    os.replace(tmp_path, path)
+                elif action == 'remove' and os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                print("Journal error:", e)
+        if file is not None:
+            file.close()
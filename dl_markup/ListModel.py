@@ -2,6 +2,9 @@ from PyQt5 import QtCore
 from PyQt5.QtCore import Qt
 from PyQt5.QtCore import QModelIndex
 
+import typing
+from bisect import bisect_left, insort
+
 
 class ListModel(QtCore.QAbstractListModel):
     """Store list data according to MVC pattern."""
@@ -13,6 +16,12 @@ class ListModel(QtCore.QAbstractListModel):
         """
         super().__init__(*args, **kwargs)
         self.items = items or []
+        # permanent number of every item, built on first lookup;
+        # row is the number minus count of removed items before it,
+        # so removal doesn't shift numbers of other items
+        self.__numbers = None
+        self.__removed = []
+        self.__next_number = 0
 
     def data(self, index: QModelIndex, role: int):
         """Return stored data by index.
@@ -32,5 +41,152 @@ class ListModel(QtCore.QAbstractListModel):
 
         :param items: new value for data
         """
+        self.beginResetModel()
         self.items = items
-        self.layoutChanged.emit()
+        self.__numbers = None
+        self.endResetModel()
+
+    def appendItems(self, items: list):
+        """Append data to the end and notify observers about new rows only.
+
+        :param items: values to append
+        """
+        if not items:
+            return
+        first = len(self.items)
+        self.beginInsertRows(QModelIndex(), first, first + len(items) - 1)
+        self.items.extend(items)
+        if self.__numbers is not None:
+            end = self.__next_number + len(items)
+            self.__numbers.update(zip(items, range(self.__next_number, end)))
+            self.__next_number = end
+        self.endInsertRows()
+
+    def rowOf(self, item) -> typing.Optional[int]:
+        """Return row of value or None, if it isn't stored.
+
+        :param item: stored value
+        """
+        if self.__numbers is None:
+            self.__numbers = {item: row for row, item in enumerate(self.items)}
+            self.__removed = []
+            self.__next_number = len(self.items)
+        number = self.__numbers.get(item)
+        if number is None:
+            return None
+        return number - bisect_left(self.__removed, number)
+
+    def removeItems(self, items: list):
+        """Remove data and notify observers about removed rows only.
+
+        Views keep selection and scroll position of other rows.
+
+        :param items: values to remove, unknown values are ignored
+        """
+        rows = sorted(
+            (row for row in map(self.rowOf, items) if row is not None),
+            reverse=True)
+        if not rows:
+            return
+        # remove runs of adjacent rows from the end, so other rows keep indexes
+        last = rows[0]
+        for i, row in enumerate(rows):
+            if i + 1 == len(rows) or rows[i + 1] != row - 1:
+                self.beginRemoveRows(QModelIndex(), row, last)
+                for item in self.items[row:last + 1]:
+                    insort(self.__removed, self.__numbers.pop(item))
+                del self.items[row:last + 1]
+                self.endRemoveRows()
+                if i + 1 < len(rows):
+                    last = rows[i + 1]
+        if len(self.__removed) > len(self.items):
+            # renumber after as many removals as there are items left
+            self.__numbers = None
+
+
+class PagedListModel(QtCore.QAbstractListModel):
+    """Store sorted list, which is fetched by pages while view is scrolled.
+
+    Only fetched rows are kept, so the first rows of a huge list
+    are shown without going through all of its items.
+    """
+
+    def __init__(
+            self,
+            fetch: typing.Callable[[str, int], typing.List[str]],
+            accept: typing.Callable[[str], bool] = None,
+            page_size: int = 256,
+            *args,
+            **kwargs):
+        """Create a new PagedListModel object.
+
+        :param fetch: function, which returns sorted items following the given
+            one (or the first items for empty string), at most the given number
+        :param accept: function, which checks if fetched item is shown
+        :param page_size: number of items fetched at once
+        """
+        super().__init__(*args, **kwargs)
+        self.fetch = fetch
+        self.accept = accept
+        self.page_size = page_size
+        self.items = []
+        self.__last = ''
+        self.__complete = False
+
+    def data(self, index: QModelIndex, role: int):
+        """Return stored data by index.
+
+        :param index: index object
+        :param role: role from Qt enum values
+        """
+        if role == Qt.DisplayRole:
+            return self.items[index.row()]
+
+    def rowCount(self, index: QModelIndex):
+        """Return number of fetched items."""
+        return len(self.items)
+
+    def reset(self):
+        """Drop fetched items, the first page is fetched again by view."""
+        self.beginResetModel()
+        self.items = []
+        self.__last = ''
+        self.__complete = False
+        self.endResetModel()
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        """Check if there can be items after fetched ones."""
+        return not self.__complete
+
+    def fetchMore(self, parent: QModelIndex):
+        """Fetch the next page of items."""
+        if self.__complete:
+            return
+        page = self.fetch(self.__last, self.page_size)
+        if len(page) < self.page_size:
+            self.__complete = True
+        if not page:
+            return
+        self.__last = page[-1]
+        if self.accept is not None:
+            page = [item for item in page if self.accept(item)]
+        if not page:
+            return
+        first = len(self.items)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self.items.extend(page)
+        self.endInsertRows()
+
+    def rowOf(self, item) -> typing.Optional[int]:
+        """Return row of value or None, if it isn't shown.
+
+        Pages are fetched until value is reached.
+
+        :param item: stored value
+        """
+        while not self.__complete and self.__last < item:
+            self.fetchMore(QModelIndex())
+        row = bisect_left(self.items, item)
+        if row < len(self.items) and self.items[row] == item:
+            return row
+        return None
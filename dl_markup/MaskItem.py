@@ -0,0 +1,87 @@
+from PyQt5 import QtGui, QtCore, QtWidgets
+
+
+class MaskItem(QtWidgets.QGraphicsItem):
+    """Drawing item that stores segmentation mask as image buffer.
+
+    Markup items are painted directly into the buffer, so memory
+    and paint cost don't depend on amount of drawn primitives.
+    Only changed rectangles of the buffer are repainted on canvas.
+    """
+
+    def __init__(self, width: int, height: int, *args, **kwargs):
+        """Initialize MaskItem.
+
+        :param width: width of the mask
+        :param height: height of the mask
+        """
+        super().__init__(*args, **kwargs)
+        self.__image = QtGui.QImage(
+            width, height, QtGui.QImage.Format_RGB32)
+        self.__image.fill(QtGui.QColor(0, 0, 0))
+        # paint receives exposed rectangle, so only it is redrawn
+        flag = QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption
+        self.setFlag(flag)
+
+    @property
+    def image(self) -> QtGui.QImage:
+        """Mask buffer."""
+        return self.__image
+
+    def rasterRect(self, item: QtWidgets.QGraphicsItem) -> QtCore.QRect:
+        """Return part of the buffer, which is covered by item.
+
+        :param item: item placed on scene
+        """
+        rect = item.sceneBoundingRect().toAlignedRect()
+        return rect.intersected(self.__image.rect())
+
+    def patch(self, rect: QtCore.QRect) -> QtGui.QImage:
+        """Copy part of the buffer.
+
+        :param rect: part of the buffer
+        """
+        return self.__image.copy(rect)
+
+    def setPatch(self, rect: QtCore.QRect, patch: QtGui.QImage):
+        """Replace part of the buffer.
+
+        :param rect: part of the buffer
+        :param patch: image of the same size as rect
+        """
+        painter = QtGui.QPainter(self.__image)
+        painter.setCompositionMode(QtGui.QPainter.CompositionMode_Source)
+        painter.drawImage(rect.topLeft(), patch)
+        painter.end()
+        self.update(QtCore.QRectF(rect))
+
+    def paintItem(self, item: QtWidgets.QGraphicsItem) -> QtCore.QRect:
+        """Paint item into the buffer and return changed rectangle.
+
+        Item is painted without antialiasing, so
+        mask contains only colors of the tools.
+
+        :param item: item placed on scene
+        """
+        rect = self.rasterRect(item)
+        painter = QtGui.QPainter(self.__image)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing, False)
+        painter.setClipRect(rect)
+        painter.setTransform(item.sceneTransform())
+        item.paint(painter, QtWidgets.QStyleOptionGraphicsItem(), None)
+        painter.end()
+        self.update(QtCore.QRectF(rect))
+        return rect
+
+    def boundingRect(self) -> QtCore.QRectF:
+        """Create bounding box for current item."""
+        return QtCore.QRectF(self.__image.rect())
+
+    def paint(
+            self,
+            painter: QtGui.QPainter,
+            option: QtWidgets.QStyleOptionGraphicsItem,
+            widget: QtWidgets.QWidget):
+        """Paint exposed part of the buffer."""
+        rect = option.exposedRect
+        painter.drawImage(rect, self.__image, rect)
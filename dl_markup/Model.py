@@ -2,34 +2,86 @@ from PyQt5.QtWidgets import QLineEdit
 from PyQt5.QtWidgets import QFileDialog
 from PyQt5.QtWidgets import QMessageBox
 from PyQt5.QtCore import QModelIndex
+from PyQt5.QtGui import QImage
 
+import getpass
 import os
 import typing
-import re
+from functools import partial
 
-from .ListModel import ListModel
+from .ListModel import ListModel, PagedListModel
 from .Canvas import Canvas
+from .Palette import Palette
+from .ClassMap import ClassMap
+from .SaveQueue import SaveQueue
+from .ImageLoader import ImageLoader
+from .TiledImageItem import TiledImageItem
+from . import Annotations
+from .Journal import Journal
+from .DirectoryScanner import DirectoryScanner
+from .StatusIndex import StatusIndex
+from .Superpixels import Superpixels
+from .SmartRegionTool import SmartRegion
 
 
 class Model:
     """Store application model according to MVC pattern."""
 
-    IMAGES_RE = re.compile(r'\w+.(?:jpg|jpeg|png|bmp)')
-    """Regex :regex:`\w+.(?:jpg|jpeg|png|bmp)` select image filenames."""
+    TILED_PIXELS = 64 * 2**20
+    """Images with more pixels are decoded by visible tiles."""
 
-    def __init__(self, canvas: Canvas, input_dir: str, output_dir: str):
+    MASK_FORMATS = ('rgb', 'index', 'npy')
+    """Colored mask, palette PNG with class ids or numpy array with class ids."""
+
+    def __init__(
+            self,
+            canvas: Canvas,
+            input_dir: str,
+            output_dir: str,
+            mask_format: str = 'rgb',
+            recursive: bool = False,
+            annotator: str = None):
         """Initialize all data objects.
 
         :param canvas: Canvas object for drawing
         :param input_dir: Directory of images for markup
         :param output_dir: Directory of saved image segmentation mask
+        :param mask_format: Format of saved mask, one of MASK_FORMATS
+        :param recursive: List images in subdirectories of input directory
+        :param annotator: Name of user, who saves masks (login name by default)
         """
+        assert mask_format in self.MASK_FORMATS, f"Unknown mask format {mask_format}"
         self.canvas = canvas
-        self.saved_items = self.canvas.scene.items()
+        self.maskFormat = mask_format
+        self.classMap = ClassMap(Palette.colors_hex)
+        self.saveQueue = SaveQueue()
+        self.imageLoader = ImageLoader()
+        self.superpixels = Superpixels()
+        # number of neighbour images decoded in advance
+        self.prefetchNext = 2
+        self.prefetchPrevious = 1
+        self.canvas.undo_redo.mark_saved()
         self.inputDirectory = QLineEdit(os.path.abspath(input_dir))
         self.outputDirectory = QLineEdit(os.path.abspath(output_dir))
         self.listModel = ListModel()
+        self.annotator = annotator or getpass.getuser()
+        self.scanner = DirectoryScanner(recursive)
+        self.statusIndex = self._openStatusIndex()
+        # images without masks are paged from status index in sorted order
+        self.unlabeledModel = PagedListModel(
+            lambda after, limit: self.statusIndex.next(StatusIndex.UNLABELED, after, limit),
+            # index may contain images of other input directories
+            lambda name: self.listModel.rowOf(name) is not None)
+        self.scanner.found.connect(self.listModel.appendItems)
+        self.scanner.found.connect(lambda names: self.statusIndex.addImages(names))
+        self.scanner.removed.connect(self.listModel.removeItems)
+        self.scanner.removed.connect(lambda names: self.statusIndex.removeImages(names))
+        self.scanner.finished.connect(
+            lambda total: print(f"Found {total} images in", self.inputDirectory.text()))
         self.workingImageName = None
+        self.journal = Journal(canvas)
+        # images with unsaved changes left after crash, they are restored when opened
+        self.unfinished = Journal.unfinished(self.outputDirectory.text())
         if input_dir is not None:
             self.updateFileList()
 
@@ -45,6 +97,55 @@ class Model:
         text = QFileDialog.getExistingDirectory()
         if text:
             self.outputDirectory.setText(text)
+            self.updateStatusIndex()
+
+    def updateStatusIndex(self):
+        """Open status index of selected output directory."""
+        # masks, which are being saved, update the previous index
+        self.saveQueue.flush()
+        self.statusIndex.close()
+        self.statusIndex = self._openStatusIndex()
+        self.scanner.submit(self.statusIndex.addImages, list(self.listModel.items))
+        self.unlabeledModel.reset()
+
+    def _openStatusIndex(self) -> StatusIndex:
+        """Open status index of output directory, masks are imported in scanning thread."""
+        index = StatusIndex(self.outputDirectory.text())
+        if index.importing:
+            self.scanner.submit(index.importMasks, self.outputDirectory.text())
+        return index
+
+    def nextUnlabeled(self) -> typing.Optional[int]:
+        """Return row of the next unlabeled image after working one.
+
+        Images are ordered by name, search continues from the beginning
+        of the list. Return None if all listed images are labeled.
+        """
+        start = self.workingImageName or ''
+        # search after working image, then from the beginning up to it
+        for after, until in ((start, None), ('', start)):
+            names = self.statusIndex.next(StatusIndex.UNLABELED, after)
+            while names:
+                for name in names:
+                    if until is not None and name >= until:
+                        return None
+                    row = self.listModel.rowOf(name)
+                    # index may contain images of other input directories
+                    if row is not None and name != self.workingImageName:
+                        return row
+                names = self.statusIndex.next(StatusIndex.UNLABELED, names[-1])
+        return None
+
+    def unfinishedRow(self) -> typing.Optional[int]:
+        """Return row of the first listed image, which has unsaved changes left after crash.
+
+        Return None if no such image is listed.
+        """
+        for name in self.unfinished:
+            row = self.listModel.rowOf(name)
+            if row is not None:
+                return row
+        return None
 
     def open(self, get_indexes: typing.Callable[[], typing.List[QModelIndex]]):
         """Load selected image to canvas.
@@ -59,22 +160,97 @@ class Model:
         if indexes:
             index = indexes[0].row()
             if self.workingImageName != self.listModel.items[index]:
+                if not self._canOpen(self._imagePath(self.listModel.items[index])):
+                    return
+                # changes of previous image are either saved or rejected
+                self.journal.discard()
                 self.workingImageName = self.listModel.items[index]
-                img_path = os.path.join(
-                    self.inputDirectory.text(),
-                    self.workingImageName
-                )
+                img_path = self._imagePath(self.workingImageName)
                 print("Reading image from", img_path)
-                self.canvas.updateBackgroundImage(img_path)
-                self.saved_items = self.canvas.scene.items()
+                if self._isHuge(img_path):
+                    self.canvas.updateBackgroundTiles(img_path)
+                    self.canvas.superpixels = None
+                else:
+                    self.canvas.updateBackgroundImage(self.imageLoader.get(img_path))
+                    print("Image cache:", self.imageLoader.stats)
+                    cache_dir = os.path.join(self.outputDirectory.text(), Superpixels.DIRECTORY)
+                    self.canvas.superpixels = self.superpixels.request(img_path, cache_dir)
+                self._loadAnnotations()
+                self.canvas.undo_redo.mark_saved()
+                self.journal.begin(self.outputDirectory.text(), self.workingImageName)
+                self._prefetch(index)
+
+    def close(self):
+        """Finish writing of masks and journal.
+
+        Journal is kept if there are unsaved changes,
+        so they are restored when image is opened again.
+        """
+        self.scanner.cancel()
+        self.superpixels.close()
+        SmartRegion.closeSegmenter()
+        self.saveQueue.close()
+        self.statusIndex.close()
+        if not self.canvas.undo_redo.modified:
+            self.journal.discard()
+        self.journal.close()
+
+    def _imagePath(self, name: str) -> str:
+        """Return path of image in input directory."""
+        return os.path.join(self.inputDirectory.text(), name)
+
+    def _maskPath(self) -> str:
+        """Return path of colored mask of working image."""
+        return os.path.join(self.outputDirectory.text(), self.workingImageName)
+
+    def _loadAnnotations(self):
+        """Restore editable annotations saved with the mask of working image."""
+        scene = self.canvas.scene
+        if scene.mask_item is not None:
+            # raster backend doesn't keep separate items
+            return
+        path = Annotations.sidecarPath(self._maskPath())
+        # annotations of this image can be still being saved
+        self.saveQueue.flush(path)
+        if os.path.exists(path):
+            with scene.bulkInsert():
+                items = Annotations.load(path, scene)
+            self.canvas.vertex_index.addItems(items)
+            print(f"Loaded {len(items)} annotations from", path)
+
+    def _isHuge(self, path: str) -> bool:
+        """Check if image is too large to be decoded at once."""
+        size = TiledImageItem.imageSize(path)
+        return size.width() * size.height() > self.TILED_PIXELS
+
+    def _canOpen(self, path: str) -> bool:
+        """Check if huge image can be shown by tiles, report reason otherwise."""
+        if not self._isHuge(path):
+            return True
+        try:
+            TiledImageItem.check(path)
+        except ValueError as e:
+            print("Can't open image:", e)
+            return False
+        return True
+
+    def _prefetch(self, index: int):
+        """Start decoding of images around selected one.
+
+        :param index: index of selected image
+        """
+        items = self.listModel.items
+        names = items[index + 1:index + 1 + self.prefetchNext] + \
+            items[max(0, index - self.prefetchPrevious):index][::-1]
+        paths = [self._imagePath(name) for name in names]
+        self.imageLoader.prefetch(path for path in paths if not self._isHuge(path))
 
     def have_unsaved_changes(self):
-        """Check if current items on canvas are the same as saved before.
+        """Check if canvas has been modified since last saving.
 
-        Otherwise pop up a MessageBox with suggestion to save image.
+        If so, pop up a MessageBox with suggestion to save image.
         """
-        items = self.canvas.scene.items()
-        if self.saved_items != items:
+        if self.canvas.undo_redo.modified:
             msg = QMessageBox()
             msg.setIcon(QMessageBox.Question)
             msg.setText("The image has been modified.")
@@ -85,25 +261,72 @@ class Model:
                 self.save()
 
     def save(self):
-        """Save segmentation to file."""
+        """Save segmentation to file.
+
+        Mask is rendered immediately, while encoding
+        and writing are done by background threads.
+        """
         if self.workingImageName is None:
             print("Working image is unknown. Skip saving.")
             return
-        segm = self.canvas.scene.segm
-        out_path = os.path.join(
-            self.outputDirectory.text(),
-            self.workingImageName
-        )
-        print("Saving image to", out_path)
-        segm.save(out_path)
-        self.saved_items = self.canvas.scene.items()
+        scene = self.canvas.scene
+        segm = scene.segm
+        out_path = self._maskPath()
+        name = self.workingImageName
+        index = self.statusIndex
+        # images found by recursive scan keep their subdirectories
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        if scene.mask_item is None:
+            data = Annotations.dumps(
+                Annotations.annotationItems(scene))
+            self.saveQueue.submit(
+                Annotations.sidecarPath(out_path),
+                partial(self._writeBytes, data))
+        if self.maskFormat == 'rgb':
+            fmt = os.path.splitext(out_path)[1][1:]
+            print("Saving image to", out_path)
+            self.saveQueue.submit(
+                out_path,
+                partial(self._writeImage, segm, fmt=fmt, name=name, index=index))
+        else:
+            fmt = 'png' if self.maskFormat == 'index' else 'npy'
+            out_path = os.path.splitext(out_path)[0] + '.' + fmt
+            print("Saving class ids to", out_path)
+            self.saveQueue.submit(
+                out_path,
+                partial(self._writeClassIds, segm, fmt=fmt, name=name, index=index))
+        index.setStatus(name, StatusIndex.LABELED, self.annotator)
+        self.canvas.undo_redo.mark_saved()
+
+    @staticmethod
+    def _writeBytes(data: bytes, path: str):
+        """Write encoded annotations (called in background thread)."""
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def _writeImage(self, segm: QImage, path: str, fmt: str, name: str, index: StatusIndex):
+        """Write colored mask (called in background thread)."""
+        if not segm.save(path, fmt):
+            raise IOError(f"Can not write {fmt} image")
+        self._updateStatus(index, name, self.classMap.toIds(segm), path)
+
+    def _writeClassIds(self, segm: QImage, path: str, fmt: str, name: str, index: StatusIndex):
+        """Convert mask to class ids and write it (called in background thread)."""
+        ids = self.classMap.toIds(segm)
+        self.classMap.save(ids, path, fmt)
+        self._updateStatus(index, name, ids, path)
+
+    def _updateStatus(self, index: StatusIndex, name: str, ids, path: str):
+        """Store class statistics of written mask (called in background thread)."""
+        # temporary file keeps modification time, when it's moved
+        index.updateMask(name, ids, os.path.getmtime(path), self.annotator)
 
     def updateFileList(self):
-        """Update list of files in selected input directory."""
+        """Start scanning of selected input directory for images."""
         text = self.inputDirectory.text()
         if not text:
             return
-        files = [file for file in os.listdir(text)
-                 if re.fullmatch(self.IMAGES_RE, file)]
-        print("Updating file list:", files)
-        self.listModel.setItems(files)
+        # images appear in the list while directory is being scanned
+        self.listModel.setItems([])
+        self.unlabeledModel.reset()
+        self.scanner.start(text)
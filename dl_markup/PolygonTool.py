@@ -2,7 +2,7 @@ from PyQt5 import QtGui, QtCore, QtWidgets
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QPen, QBrush, QColor, QGradient
 
-from typing import Union
+from typing import Optional, Union
 
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
@@ -90,6 +90,52 @@ class VertexItem(QtWidgets.QGraphicsRectItem):
         self.outgoing_edge.setLine(0, 0, p2.x(), p2.y())
 
 
+class PolygonItem(QtWidgets.QGraphicsPolygonItem):
+    """Drawing item that represents filled polygon.
+
+    Shape is computed once, QGraphicsPolygonItem strokes
+    its outline on every hit-test.
+    """
+
+    def __init__(
+            self,
+            polygon: QtGui.QPolygonF,
+            color: Union[QColor, Qt.GlobalColor],
+            parent: QtWidgets.QGraphicsItem = None):
+        """Initialize PolygonItem.
+
+        :param polygon: points of polygon in parent coordinates
+        :param color: color of polygon
+        :param parent: parent layout object
+        """
+        super().__init__(polygon, parent)
+        self.setBrush(color)
+        self.setPen(color)
+        self.__shape = None
+
+    def setPolygon(self, polygon: QtGui.QPolygonF):
+        """Change points of polygon.
+
+        :param polygon: points of polygon in parent coordinates
+        """
+        super().setPolygon(polygon)
+        self.__shape = None
+
+    def setPen(self, pen: Union[QPen, QColor, Qt.GlobalColor, QGradient]):
+        """Change outline of polygon.
+
+        :param pen: outline pen
+        """
+        super().setPen(pen)
+        self.__shape = None
+
+    def shape(self) -> QtGui.QPainterPath:
+        """Return area covered by polygon and its outline."""
+        if self.__shape is None:
+            self.__shape = super().shape()
+        return self.__shape
+
+
 class Polygon:
     """Tool that draw polygon using VertexItems marked by user.
 
@@ -97,8 +143,14 @@ class Polygon:
     vertex, tool will draw QGraphicsPolygonItem and clear canvas from
     intermidiate vertecies and lines. User can undo existing
     QGraphicsPolygonItems.
+
+    New vertex snaps to the nearest vertex of committed polygons,
+    so neighbouring polygons can share borders.
     """
 
+    snap_distance = 8.
+    """Max distance in screen pixels to snapped vertex."""
+
     def __init__(self, canvas: 'Canvas', color: Union[QColor, Qt.GlobalColor]):
         """Initialize Polygon.
 
@@ -118,20 +170,19 @@ class Polygon:
         """
         scene_point = self.canvas.mapToScene(e.pos())
 
-        collidingItems = self.canvas.scene.items(scene_point)
-        collidingVertecies = [
-            item
-            for item in collidingItems
-            if isinstance(item, QtWidgets.QGraphicsRectItem)]
-
-        if collidingVertecies:
-            init_vertex = self.verticies[0]
+        vertex = self.vertexAt(scene_point)
+        if vertex is not None:
             # user click on first vertex
-            if init_vertex in collidingItems:
+            if vertex is self.verticies[0]:
                 self.drawPolygon()
                 self.clear()
             return
 
+        snapped = self.canvas.vertex_index.nearest(
+            scene_point, self.snap_distance / self.canvas.zoom)
+        if snapped is not None:
+            scene_point = snapped
+
         incoming_edge = \
             self.verticies[-1].outgoing_edge if self.verticies else None
 
@@ -139,11 +190,24 @@ class Polygon:
             incoming_edge,
             self.vertex_side,
             pen=self.color,
-            brush=self.color,
-            parent=self.canvas.scene.background_item)
+            brush=self.color)
         vertex.setPos(scene_point - vertex.rect().center())
+        self.canvas.scene.addItem(vertex)
         self.verticies.append(vertex)
 
+    def vertexAt(self, scene_point: QtCore.QPointF) -> Optional[VertexItem]:
+        """Return vertex of drawn polygon under point.
+
+        Only vertices of this polygon are checked,
+        so cost doesn't depend on number of items on scene.
+
+        :param scene_point: point in scene coordinates
+        """
+        for vertex in reversed(self.verticies):
+            if vertex.sceneBoundingRect().contains(scene_point):
+                return vertex
+        return None
+
     def mouseMoveEvent(self, e):
         """Draw a line that connect previous vertex and current mouse pos."""
         scene_point = self.canvas.mapToScene(e.pos())
@@ -177,10 +241,6 @@ class Polygon:
         points = QtGui.QPolygonF(
             vertex.scenePos() + vertex.rect().center()
             for vertex in self.verticies)
-        polygon = QtWidgets.QGraphicsPolygonItem(
-            points,
-            self.canvas.scene.background_item)
-        polygon.setBrush(self.color)
-        polygon.setPen(self.color)
+        polygon = PolygonItem(points, self.color)
         # undo-redo only polygon, not verticies
         self.canvas.undo_redo.insert_in_undo_redo_add(polygon)
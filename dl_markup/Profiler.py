@@ -0,0 +1,298 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+import functools
+import json
+import math
+import os
+import threading
+import time
+import typing
+from collections import deque
+
+import numpy as np
+
+
+class RollingHistogram:
+    """Histogram of the last durations with logarithmic bins.
+
+    Adding a value costs O(1): the oldest value leaves its bin
+    when window is full.
+    """
+
+    MIN_SECONDS = 1e-6
+    BINS_PER_DECADE = 8
+    DECADES = 7
+    """Bins cover durations from 1 us to 10 s."""
+
+    def __init__(self, window: int = 1024):
+        """Create empty histogram.
+
+        :param window: number of the last values, which are counted
+        """
+        self.window = window
+        self.counts = np.zeros(self.BINS_PER_DECADE * self.DECADES + 1, dtype=np.int64)
+        self.total = 0
+        self.sum = 0.
+        self.__bins = deque()
+        self.__values = deque()
+
+    def add(self, seconds: float):
+        """Count duration.
+
+        :param seconds: duration in seconds
+        """
+        ratio = max(seconds, self.MIN_SECONDS) / self.MIN_SECONDS
+        b = min(len(self.counts) - 1, int(math.log10(ratio) * self.BINS_PER_DECADE))
+        self.counts[b] += 1
+        self.sum += seconds
+        self.total += 1
+        self.__bins.append(b)
+        self.__values.append(seconds)
+        if len(self.__bins) > self.window:
+            self.counts[self.__bins.popleft()] -= 1
+            self.sum -= self.__values.popleft()
+
+    def binEdge(self, b: int) -> float:
+        """Return lower bound of bin in seconds.
+
+        :param b: bin index
+        """
+        return self.MIN_SECONDS * 10 ** (b / self.BINS_PER_DECADE)
+
+    def percentile(self, q: float) -> float:
+        """Return upper bound of bin, which contains q-th percentile.
+
+        :param q: percentile in range [0, 100]
+        """
+        count = len(self.__bins)
+        if not count:
+            return 0.
+        b = int(np.searchsorted(np.cumsum(self.counts), math.ceil(count * q / 100)))
+        return self.binEdge(min(b, len(self.counts) - 1) + 1)
+
+    @property
+    def mean(self) -> float:
+        """Mean of the last durations."""
+        return self.sum / len(self.__bins) if self.__bins else 0.
+
+    def __len__(self) -> int:
+        """Return number of durations in window."""
+        return len(self.__bins)
+
+
+class Profiler:
+    """Opt-in timing of application hot paths.
+
+    Instrumented methods are replaced with timing wrappers only when
+    profiler is enabled, so disabled profiler costs nothing.
+    Durations are collected to rolling histograms and to trace
+    in Chrome trace event format, which can be opened by
+    chrome://tracing or https://ui.perfetto.dev.
+    """
+
+    def __init__(self, max_events: int = 200000, window: int = 1024):
+        """Create disabled profiler.
+
+        :param max_events: number of the last trace events, which are kept
+        :param window: number of the last durations in histograms
+        """
+        self.window = window
+        self.enabled = False
+        self.histograms = {}
+        self.__events = deque(maxlen=max_events)
+        self.__lock = threading.Lock()
+        self.__origin = time.perf_counter()
+        self.__patched = []
+        self.__frames = deque()
+        self.__input_time = None
+        self.latency = RollingHistogram(window)
+
+    def instrument(
+            self,
+            cls: type,
+            name: str,
+            label: str = None,
+            on_exit: typing.Callable[[float, float], None] = None):
+        """Time calls of method or property getter of class.
+
+        :param cls: class, which attribute is replaced
+        :param name: name of method or property
+        :param label: name in statistics and trace ('Class.name' by default)
+        :param on_exit: called with start and end time of every call
+        """
+        label = label or f'{cls.__name__}.{name.split("__")[-1]}'
+        original = cls.__dict__[name]
+        if isinstance(original, property):
+            replacement = property(self.__wrap(original.fget, label, on_exit))
+        else:
+            replacement = self.__wrap(original, label, on_exit)
+        setattr(cls, name, replacement)
+        self.__patched.append((cls, name, original))
+
+    def __wrap(self, func, label: str, on_exit):
+        record = self.record
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                record(label, start, end)
+                if on_exit is not None:
+                    on_exit(start, end)
+        return wrapper
+
+    def instrumentHotPaths(self):
+        """Time painting, drawing, mask rendering, saving, opening and decoding."""
+        from .BrushTool import Brush
+        from .Canvas import Canvas
+        from .ImageLoader import ImageLoader
+        from .Model import Model
+        from .Scene import Scene
+        from .TiledImageItem import TiledImageItem
+
+        self.instrument(Canvas, 'paintEvent', on_exit=self.__painted)
+        self.instrument(Canvas, 'mouseMoveEvent', on_exit=self.__input)
+        self.instrument(Brush, 'mouseMoveEvent')
+        self.instrument(Scene, 'segm')
+        self.instrument(Model, 'save')
+        self.instrument(Model, 'open')
+        self.instrument(ImageLoader, '_ImageLoader__decode', 'ImageLoader.decode')
+        self.instrument(TiledImageItem, '_TiledImageItem__decode', 'TiledImageItem.decode')
+
+    def enable(self):
+        """Instrument hot paths and start collecting statistics."""
+        if not self.enabled:
+            self.instrumentHotPaths()
+            self.enabled = True
+
+    def disable(self):
+        """Restore original methods."""
+        for cls, name, original in reversed(self.__patched):
+            setattr(cls, name, original)
+        self.__patched.clear()
+        self.enabled = False
+
+    def record(self, label: str, start: float, end: float):
+        """Store duration of call.
+
+        :param label: name of timed code
+        :param start: perf_counter value before call
+        :param end: perf_counter value after call
+        """
+        with self.__lock:
+            histogram = self.histograms.get(label)
+            if histogram is None:
+                histogram = self.histograms[label] = RollingHistogram(self.window)
+            histogram.add(end - start)
+            self.__events.append((label, start, end, threading.get_ident()))
+
+    def __input(self, start: float, end: float):
+        if self.__input_time is None:
+            self.__input_time = start
+
+    def __painted(self, start: float, end: float):
+        """Count frame and latency from the first unpainted input."""
+        self.__frames.append(end)
+        while self.__frames and self.__frames[0] < end - 1.:
+            self.__frames.popleft()
+        if self.__input_time is not None:
+            self.latency.add(end - self.__input_time)
+            self.__input_time = None
+
+    @property
+    def fps(self) -> int:
+        """Number of frames painted during the last second."""
+        now = time.perf_counter()
+        return sum(1 for t in self.__frames if t >= now - 1.)
+
+    def summary(self) -> typing.Dict[str, dict]:
+        """Return count, mean, median and 95th percentile in ms of every label."""
+        with self.__lock:
+            return {
+                label: {
+                    'count': histogram.total,
+                    'mean': histogram.mean * 1e3,
+                    'p50': histogram.percentile(50) * 1e3,
+                    'p95': histogram.percentile(95) * 1e3,
+                }
+                for label, histogram in sorted(self.histograms.items())
+            }
+
+    def dumpTrace(self, path: str):
+        """Write collected events in Chrome trace event format.
+
+        :param path: output JSON file path
+        """
+        pid = os.getpid()
+        with self.__lock:
+            events = [
+                {
+                    'name': label,
+                    'cat': label.split('.')[0],
+                    'ph': 'X',
+                    'ts': (start - self.__origin) * 1e6,
+                    'dur': (end - start) * 1e6,
+                    'pid': pid,
+                    'tid': tid,
+                }
+                for label, start, end, tid in self.__events
+            ]
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        print(f"Written {len(events)} trace events to", path)
+
+
+class ProfilerOverlay(QtWidgets.QLabel):
+    """Semi-transparent panel with profiler statistics over canvas."""
+
+    def __init__(self, profiler: Profiler, canvas: QtWidgets.QGraphicsView, interval: int = 500):
+        """Create overlay in the top left corner of canvas viewport.
+
+        :param profiler: source of statistics
+        :param canvas: canvas with scene
+        :param interval: update interval in ms
+        """
+        super().__init__(canvas.viewport())
+        self.profiler = profiler
+        self.canvas = canvas
+        self.setAttribute(QtCore.Qt.WA_TransparentForMouseEvents)
+        # opaque widget doesn't make canvas repaint under it
+        self.setAutoFillBackground(True)
+        palette = self.palette()
+        palette.setColor(QtGui.QPalette.Window, QtGui.QColor(0, 0, 0))
+        palette.setColor(QtGui.QPalette.WindowText, QtGui.QColor(0, 255, 0))
+        self.setPalette(palette)
+        self.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        self.move(4, 4)
+        self.__timer = QtCore.QTimer(self)
+        self.__timer.timeout.connect(self.refresh)
+        self.__timer.start(interval)
+
+    def pixmapBytes(self) -> int:
+        """Return size of background image and mask buffer."""
+        scene = self.canvas.scene
+        size = 0
+        if scene.img is not None:
+            size += scene.img.width() * scene.img.height() * scene.img.depth() // 8
+        if scene.mask_item is not None:
+            size += scene.mask_item.image.sizeInBytes()
+        return size
+
+    def refresh(self):
+        """Show current statistics."""
+        latency = self.profiler.latency
+        lines = [
+            f'FPS {self.profiler.fps:4d}',
+            f'input-to-paint p50 {latency.percentile(50) * 1e3:7.2f} ms'
+            f' p95 {latency.percentile(95) * 1e3:7.2f} ms',
+            f'items {len(self.canvas.scene.items())}',
+            f'pixmaps {self.pixmapBytes() / 2**20:.1f} MiB',
+        ]
+        for label, stats in self.profiler.summary().items():
+            lines.append(
+                f'{label:28} p50 {stats["p50"]:7.2f} ms p95 {stats["p95"]:7.2f} ms n={stats["count"]}')
+        self.setText('\n'.join(lines))
+        self.adjustSize()
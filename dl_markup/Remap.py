@@ -0,0 +1,215 @@
+"""Batch remapping of saved masks without GUI.
+
+Masks from input directory are processed by pool of processes:
+colors are replaced according to lookup table and, optionally,
+converted to class ids of the palette.
+"""
+from PyQt5 import QtGui
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+import typing
+import uuid
+
+import numpy as np
+
+from .ClassMap import ClassMap, imageToRgb, rgbToImage
+from .Palette import Palette
+
+
+MASK_EXTENSIONS = {'.png', '.bmp', '.jpg', '.jpeg'}
+
+
+class Remapper:
+    """Callable, which remaps single mask file.
+
+    Objects are sent to worker processes, so they hold only plain data.
+    """
+
+    def __init__(
+            self,
+            output_dir: str,
+            mapping: typing.Dict[str, str] = None,
+            mask_format: str = 'rgb'):
+        """Create remapper.
+
+        :param output_dir: directory for remapped masks
+        :param mapping: colors replacement in '#RRGGBB' format
+        :param mask_format: 'rgb' for colored masks, 'index' or 'npy' for class ids
+        """
+        self.output_dir = output_dir
+        self.mask_format = mask_format
+        mapping = mapping or {}
+        src = [QtGui.QColor(color).rgb() & 0xFFFFFF for color in mapping]
+        dst = [QtGui.QColor(color).rgb() & 0xFFFFFF for color in mapping.values()]
+        order = np.argsort(np.array(src, dtype=np.uint32))
+        self.__src = np.array(src, dtype=np.uint32)[order]
+        self.__dst = np.array(dst, dtype=np.uint32)[order]
+        self.__class_map = ClassMap(Palette.colors_hex)
+
+    def remap(self, rgb: np.ndarray) -> np.ndarray:
+        """Replace colors of packed 0xRRGGBB array.
+
+        :param rgb: array of packed colors
+        """
+        if not len(self.__src):
+            return rgb
+        pos = np.searchsorted(self.__src, rgb)
+        pos = np.minimum(pos, len(self.__src) - 1)
+        hit = self.__src[pos] == rgb
+        return np.where(hit, self.__dst[pos], rgb)
+
+    def outputPath(self, path: str) -> str:
+        """Return path of remapped mask.
+
+        :param path: input mask path
+        """
+        name = os.path.basename(path)
+        if self.mask_format == 'index':
+            name = os.path.splitext(name)[0] + '.png'
+        elif self.mask_format == 'npy':
+            name = os.path.splitext(name)[0] + '.npy'
+        return os.path.join(self.output_dir, name)
+
+    def __call__(self, path: str) -> typing.Tuple[str, int]:
+        """Remap mask and return its path and number of pixels.
+
+        :param path: input mask path
+        """
+        image = QtGui.QImage(path)
+        if image.isNull():
+            raise IOError(f"Can not read {path}")
+        rgb = self.remap(imageToRgb(image))
+        out_path = self.outputPath(path)
+        # write to temporary file, so readers never see partial file
+        tmp_path = os.path.join(
+            os.path.dirname(out_path),
+            f'.{os.path.basename(out_path)}.{uuid.uuid4().hex}.tmp')
+        try:
+            if self.mask_format == 'rgb':
+                fmt = os.path.splitext(out_path)[1][1:]
+                if not rgbToImage(rgb).save(tmp_path, fmt):
+                    raise IOError(f"Can not write {out_path}")
+            else:
+                fmt = 'png' if self.mask_format == 'index' else 'npy'
+                ids = self.__class_map.rgbToIds(rgb)
+                self.__class_map.save(ids, tmp_path, fmt)
+            os.replace(tmp_path, out_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return out_path, rgb.size
+
+
+def listMasks(directory: str) -> typing.Iterator[str]:
+    """Stream paths of mask files in directory.
+
+    :param directory: directory with masks
+    """
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and \
+                    os.path.splitext(entry.name)[1].lower() in MASK_EXTENSIONS:
+                yield entry.path
+
+
+def parseMapping(pairs: typing.List[str]) -> typing.Dict[str, str]:
+    """Parse color replacements.
+
+    :param pairs: strings in 'SRC=DST' format, e.g. '#FF0000=#00FF00'
+    """
+    mapping = {}
+    for pair in pairs:
+        src, sep, dst = pair.partition('=')
+        if not sep or not QtGui.QColor(src).isValid() or not QtGui.QColor(dst).isValid():
+            raise argparse.ArgumentTypeError(f"Invalid color mapping {pair}")
+        mapping[src] = dst
+    return mapping
+
+
+parser = argparse.ArgumentParser(
+    description='Remap colors of saved masks and convert them to class ids')
+parser.add_argument(
+    'input_dir',
+    help='Directory with masks')
+parser.add_argument(
+    '--output_dir',
+    default=None,
+    help='Directory for remapped masks (input directory by default)')
+parser.add_argument(
+    '--map',
+    action='append',
+    default=[],
+    metavar='SRC=DST',
+    help="Replace color SRC with DST, e.g. '#FF0000=#00FF00' (can be repeated)")
+parser.add_argument(
+    '--mask_format',
+    default='rgb',
+    choices=['rgb', 'index', 'npy'],
+    help='Write colored masks (rgb) or class id masks as palette PNG (index) or numpy array (npy)')
+parser.add_argument(
+    '--workers',
+    type=int,
+    default=os.cpu_count(),
+    help='Number of worker processes')
+
+
+def main(argv: typing.List[str] = None):
+    """Entry point."""
+    args = parser.parse_args(argv)
+    output_dir = args.output_dir or args.input_dir
+    os.makedirs(output_dir, exist_ok=True)
+    try:
+        mapping = parseMapping(args.map)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+    remapper = Remapper(output_dir, mapping, args.mask_format)
+
+    start = time.perf_counter()
+    files, pixels, failed = 0, 0, 0
+    with multiprocessing.Pool(args.workers, _initWorker, (remapper,)) as pool:
+        results = pool.imap_unordered(
+            _remapSafe, listMasks(args.input_dir), chunksize=16)
+        for out_path, size in results:
+            if out_path is None:
+                failed += 1
+                continue
+            files += 1
+            pixels += size
+            if files % 1000 == 0:
+                _report(files, pixels, time.perf_counter() - start)
+    _report(files, pixels, time.perf_counter() - start)
+    if failed:
+        print(f"Failed to remap {failed} files")
+    return 1 if failed else 0
+
+
+_remapper = None
+
+
+def _initWorker(remapper: Remapper):
+    """Store remapper in worker process, so it isn't sent with every file."""
+    global _remapper
+    _remapper = remapper
+
+
+def _remapSafe(path: str) -> typing.Tuple[str, int]:
+    """Remap mask in worker process, reporting errors instead of raising."""
+    try:
+        return _remapper(path)
+    except Exception as e:
+        print(f"Failed to remap {path}: {e}")
+        return None, 0
+
+
+def _report(files: int, pixels: int, elapsed: float):
+    elapsed = max(elapsed, 1e-9)
+    print(f"Remapped {files} files in {elapsed:.1f} s: "
+          f"{files / elapsed:.1f} files/s, {pixels / elapsed / 1e6:.1f} MPix/s")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
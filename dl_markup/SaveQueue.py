@@ -0,0 +1,104 @@
+from PyQt5 import QtCore
+
+import os
+import threading
+import typing
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+
+
+class SaveQueue(QtCore.QObject):
+    """Write files in background threads.
+
+    Every file is written to temporary file and then atomically
+    moved to its place, so readers never see partially written files.
+    Number of pending jobs is bounded: when queue is full,
+    submit waits until one of the jobs is finished.
+    """
+
+    statusChanged = QtCore.pyqtSignal(str)
+    """Emitted with human readable status after each change of the queue."""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 8, *args, **kwargs):
+        """Create queue.
+
+        :param max_workers: number of writing threads
+        :param max_pending: max number of jobs waiting in queue
+        """
+        super().__init__(*args, **kwargs)
+        self.__executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix='dl_markup-save')
+        self.__slots = threading.BoundedSemaphore(max_pending)
+        self.__lock = threading.Lock()
+        # unfinished jobs and their output paths
+        self.__futures = {}
+        # last submitted and last written version of each file
+        self.__submitted = {}
+        self.__written = {}
+
+    @property
+    def pending(self) -> int:
+        """Return number of unfinished jobs."""
+        with self.__lock:
+            return len(self.__futures)
+
+    def submit(self, path: str, write: typing.Callable[[str], None]):
+        """Schedule file writing.
+
+        :param path: output file path
+        :param write: function, which writes file to the given path
+        """
+        self.__slots.acquire()
+        with self.__lock:
+            version = self.__submitted.get(path, 0) + 1
+            self.__submitted[path] = version
+            future = self.__executor.submit(self.__run, path, write, version)
+            self.__futures[future] = path
+        future.add_done_callback(self.__done)
+        self.statusChanged.emit(f"Saving {os.path.basename(path)}...")
+
+    def __run(self, path: str, write: typing.Callable[[str], None], version: int):
+        """Write file and move it to output path."""
+        # hidden file in the same directory, so it can be atomically moved
+        tmp_path = os.path.join(
+            os.path.dirname(path),
+            f'.{os.path.basename(path)}.{uuid.uuid4().hex}.tmp')
+        try:
+            write(tmp_path)
+            with self.__lock:
+                # newer version of the file has been already written
+                outdated = self.__written.get(path, 0) > version
+                if not outdated:
+                    os.replace(tmp_path, path)
+                    self.__written[path] = version
+            if outdated:
+                os.remove(tmp_path)
+            status = f"Saved {path}"
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            status = f"Failed to save {path}: {e}"
+        print(status)
+        self.statusChanged.emit(status)
+
+    def __done(self, future):
+        """Free place in queue."""
+        with self.__lock:
+            self.__futures.pop(future, None)
+        self.__slots.release()
+
+    def flush(self, path: str = None):
+        """Wait until submitted files are written.
+
+        :param path: wait only for this file (for all files if None)
+        """
+        with self.__lock:
+            futures = [
+                future for future, future_path in self.__futures.items()
+                if path is None or future_path == path]
+        wait(futures)
+
+    def close(self):
+        """Write all submitted files and stop threads."""
+        self.flush()
+        self.__executor.shutdown(wait=True)
@@ -1,32 +1,44 @@
-from PyQt5 import QtGui, QtWidgets
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtCore import Qt
+
+import contextlib
+import typing
+
+from .MaskItem import MaskItem
+from .TiledImageItem import TiledImageItem
 
 
 class Scene(QtWidgets.QGraphicsScene):
-    """Class that stores drawn primitives."""
+    """Class that stores drawn primitives.
+
+    With vector backend every primitive is kept as separate item.
+    With raster backend primitives are painted into MaskItem buffer.
 
-    def __init__(self, *argc, **kwargs):
-        """Initialize scene."""
+    Markup items are top-level items over background and below image.
+    Scene index keeps only top-level items, children are visited one
+    by one, so markup is not parented to background item. Items are
+    found by BSP tree index, so painting and hit-testing visit only
+    items near the exposed area or point.
+    """
+
+    def __init__(self, *argc, raster: bool = False, bsp_depth: int = 0, **kwargs):
+        """Initialize scene.
+
+        :param raster: use raster backend
+        :param bsp_depth: depth of BSP tree index (0 chooses it by number of items)
+        """
         super().__init__(*argc, **kwargs)
+        self.__raster = raster
+        self.bsp_depth = bsp_depth
+        self.setBspTreeDepth(bsp_depth)
         self.__img_item = None
         self.__background_item = None  # parent to all other items (except img)
+        self.__mask_item = None
+        self.__image = None  # background converted to QImage on demand
         self.setBackgroundBrush(QtGui.QBrush(
             QtGui.QColor(0, 0, 0)
         ))
 
-    def __set_alpha(self, img: QtGui.QPixmap, alpha: float) -> QtGui.QPixmap:
-        """Create new image with another opacity.
-
-        :param img: original image
-        :param alpha: opacity value from interval [0, 1]
-        """
-        output = QtGui.QPixmap(img.size())
-        output.fill(QtGui.QColor.fromRgb(0, 0, 0, 0))
-        painter = QtGui.QPainter(output)
-        painter.setOpacity(alpha)
-        painter.drawPixmap(0, 0, img)
-        painter.end()
-        return output
-
     def clear(self):
         """Remove all primitives from scene, leaving background image."""
         if self.__img_item is not None:
@@ -34,79 +46,193 @@ class Scene(QtWidgets.QGraphicsScene):
         super().clear()
         if self.__img_item is not None:
             self.addItem(self.__img_item)
+            rect = self.__img_item.boundingRect()
             self.__background_item = self.__get_background_item(
-                self.img.width(),
-                self.img.height(),
+                int(rect.width()),
+                int(rect.height()),
             )
             self.addItem(self.__background_item)
+            self.__mask_item = self.__get_mask_item()
+
+    def setItemIndexMethod(self, method: QtWidgets.QGraphicsScene.ItemIndexMethod):
+        """Change method of finding items.
+
+        :param method: BspTreeIndex or NoIndex
+        """
+        super().setItemIndexMethod(method)
+        if method == QtWidgets.QGraphicsScene.BspTreeIndex:
+            # new index has default depth and doesn't know scene rectangle
+            # until it changes, so all items would be put in one leaf
+            self.setBspTreeDepth(self.bsp_depth)
+            rect = self.sceneRect()
+            self.setSceneRect(QtCore.QRectF())
+            self.setSceneRect(rect)
+
+    @contextlib.contextmanager
+    def bulkInsert(self):
+        """Suspend indexing while many items are added.
+
+        Index is rebuilt once on exit instead of being updated by every item.
+        """
+        if self.itemIndexMethod() == QtWidgets.QGraphicsScene.NoIndex:
+            yield
+            return
+        self.setItemIndexMethod(QtWidgets.QGraphicsScene.NoIndex)
+        try:
+            yield
+        finally:
+            self.setItemIndexMethod(QtWidgets.QGraphicsScene.BspTreeIndex)
 
     @property
-    def img_item(self) -> QtWidgets.QGraphicsPixmapItem:
-        """Drawing item with background image."""
+    def img_item(self) -> QtWidgets.QGraphicsItem:
+        """Drawing item with background image.
+
+        QGraphicsPixmapItem or TiledImageItem for huge images.
+        """
         return self.__img_item
 
     @property
-    def background_item(self) -> QtWidgets.QGraphicsPixmapItem:
+    def background_item(self) -> QtWidgets.QGraphicsRectItem:
         """Drawing item with empty background.
 
-        This serves as parent for every other item (except actual background image)
+        This serves as parent of mask buffer and is painted below markup items.
         """
         return self.__background_item
 
+    @property
+    def mask_item(self) -> MaskItem:
+        """Drawing item with mask buffer (None for vector backend)."""
+        return self.__mask_item
+
     @property
     def img(self) -> QtGui.QPixmap:
-        """Background image."""
-        return self.__img_item.pixmap() if self.__img_item is not None else None
+        """Background image (None for tiled image)."""
+        if isinstance(self.__img_item, QtWidgets.QGraphicsPixmapItem):
+            return self.__img_item.pixmap()
+        return None
 
     @img.setter
     def img(self, val: QtGui.QPixmap):
+        self.__set_img_item(QtWidgets.QGraphicsPixmapItem(val))
+
+    @property
+    def image(self) -> QtGui.QImage:
+        """Background image as QImage (None for tiled image).
+
+        Pixmap is converted once per loaded image. QImage can be
+        safely read in another thread.
+        """
+        if self.__image is None and self.img is not None:
+            self.__image = self.img.toImage()
+        return self.__image
+
+    def setTiledImage(self, path: str):
+        """Set background image, which is decoded by visible tiles.
+
+        :param path: image file path
+        """
+        self.__set_img_item(TiledImageItem(path))
+
+    def __set_img_item(self, img_item: QtWidgets.QGraphicsItem):
         # remove current image item and background item
         child_items = []
         if self.__img_item is not None:
-            child_items = self.__background_item.childItems()
+            child_items = [
+                item for item in self.__background_item.childItems()
+                if item is not self.__mask_item]
             for item in child_items:
                 item.setParentItem(None)
             self.removeItem(self.__img_item)
             self.removeItem(self.__background_item)
-        # create new img item
-        val = self.__set_alpha(val, 0.7)
-        self.__img_item = self.__get_img_item(val)
+            if isinstance(self.__img_item, TiledImageItem):
+                self.__img_item.close()
+        self.__image = None
+        # image is drawn translucent over the mask,
+        # opacity doesn't require a copy of the image
+        self.__img_item = img_item
+        self.__img_item.setOpacity(0.7)
+        self.__img_item.setZValue(1.0)
         self.addItem(self.__img_item)
+        rect = self.__img_item.boundingRect()
+        width, height = int(rect.width()), int(rect.height())
         # create background item and set its children
-        self.__background_item = self.__get_background_item(
-            val.width(),
-            val.height(),
-        )
+        self.__background_item = self.__get_background_item(width, height)
+        # mask is the first child, so it is painted below other items
+        self.__mask_item = self.__get_mask_item()
         for item in child_items:
             item.setParentItem(self.__background_item)
         self.addItem(self.__background_item)
         # chage bounding rectangle accoring to new image size
-        self.setSceneRect(0, 0, val.width(), val.height())
-
-    def __get_img_item(self, img: QtGui.QPixmap) -> QtWidgets.QGraphicsPixmapItem:
-        img_item = QtWidgets.QGraphicsPixmapItem(img)
-        img_item .setZValue(1.0)
-        return img_item
-
-    def __get_background_item(self, width: int, height: int) -> QtWidgets.QGraphicsPixmapItem:
-        background = QtGui.QPixmap(width, height)
-        background.fill(QtGui.QColor(0, 0, 0))
+        self.setSceneRect(0, 0, width, height)
+
+    def __get_background_item(self, width: int, height: int) -> QtWidgets.QGraphicsRectItem:
+        # solid rectangle doesn't allocate a pixmap of image size
+        background_item = QtWidgets.QGraphicsRectItem(0, 0, width, height)
+        background_item.setBrush(QtGui.QColor(0, 0, 0))
+        background_item.setPen(QtGui.QPen(Qt.NoPen))
+        background_item.setZValue(-1.0)
         # set this flag to prevent drawing mask outside of image
         flag = QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemClipsChildrenToShape
-        background_item = QtWidgets.QGraphicsPixmapItem(background)
         background_item.setFlag(flag)
         return background_item
 
+    def __get_mask_item(self) -> MaskItem:
+        if not self.__raster:
+            return None
+        rect = self.__background_item.rect()
+        return MaskItem(
+            int(rect.width()),
+            int(rect.height()),
+            parent=self.__background_item,
+        )
+
+    def drawForeground(self, painter: QtGui.QPainter, rect: QtCore.QRectF):
+        """Hide markup outside of image.
+
+        :param painter: painter of exposed area
+        :param rect: exposed area in scene coordinates
+        """
+        outside = QtGui.QRegion(rect.toAlignedRect()).subtracted(
+            QtGui.QRegion(self.sceneRect().toAlignedRect()))
+        for part in outside.rects():
+            painter.fillRect(part, self.backgroundBrush())
+
     @property
-    def segm(self) -> QtGui.QPixmap:
-        """Return current segmentation mask."""
-        self.removeItem(self.__img_item)
+    def segm(self) -> QtGui.QImage:
+        """Return current segmentation mask.
 
-        segm = QtGui.QPixmap(self.width(), self.height())
-        segm.fill(QtGui.QColor.fromRgb(0, 0, 0, 0))
-        painter = QtGui.QPainter(segm)
-        self.render(painter)
-        painter.end()
+        QImage can be safely encoded and saved in another thread.
+        """
+        return self.segmSnapshot()()
 
+    def segmSnapshot(self) -> typing.Callable[[], QtGui.QImage]:
+        """Capture current markup and return function, which renders segmentation mask.
+
+        Markup is recorded in GUI thread, while returned function
+        rasterizes it and can be called in another thread.
+        """
+        width, height = int(self.width()), int(self.height())
+        if self.__mask_item is not None:
+            # raster backend already stores the mask,
+            # shallow copy is detached on next painting into the mask
+            mask = QtGui.QImage(self.__mask_item.image)
+            return lambda: mask
+        self.removeItem(self.__img_item)
+        # recording of painting commands is much cheaper than rasterization
+        picture = QtGui.QPicture()
+        painter = QtGui.QPainter(picture)
+        # every pixel of the mask should have color of some class
+        painter.setRenderHint(QtGui.QPainter.Antialiasing, False)
+        self.render(painter, QtCore.QRectF(0, 0, width, height), self.sceneRect())
+        painter.end()
         self.addItem(self.__img_item)
-        return segm
+
+        def render() -> QtGui.QImage:
+            segm = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32_Premultiplied)
+            segm.fill(QtGui.QColor.fromRgb(0, 0, 0, 0))
+            painter = QtGui.QPainter(segm)
+            painter.setRenderHint(QtGui.QPainter.Antialiasing, False)
+            painter.drawPicture(0, 0, picture)
+            painter.end()
+            return segm
+        return render
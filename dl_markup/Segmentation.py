@@ -0,0 +1,460 @@
+"""Interactive segmentation of background images by seeds of user.
+
+Regions are grown from foreground and background seeds by marker
+watershed on color gradient. Image is segmented downscaled first,
+then the boundary of region is refined at full resolution. Work is
+done in a separate process, which sends previews of growing region,
+so drawing never waits for it and a newer request cancels the older
+one at once.
+"""
+from PyQt5 import QtCore, QtGui
+
+import math
+import multiprocessing
+import queue
+import time
+import typing
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+
+from .FillTool import channelArray, imageArray, maskRuns, mergeRuns, scaleRuns
+
+
+FOREGROUND = 1
+BACKGROUND = 2
+
+Scribble = typing.Tuple[int, np.ndarray]
+"""Label of seeds and points of polyline in image coordinates."""
+Box = typing.Tuple[float, float, float, float]
+"""Left, top, right and bottom of box around region."""
+
+
+class Cancelled(Exception):
+    """Segmentation has been replaced by a newer one."""
+
+
+def watershed(
+        levels: np.ndarray,
+        markers: np.ndarray,
+        progress: typing.Callable[[np.ndarray], None] = None) -> np.ndarray:
+    """Grow labeled markers over unlabeled pixels in order of their levels.
+
+    Pixels are flooded in waves: each wave labels all queued pixels of
+    the lowest level at once, so work is done by numpy and the number
+    of Python iterations depends on shape of regions, not on their area.
+
+    :param levels: uint8 array of shape (height, width), e.g. quantized gradient
+    :param markers: int8 array of the same shape, 0 is unlabeled pixel
+    :param progress: function, which is called after each wave with current labels
+    :return: labels of all pixels, which are connected to markers
+    """
+    height, width = levels.shape
+    labels = markers.ravel().copy()
+    flat = levels.ravel()
+    size = height * width
+    buckets = [[] for _ in range(256)]
+
+    def push(indices: np.ndarray, values: np.ndarray, level: int):
+        # queue unlabeled 4-neighbours by the highest level on the way from marker
+        columns = indices % width
+        valid = np.concatenate([
+            indices >= width, indices < size - width, columns > 0, columns < width - 1])
+        neighbours = np.concatenate([indices - width, indices + width, indices - 1, indices + 1])
+        neighbours, values = neighbours[valid], np.tile(values, 4)[valid]
+        free = labels[neighbours] == 0
+        neighbours, values = neighbours[free], values[free]
+        if not len(neighbours):
+            return
+        neighbour_levels = np.maximum(flat[neighbours], level)
+        order = np.argsort(neighbour_levels, kind='stable')
+        neighbour_levels, neighbours, values = neighbour_levels[order], neighbours[order], values[order]
+        starts = np.flatnonzero(np.diff(neighbour_levels, prepend=-1))
+        ends = np.append(starts[1:], len(order)).tolist()
+        for chunk_level, start, end in zip(neighbour_levels[starts].tolist(), starts.tolist(), ends):
+            buckets[chunk_level].append((neighbours[start:end], values[start:end]))
+
+    # only markers at border of unlabeled area start flooding
+    grid = labels.reshape(height, width)
+    unlabeled = grid == 0
+    border = np.zeros_like(unlabeled)
+    border[1:] |= unlabeled[:-1]
+    border[:-1] |= unlabeled[1:]
+    border[:, 1:] |= unlabeled[:, :-1]
+    border[:, :-1] |= unlabeled[:, 1:]
+    seeds = np.flatnonzero(border & ~unlabeled)
+    push(seeds, labels[seeds], 0)
+    level = 0
+    while level < 256:
+        if not buckets[level]:
+            level += 1
+            continue
+        chunks = buckets[level]
+        buckets[level] = []
+        indices = np.concatenate([chunk[0] for chunk in chunks])
+        values = np.concatenate([chunk[1] for chunk in chunks])
+        free = labels[indices] == 0
+        # pixel reached by several markers in one wave takes the first of them
+        indices, first = np.unique(indices[free], return_index=True)
+        values = values[free][first]
+        labels[indices] = values
+        if len(indices):
+            push(indices, values, level)
+        if progress is not None:
+            progress(grid)
+    return grid
+
+
+def downscale(pixels: np.ndarray, factor: int) -> np.ndarray:
+    """Return mean colors of square blocks of pixels.
+
+    :param pixels: uint8 array of shape (height, width, channels)
+    :param factor: side of block, blocks at right and bottom may be smaller
+    :return: uint8 array of shape (ceil(height / factor), ceil(width / factor), channels)
+    """
+    height, width = pixels.shape[:2]
+    rows = np.add.reduceat(pixels, np.arange(0, height, factor), axis=0, dtype=np.uint32)
+    sums = np.add.reduceat(rows, np.arange(0, width, factor), axis=1)
+    counts = np.outer(
+        np.diff(np.arange(0, height + factor, factor).clip(max=height)),
+        np.diff(np.arange(0, width + factor, factor).clip(max=width)))
+    return ((sums + counts[..., None] // 2) // counts[..., None]).astype(np.uint8)
+
+
+def gradientLevels(pixels: np.ndarray, rows: np.ndarray, columns: np.ndarray) -> np.ndarray:
+    """Return Sobel magnitude of color at pixels quantized to 256 levels.
+
+    Only listed pixels are processed, so boundary of a huge image
+    doesn't need gradient of the whole image.
+
+    :param pixels: uint8 array of shape (height, width, channels)
+    :param rows: rows of pixels
+    :param columns: columns of pixels, which go in the same order as rows
+    :return: uint8 levels of pixels, the strongest edges get 255
+    """
+    height, width = pixels.shape[:2]
+    above, below = np.maximum(rows - 1, 0), np.minimum(rows + 1, height - 1)
+    left, right = np.maximum(columns - 1, 0), np.minimum(columns + 1, width - 1)
+
+    def at(r, c):
+        return pixels[r, c].astype(np.float32)
+
+    middle = 2 * (at(rows, right) - at(rows, left))
+    dx = at(above, right) - at(above, left) + middle + at(below, right) - at(below, left)
+    middle = 2 * (at(below, columns) - at(above, columns))
+    dy = at(below, left) - at(above, left) + middle + at(below, right) - at(above, right)
+    magnitude = np.sqrt((dx * dx + dy * dy).sum(axis=1))
+    if not len(magnitude):
+        return np.zeros(0, np.uint8)
+    # rare strong edges don't make the others flat
+    scale = 255. / max(float(np.percentile(magnitude, 99)), 1.)
+    return np.minimum(magnitude * scale, 255.).astype(np.uint8)
+
+
+def drawSeeds(
+        markers: np.ndarray,
+        scribbles: typing.Iterable[Scribble],
+        box: typing.Optional[Box],
+        scale: float = 1.,
+        left: int = 0,
+        top: int = 0):
+    """Label pixels under scribbles and outside box.
+
+    :param markers: int8 array of shape (height, width), which is labeled inplace
+    :param scribbles: labels and polylines in image coordinates
+    :param box: pixels outside it are background, pixel at its center is foreground
+    :param scale: image coordinates are divided by scale to get pixel of markers
+    :param left: image column of the first column of markers
+    :param top: image row of the first row of markers
+    """
+    height, width = markers.shape
+    if box is not None:
+        x0, y0, x1, y1 = box
+        # pixel partially inside box isn't background
+        first_row, first_column = math.floor(y0 / scale) - top, math.floor(x0 / scale) - left
+        last_row, last_column = math.ceil(y1 / scale) - top, math.ceil(x1 / scale) - left
+        markers[:max(0, first_row)] = BACKGROUND
+        markers[max(0, last_row):] = BACKGROUND
+        markers[:, :max(0, first_column)] = BACKGROUND
+        markers[:, max(0, last_column):] = BACKGROUND
+        center = np.array([[(x0 + x1) / 2, (y0 + y1) / 2]])
+        scribbles = [(FOREGROUND, center), *scribbles]
+    for label, points in scribbles:
+        points = np.asarray(points, np.float64) / scale - [left, top]
+        # sample segments of polyline at least twice per pixel
+        lengths = np.hypot(*np.diff(points, axis=0).T)
+        steps = np.ceil(2 * lengths).astype(np.int64) + 1
+        samples = [points[-1:]] + [
+            np.linspace(a, b, n, endpoint=False) for a, b, n in zip(points[:-1], points[1:], steps)]
+        x, y = np.floor(np.concatenate(samples)).astype(np.int64).T
+        inside = (0 <= x) & (x < width) & (0 <= y) & (y < height)
+        markers[y[inside], x[inside]] = label
+
+
+def boundaryBand(mask: np.ndarray) -> np.ndarray:
+    """Return pixels of mask boundary and their 8-neighbours.
+
+    :param mask: boolean array of shape (height, width)
+    """
+    edge = np.zeros_like(mask)
+    edge[1:] |= mask[1:] != mask[:-1]
+    edge[:-1] |= mask[1:] != mask[:-1]
+    edge[:, 1:] |= mask[:, 1:] != mask[:, :-1]
+    edge[:, :-1] |= mask[:, 1:] != mask[:, :-1]
+    band = edge.copy()
+    band[1:] |= edge[:-1]
+    band[:-1] |= edge[1:]
+    rows = band.copy()
+    band[:, 1:] |= rows[:, :-1]
+    band[:, :-1] |= rows[:, 1:]
+    return band
+
+
+_image = None
+_messages = None
+_current = None
+
+
+def _initWorker(messages: multiprocessing.Queue, current: multiprocessing.Value):
+    global _messages, _current
+    _messages = messages
+    _current = current
+
+
+def segment(
+        job: int,
+        key: int,
+        image: typing.Optional[np.ndarray],
+        scribbles: typing.List[Scribble],
+        box: typing.Optional[Box],
+        max_pixels: int):
+    """Segment region of image and send its runs (runs in worker process).
+
+    Runs of downscaled segmentation are sent with progress, then runs
+    refined at full resolution are sent as final. Segmentation stops
+    as soon as other job becomes current.
+
+    :param job: id of segmentation
+    :param key: key of image, which is kept by process between jobs
+    :param image: pixels of 32-bit image or None, if process keeps image of key
+    :param scribbles: labels and polylines in image coordinates
+    :param box: pixels outside it are background
+    :param max_pixels: image is segmented downscaled to this number of pixels first
+    :raises LookupError: if process doesn't keep image of key
+    """
+    global _image
+    if image is not None:
+        _image = (key, image)
+    elif _image is None or _image[0] != key:
+        raise LookupError("Image isn't sent to segmentation process")
+    pixels = channelArray(_image[1])
+    height, width = pixels.shape[:2]
+    last_sent = time.perf_counter()
+
+    def check():
+        if _current.value != job:
+            raise Cancelled()
+
+    def send(runs: np.ndarray, final: bool):
+        _messages.put((job, final, runs))
+
+    def sendPreview(labels: np.ndarray):
+        nonlocal last_sent
+        check()
+        if time.perf_counter() - last_sent > 0.1:
+            send(coarseRuns(labels == FOREGROUND), False)
+            last_sent = time.perf_counter()
+
+    def coarseRuns(mask: np.ndarray) -> np.ndarray:
+        rows, columns = mask.shape
+        runs = scaleRuns(maskRuns(mask), mask.shape, columns * factor, rows * factor)
+        runs = runs[runs[:, 0] < height]
+        runs[:, 1:] = runs[:, 1:].clip(max=width)
+        return runs[runs[:, 1] < runs[:, 2]]
+
+    try:
+        factor = max(1, math.ceil(math.sqrt(width * height / max_pixels)))
+        small = downscale(pixels, factor) if factor > 1 else pixels
+        markers = np.zeros(small.shape[:2], np.int8)
+        drawSeeds(markers, scribbles, box, factor)
+        if not (markers == FOREGROUND).any():
+            send(np.zeros((0, 3), np.int32), True)
+            return
+        if not (markers == BACKGROUND).any():
+            markers[[0, -1]] = markers[:, [0, -1]] = BACKGROUND
+            drawSeeds(markers, [s for s in scribbles if s[0] == FOREGROUND], None, factor)
+        rows, columns = np.indices(markers.shape).reshape(2, -1)
+        levels = gradientLevels(small, rows, columns).reshape(markers.shape)
+        coarse = watershed(levels, markers, sendPreview) == FOREGROUND
+        if factor == 1:
+            send(maskRuns(coarse), True)
+            return
+        send(coarseRuns(coarse), False)
+        check()
+
+        # full resolution pixels near coarse boundary are segmented again
+        band = boundaryBand(coarse)
+        band_rows, band_columns = np.nonzero(band)
+        if not len(band_rows):
+            send(coarseRuns(coarse), True)
+            return
+        top, left = band_rows.min() * factor, band_columns.min() * factor
+        bottom = min(height, (band_rows.max() + 1) * factor)
+        right = min(width, (band_columns.max() + 1) * factor)
+        crop_rows = np.arange(top, bottom) // factor
+        crop_columns = np.arange(left, right) // factor
+        unknown = band[crop_rows[:, None], crop_columns[None, :]]
+        markers = np.where(coarse[crop_rows[:, None], crop_columns[None, :]], FOREGROUND, BACKGROUND)
+        markers = markers.astype(np.int8)
+        markers[unknown] = 0
+        drawSeeds(markers, scribbles, box, 1., left, top)
+        rows, columns = np.nonzero(markers == 0)
+        levels = np.zeros(markers.shape, np.uint8)
+        levels[rows, columns] = gradientLevels(pixels, rows + top, columns + left)
+        refined = watershed(levels, markers, lambda labels: check()) == FOREGROUND
+
+        # refined crop replaces runs of coarse segmentation
+        runs = coarseRuns(coarse)
+        inside = (top <= runs[:, 0]) & (runs[:, 0] < bottom)
+        outside = runs[~inside]
+        crop = runs[inside]
+        left_part = crop.copy()
+        left_part[:, 2] = left_part[:, 2].clip(max=left)
+        right_part = crop.copy()
+        right_part[:, 1] = right_part[:, 1].clip(min=right)
+        crop_runs = maskRuns(refined) + np.array([top, left, left], np.int32)
+        runs = np.concatenate([outside, left_part, crop_runs, right_part])
+        runs = runs[runs[:, 1] < runs[:, 2]]
+        runs = runs[np.lexsort((runs[:, 1], runs[:, 0]))]
+        send(mergeRuns(runs), True)
+    except Cancelled:
+        pass
+
+
+class Segmenter(QtCore.QObject):
+    """Segment regions of images in a separate process.
+
+    Process is started by spawn method on the first segmentation and
+    keeps the last image, so next seeds of the same image are sent
+    without pixels. Messages of process are polled by timer in GUI
+    thread only while segmentation is running.
+    """
+
+    interval = 16
+    """Period of polling of process messages in milliseconds."""
+
+    def __init__(self, max_pixels: int = 2**18):
+        """Create segmenter.
+
+        :param max_pixels: larger images are segmented downscaled first
+        """
+        super().__init__()
+        self.max_pixels = max_pixels
+        self.__processes = None
+        self.__messages = None
+        self.__current = None
+        self.__key = None
+        self.__job = 0
+        self.__request = None
+        self.__resent = False
+        self.__future = None
+        self.__callback = None
+        self.__timer = QtCore.QTimer(self)
+        self.__timer.setInterval(self.interval)
+        self.__timer.timeout.connect(self.__poll)
+
+    def segment(
+            self,
+            image: QtGui.QPixmap,
+            scribbles: typing.List[Scribble],
+            box: typing.Optional[Box],
+            callback: typing.Callable[[np.ndarray, bool], None]):
+        """Start segmentation of region, previous one is cancelled.
+
+        :param image: background image
+        :param scribbles: labels and polylines in image coordinates
+        :param box: pixels outside it are background
+        :param callback: function of runs of region and flag of final result
+        """
+        self.cancel()
+        if self.__processes is None:
+            context = multiprocessing.get_context('spawn')
+            self.__messages = context.Queue()
+            self.__current = context.Value('q', 0)
+            self.__processes = ProcessPoolExecutor(
+                1, mp_context=context, initializer=_initWorker,
+                initargs=(self.__messages, self.__current))
+        self.__job += 1
+        self.__current.value = self.__job
+        self.__request = (image, scribbles, box)
+        self.__resent = False
+        self.__submit()
+        self.__callback = callback
+        self.__timer.start()
+
+    def __submit(self):
+        """Send current job to process, pixels are sent only for a new image."""
+        image, scribbles, box = self.__request
+        key = image.cacheKey()
+        pixels = None
+        if key != self.__key:
+            pixels = imageArray(image.toImage()).copy()
+            self.__key = key
+        self.__future = self.__processes.submit(
+            segment, self.__job, key, pixels, scribbles, box, self.max_pixels)
+
+    def cancel(self):
+        """Stop current segmentation, its results are dropped."""
+        if self.__current is not None:
+            self.__current.value = 0
+        self.__request = None
+        self.__future = None
+        self.__callback = None
+        self.__timer.stop()
+
+    def wait(self):
+        """Wait until current segmentation is done and deliver its results."""
+        while self.__callback is not None:
+            self.__poll(True)
+
+    def __poll(self, block: bool = False):
+        while self.__callback is not None:
+            try:
+                job, final, runs = self.__messages.get(block, 0.1)
+            except queue.Empty:
+                if self.__failed(self.__future):
+                    break
+                if block:
+                    continue
+                return
+            if job != self.__job:
+                continue
+            callback = self.__callback
+            if final:
+                self.cancel()
+            callback(runs, final)
+
+    def __failed(self, future: Future) -> bool:
+        if not future.done() or future.exception() is None:
+            return False
+        if isinstance(future.exception(), LookupError):
+            # process has been restarted, so image is sent again
+            self.__key = None
+            if not self.__resent:
+                self.__resent = True
+                self.__submit()
+                return False
+        print("Segmentation failed:", future.exception())
+        self.cancel()
+        return True
+
+    def close(self):
+        """Stop segmentation and process."""
+        # only one job is submitted at a time
+        if self.__future is not None:
+            self.__future.cancel()
+        self.cancel()
+        if self.__processes is not None:
+            self.__processes.shutdown(wait=False)
+            self.__processes = None
+            self.__key = None
@@ -0,0 +1,195 @@
+from PyQt5 import QtGui, QtCore, QtWidgets
+from PyQt5.QtCore import Qt
+
+import numpy as np
+
+from .FillTool import FillItem
+from .Segmentation import BACKGROUND, FOREGROUND, Segmenter
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .Canvas import Canvas
+
+
+class SmartRegion:
+    """Tool that segments region by seeds of user.
+
+    Left button draws scribble over region, right button draws
+    scribble over background, left button with Shift draws box
+    around region. Region is segmented in background after each
+    scribble and shown as preview, Enter adds it as a single
+    FillItem, which is a single undo step, Escape drops seeds.
+    """
+
+    _segmenter = None
+
+    def __init__(self, canvas: 'Canvas', color: QtGui.QColor):
+        """Initialize SmartRegion.
+
+        :param canvas: canvas object for drawing
+        :param color: color of region
+        """
+        self.canvas = canvas
+        self.color = color
+        self.scribbles = []
+        self.box = None
+        self.runs = None
+        self.preview = None
+        self.__final = False
+        self.__commit = False
+        self.__items = []
+        self.__box_item = None
+        self.__points = None
+        self.__label = None
+        self.__item = None
+        self.canvas.setCursor(self.cursor())
+
+    @classmethod
+    def segmenter(cls) -> Segmenter:
+        """Return segmenter of regions, which is shared by tools."""
+        if cls._segmenter is None:
+            cls._segmenter = Segmenter()
+        return cls._segmenter
+
+    @classmethod
+    def closeSegmenter(cls):
+        """Stop process of shared segmenter."""
+        if cls._segmenter is not None:
+            cls._segmenter.close()
+            cls._segmenter = None
+
+    def mousePressEvent(self, e):
+        """Start scribble or box."""
+        if self.canvas.scene.img is None:
+            print("Smart region is not supported for tiled images")
+            return
+        if e.button() == Qt.LeftButton and e.modifiers() & Qt.ShiftModifier:
+            self.__label = None
+        elif e.button() == Qt.LeftButton:
+            self.__label = FOREGROUND
+        elif e.button() == Qt.RightButton:
+            self.__label = BACKGROUND
+        else:
+            return
+        point = self.canvas.mapToScene(e.pos())
+        self.__points = [(point.x(), point.y())]
+        pen = QtGui.QPen(self.color if self.__label == FOREGROUND else QtGui.QColor(Qt.gray))
+        pen.setCosmetic(True)
+        pen.setWidth(2)
+        if self.__label is None:
+            pen.setStyle(Qt.DashLine)
+            self.__item = QtWidgets.QGraphicsRectItem()
+        else:
+            self.__item = QtWidgets.QGraphicsPathItem()
+        self.__item.setPen(pen)
+        self.__item.setZValue(1)
+        self.canvas.scene.addItem(self.__item)
+        self.__updateItem()
+
+    def mouseMoveEvent(self, e):
+        """Continue scribble or box."""
+        if self.__points is None:
+            return
+        point = self.canvas.mapToScene(e.pos())
+        if self.__label is None:
+            self.__points[1:] = [(point.x(), point.y())]
+        else:
+            self.__points.append((point.x(), point.y()))
+        self.__updateItem()
+
+    def mouseReleaseEvent(self, e):
+        """Finish scribble or box and segment region."""
+        if self.__points is None:
+            return
+        self.mouseMoveEvent(e)
+        points = np.array(self.__points)
+        if self.__label is None:
+            if self.__box_item is not None:
+                self.__items.remove(self.__box_item)
+                self.canvas.scene.removeItem(self.__box_item)
+            (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+            self.box = (x0, y0, x1, y1)
+            self.__box_item = self.__item
+        else:
+            self.scribbles.append((self.__label, points))
+        self.__items.append(self.__item)
+        self.__points = None
+        self.__item = None
+        self.__final = False
+        self.segmenter().segment(self.canvas.scene.img, self.scribbles, self.box, self.__onSegmented)
+
+    def __updateItem(self):
+        if self.__label is None:
+            (x0, y0), (x1, y1) = self.__points[0], self.__points[-1]
+            self.__item.setRect(QtCore.QRectF(
+                QtCore.QPointF(min(x0, x1), min(y0, y1)), QtCore.QPointF(max(x0, x1), max(y0, y1))))
+            return
+        path = QtGui.QPainterPath(QtCore.QPointF(*self.__points[0]))
+        for point in self.__points[1:]:
+            path.lineTo(*point)
+        self.__item.setPath(path)
+
+    def __onSegmented(self, runs: np.ndarray, final: bool):
+        """Show segmented region as translucent preview."""
+        self.runs = runs
+        self.__final = final
+        if final and self.__commit:
+            self.__add()
+            return
+        color = QtGui.QColor(self.color)
+        color.setAlpha(128)
+        item = FillItem(runs, color)
+        if self.preview is not None:
+            self.canvas.scene.removeItem(self.preview)
+        self.canvas.scene.addItem(item)
+        self.preview = item
+
+    def __add(self):
+        """Replace seeds and preview with region."""
+        runs = self.runs
+        self.clear()
+        if runs is not None and len(runs):
+            item = FillItem(runs, self.color)
+            self.canvas.scene.addItem(item)
+            self.canvas.undo_redo.insert_in_undo_redo_add(item)
+
+    def wait(self):
+        """Wait until region is segmented."""
+        self.segmenter().wait()
+
+    def keyPressEvent(self, e):
+        """Add region by pressing Enter, drop seeds by pressing Escape.
+
+        Region, which is being refined, is added when it's done.
+
+        :param e: event object
+        """
+        if e.key() in (Qt.Key_Return, Qt.Key_Enter):
+            if self.__final or not self.scribbles and self.box is None:
+                self.__add()
+            else:
+                self.__commit = True
+        elif e.key() == Qt.Key_Escape:
+            self.clear()
+
+    def cursor(self):
+        """Cross cursor shows position of seed."""
+        return Qt.CrossCursor
+
+    def clear(self):
+        """Cancel segmentation and remove seeds and preview."""
+        if self._segmenter is not None:
+            self._segmenter.cancel()
+        for item in [*self.__items, self.__item, self.preview]:
+            if item is not None and item.scene() is not None:
+                item.scene().removeItem(item)
+        self.scribbles = []
+        self.box = None
+        self.runs = None
+        self.preview = None
+        self.__final = False
+        self.__commit = False
+        self.__items = []
+        self.__box_item = None
+        self.__points = None
+        self.__item = None
@@ -0,0 +1,227 @@
+import os
+import sqlite3
+import threading
+import typing
+
+import numpy as np
+
+
+class StatusIndex:
+    """Persistent annotation status of images in output directory.
+
+    Status of every image, time of mask modification, number of
+    pixels of each class and annotator are kept in SQLite database,
+    so labeled images can be found without reading masks.
+    Database may be updated from saving threads.
+    """
+
+    FILENAME = '.dl_markup_index.sqlite'
+    """Name of database file in output directory."""
+
+    UNLABELED, LABELED = range(2)
+    """Image statuses."""
+
+    MASK_EXTENSIONS = frozenset({'.png', '.bmp', '.jpg', '.jpeg', '.npy'})
+    """Extensions of masks, which mark images as labeled in a new index."""
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS images (
+            name TEXT PRIMARY KEY,
+            status INTEGER NOT NULL,
+            mask_mtime REAL,
+            annotator TEXT
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS images_status ON images (status, name);
+        CREATE TABLE IF NOT EXISTS class_pixels (
+            name TEXT NOT NULL,
+            class_id INTEGER NOT NULL,
+            pixels INTEGER NOT NULL,
+            PRIMARY KEY (name, class_id)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS masks (
+            stem TEXT PRIMARY KEY,
+            mtime REAL NOT NULL
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, output_dir: str):
+        """Open index of output directory, create it if necessary.
+
+        Masks, which exist when index is created, have to be imported
+        by :meth:`importMasks` (see :attr:`importing`).
+
+        :param output_dir: directory of saved masks
+        """
+        self.path = os.path.join(output_dir, self.FILENAME)
+        created = not os.path.exists(self.path)
+        os.makedirs(output_dir, exist_ok=True)
+        self.__lock = threading.Lock()
+        # images added or removed before masks are imported
+        self.__delayed = [] if created else None
+        self.__db = sqlite3.connect(self.path, check_same_thread=False)
+        with self.__lock, self.__db:
+            self.__db.execute('PRAGMA journal_mode=WAL')
+            self.__db.execute('PRAGMA synchronous=NORMAL')
+            self.__db.executescript(self._SCHEMA)
+
+    @property
+    def importing(self) -> bool:
+        """Index is new and waits for :meth:`importMasks`.
+
+        Until then added and removed images are only remembered,
+        so they get status of imported masks.
+        """
+        return self.__delayed is not None
+
+    def importMasks(self, output_dir: str):
+        """Remember masks in output directory.
+
+        Images, which are added later and have these masks, are labeled.
+        Directory is walked, so it's called in background thread.
+
+        :param output_dir: directory of saved masks
+        """
+        masks = []
+        for root, dirs, files in os.walk(output_dir):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            relative = os.path.relpath(root, output_dir)
+            for name in files:
+                stem, ext = os.path.splitext(name)
+                if ext.lower() in self.MASK_EXTENSIONS:
+                    path = os.path.join(root, name)
+                    masks.append((os.path.normpath(os.path.join(relative, stem)), os.path.getmtime(path)))
+        with self.__lock, self.__db:
+            self.__db.executemany('INSERT OR REPLACE INTO masks VALUES (?, ?)', masks)
+            delayed = self.__delayed or []
+            self.__delayed = None
+            for method, names in delayed:
+                method(names)
+
+    def addImages(self, names: typing.Iterable[str]):
+        """Register images, known images keep their status.
+
+        :param names: image paths relative to input directory
+        """
+        with self.__lock, self.__db:
+            if self.__delayed is not None:
+                self.__delayed.append((self.__addImages, list(names)))
+                return
+            self.__addImages(names)
+
+    def __addImages(self, names: typing.Iterable[str]):
+        rows = [(name, os.path.splitext(name)[0]) for name in names]
+        self.__db.executemany(
+            """INSERT OR IGNORE INTO images (name, status, mask_mtime)
+            SELECT ?1, CASE WHEN m.mtime IS NULL THEN ?3 ELSE ?4 END, m.mtime
+            FROM (SELECT ?2 AS stem) AS s LEFT JOIN masks AS m ON m.stem = s.stem""",
+            [(name, stem, self.UNLABELED, self.LABELED) for name, stem in rows])
+
+    def removeImages(self, names: typing.Iterable[str]):
+        """Forget unlabeled images, labeled ones are kept with their masks.
+
+        :param names: image paths relative to input directory
+        """
+        with self.__lock, self.__db:
+            if self.__delayed is not None:
+                self.__delayed.append((self.__removeImages, list(names)))
+                return
+            self.__removeImages(names)
+
+    def __removeImages(self, names: typing.Iterable[str]):
+        self.__db.executemany(
+            'DELETE FROM images WHERE name = ? AND status = ?',
+            [(name, self.UNLABELED) for name in names])
+
+    def setStatus(self, name: str, status: int, annotator: str = None):
+        """Change status of image.
+
+        :param name: image path relative to input directory
+        :param status: UNLABELED or LABELED
+        :param annotator: name of user, who changed status
+        """
+        with self.__lock, self.__db:
+            self.__db.execute(
+                """INSERT INTO images (name, status, annotator) VALUES (?1, ?2, ?3)
+                ON CONFLICT (name) DO UPDATE SET status = ?2, annotator = ?3""",
+                (name, status, annotator))
+
+    def updateMask(self, name: str, ids: np.ndarray, mtime: float, annotator: str = None):
+        """Mark image as labeled and store statistics of its mask.
+
+        :param name: image path relative to input directory
+        :param ids: class id of every pixel
+        :param mtime: modification time of mask file
+        :param annotator: name of user, who saved mask
+        """
+        counts = np.bincount(ids.ravel())
+        classes = np.flatnonzero(counts)
+        with self.__lock, self.__db:
+            self.__db.execute(
+                """INSERT INTO images VALUES (?1, ?2, ?3, ?4)
+                ON CONFLICT (name) DO UPDATE SET status = ?2, mask_mtime = ?3, annotator = ?4""",
+                (name, self.LABELED, mtime, annotator))
+            self.__db.execute('DELETE FROM class_pixels WHERE name = ?', (name,))
+            self.__db.executemany(
+                'INSERT INTO class_pixels VALUES (?, ?, ?)',
+                [(name, int(c), int(counts[c])) for c in classes])
+
+    def status(self, name: str) -> typing.Optional[int]:
+        """Return status of image or None, if image is unknown.
+
+        :param name: image path relative to input directory
+        """
+        with self.__lock:
+            row = self.__db.execute(
+                'SELECT status FROM images WHERE name = ?', (name,)).fetchone()
+        return None if row is None else row[0]
+
+    def info(self, name: str) -> typing.Optional[dict]:
+        """Return all stored data of image or None, if image is unknown.
+
+        :param name: image path relative to input directory
+        """
+        with self.__lock:
+            row = self.__db.execute(
+                'SELECT status, mask_mtime, annotator FROM images WHERE name = ?',
+                (name,)).fetchone()
+            if row is None:
+                return None
+            pixels = self.__db.execute(
+                'SELECT class_id, pixels FROM class_pixels WHERE name = ?', (name,)).fetchall()
+        status, mask_mtime, annotator = row
+        return {
+            'status': status,
+            'mask_mtime': mask_mtime,
+            'annotator': annotator,
+            'class_pixels': dict(pixels),
+        }
+
+    def names(self, status: int) -> typing.Set[str]:
+        """Return names of images with given status.
+
+        :param status: UNLABELED or LABELED
+        """
+        with self.__lock:
+            rows = self.__db.execute(
+                'SELECT name FROM images WHERE status = ?', (status,)).fetchall()
+        return {name for name, in rows}
+
+    def next(self, status: int, after: str = '', limit: int = 64) -> typing.List[str]:
+        """Return names of images with given status, which follow name in sorted order.
+
+        Query uses index, so it doesn't depend on number of images.
+
+        :param status: UNLABELED or LABELED
+        :param after: name, which precedes returned names
+        :param limit: max number of returned names
+        """
+        with self.__lock:
+            rows = self.__db.execute(
+                'SELECT name FROM images WHERE status = ? AND name > ? ORDER BY name LIMIT ?',
+                (status, after, limit)).fetchall()
+        return [name for name, in rows]
+
+    def close(self):
+        """Close database."""
+        with self.__lock:
+            self.__db.close()
@@ -0,0 +1,115 @@
+from PyQt5 import QtGui
+from PyQt5.QtCore import Qt
+
+import typing
+
+from .FillTool import FillItem, runsRegion
+from .Superpixels import SuperpixelMap
+
+from typing import TYPE_CHECKING
+if TYPE_CHECKING:
+    from .Canvas import Canvas
+
+
+class Superpixel:
+    """Tool that paints whole superpixels under cursor.
+
+    Superpixels clicked or crossed while mouse button is held are
+    shown as a single FillItem, which is a single undo step.
+    Superpixels of background image are computed in background
+    when image is opened, tool waits for them without blocking.
+    """
+
+    def __init__(self, canvas: 'Canvas', color: QtGui.QColor):
+        """Initialize Superpixel.
+
+        :param canvas: canvas object for drawing
+        :param color: color of painted superpixels
+        """
+        self.canvas = canvas
+        self.color = color
+        self.selected = None
+        self.item = None
+        self.__map = None
+        self.__shapes = {}  # runs and region of every painted superpixel
+        self.canvas.setCursor(self.cursor())
+
+    def superpixelMap(self) -> typing.Optional[SuperpixelMap]:
+        """Return superpixels of background image, if they are ready."""
+        future = self.canvas.superpixels
+        if future is None:
+            print("Superpixels are not available for this image")
+            return None
+        if not future.done():
+            print("Superpixels are being computed")
+            return None
+        if future.exception() is not None:
+            print("Superpixels can't be computed:", future.exception())
+            return None
+        return future.result()
+
+    def __label(self, e) -> typing.Optional[int]:
+        point = self.canvas.mapToScene(e.pos())
+        return self.__map.label(int(point.x()), int(point.y()))
+
+    def mousePressEvent(self, e):
+        """Start painting of superpixels."""
+        if e.button() != Qt.LeftButton:
+            return
+        superpixel_map = self.superpixelMap()
+        if superpixel_map is not self.__map:
+            self.__map = superpixel_map
+            self.__shapes = {}
+        if self.__map is None:
+            return
+        label = self.__label(e)
+        if label is not None:
+            self.selected = {label}
+            self.__update(label)
+
+    def mouseMoveEvent(self, e):
+        """Add superpixel under cursor."""
+        if self.selected is None:
+            return
+        label = self.__label(e)
+        if label is not None and label not in self.selected:
+            self.selected.add(label)
+            self.__update(label)
+
+    def mouseReleaseEvent(self, e):
+        """Finish painting, all painted superpixels are a single undo step."""
+        if self.selected is None:
+            return
+        self.canvas.undo_redo.insert_in_undo_redo_add(self.item)
+        self.selected = None
+        self.item = None
+
+    def __update(self, label: int):
+        """Add superpixel to item, only its own region is united with item.
+
+        :param label: selected superpixel
+        """
+        if label not in self.__shapes:
+            runs = self.__map.runs([label])
+            self.__shapes[label] = (runs, runsRegion(runs))
+        runs, region = self.__shapes[label]
+        if self.item is None:
+            self.item = FillItem(runs, self.color, region)
+            self.canvas.scene.addItem(self.item)
+        else:
+            self.item.addRuns(runs, region)
+
+    def keyPressEvent(self, e):
+        """Skip event."""
+        pass
+
+    def cursor(self):
+        """Pointing cursor shows clicked superpixel."""
+        return Qt.PointingHandCursor
+
+    def clear(self):
+        """Remove superpixels, which are being painted."""
+        if self.item is not None and self.item.scene() is not None:
+            self.item.scene().removeItem(self.item)
+        self.selected = None
+        self.item = None
@@ -0,0 +1,402 @@
+"""Superpixels of background images.
+
+Superpixels are computed by SLIC in a separate process, so neither
+drawing nor Python threads of application wait for them. Results are
+cached on disk by hash of image file, so reopened image gets its
+superpixels at once.
+"""
+from PyQt5 import QtGui
+from PyQt5.QtCore import Qt
+
+import hashlib
+import math
+import multiprocessing
+import os
+import threading
+import typing
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from .FillTool import channelArray, imageArray, maskRuns, scaleRuns
+
+
+def rgbToLab(pixels: np.ndarray) -> np.ndarray:
+    """Convert sRGB colors to CIELAB with D65 white point.
+
+    :param pixels: array of shape (..., 3) with R, G, B in range [0, 255]
+    :return: float32 array of shape (..., 3) with L, a, b
+    """
+    rgb = pixels.astype(np.float32) / 255.
+    rgb = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+    to_xyz = np.array([
+        [0.412453, 0.357580, 0.180423],
+        [0.212671, 0.715160, 0.072169],
+        [0.019334, 0.119193, 0.950227],
+    ], np.float32)
+    xyz = rgb @ to_xyz.T / np.array([0.950456, 1., 1.088754], np.float32)
+    f = np.where(xyz > 0.008856, np.cbrt(xyz), 7.787 * xyz + 16. / 116.)
+    lab = np.empty_like(f)
+    lab[..., 0] = 116. * f[..., 1] - 16.
+    lab[..., 1] = 500. * (f[..., 0] - f[..., 1])
+    lab[..., 2] = 200. * (f[..., 1] - f[..., 2])
+    return lab
+
+
+def slic(
+        pixels: np.ndarray,
+        segments: int = 2000,
+        compactness: float = 10.,
+        iterations: int = 5) -> np.ndarray:
+    """Split image into superpixels by SLIC algorithm.
+
+    Centers of superpixels start on square grid. Every pixel can belong
+    only to centers of its own and 8 neighbour grid cells, so image is
+    processed as array of cells and distances to 9 candidate centers are
+    computed by broadcasting without gathering centers per pixel.
+    Disconnected pieces of superpixels are merged into neighbour ones.
+
+    :param pixels: array of shape (height, width, 3) with R, G, B
+    :param segments: approximate number of superpixels
+    :param compactness: weight of spatial distance relative to color distance
+    :param iterations: number of center updates
+    :return: int32 array of shape (height, width) with superpixel of every pixel
+    """
+    height, width = pixels.shape[:2]
+    step = max(1, int(round(math.sqrt(height * width / segments))))
+    rows, columns = -(-height // step), -(-width // step)
+    shape = (rows, step, columns, step)
+    # image is padded to whole cells
+    lab = np.pad(
+        rgbToLab(pixels),
+        ((0, rows * step - height), (0, columns * step - width), (0, 0)),
+        mode='edge')
+    channels = [np.ascontiguousarray(lab[..., k]).reshape(shape) for k in range(3)]
+    ys = np.arange(rows * step, dtype=np.float32).reshape(rows, step, 1, 1)
+    xs = np.arange(columns * step, dtype=np.float32).reshape(1, 1, columns, step)
+    # y, x, L, a, b of centers surrounded by unreachable ones
+    centers = np.full((rows + 2, columns + 2, 5), 1e6, np.float32)
+    inner = centers[1:-1, 1:-1]
+    inner[..., 0] = np.minimum((np.arange(rows) + .5) * step, height - 1)[:, None]
+    inner[..., 1] = np.minimum((np.arange(columns) + .5) * step, width - 1)[None, :]
+    for k in range(3):
+        inner[..., 2 + k] = channels[k].mean(axis=(1, 3))
+    weight = (compactness / step) ** 2
+    offsets = np.array([(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)], np.int32)
+    cell_rows = np.arange(rows, dtype=np.int32).reshape(rows, 1, 1, 1)
+    cell_columns = np.arange(columns, dtype=np.int32).reshape(1, 1, columns, 1)
+    pixel_rows, pixel_columns = np.divmod(np.arange(height * width, dtype=np.int32), width)
+    features = [pixel_rows, pixel_columns] + [lab[:height, :width, k].ravel() for k in range(3)]
+    best = np.empty(shape, np.float32)
+    distance = np.empty(shape, np.float32)
+    difference = np.empty(shape, np.float32)
+    closer = np.empty(shape, bool)
+    choice = np.empty(shape, np.uint8)
+    for _ in range(iterations):
+        best.fill(np.inf)
+        for i, (dy, dx) in enumerate(offsets):
+            center = centers[1 + dy:1 + dy + rows, 1 + dx:1 + dx + columns].reshape(rows, 1, columns, 1, 5)
+            np.add(weight * (ys - center[..., 0]) ** 2, weight * (xs - center[..., 1]) ** 2, out=distance)
+            for k in range(3):
+                np.subtract(channels[k], center[..., 2 + k], out=difference)
+                difference *= difference
+                distance += difference
+            np.less(distance, best, out=closer)
+            np.copyto(best, distance, where=closer)
+            np.copyto(choice, i, where=closer)
+        labels = (cell_rows + offsets[choice, 0]) * columns + cell_columns + offsets[choice, 1]
+        labels = labels.reshape(rows * step, columns * step)[:height, :width]
+        flat = labels.ravel()
+        counts = np.bincount(flat, minlength=rows * columns)
+        alive = counts > 0
+        updated = inner.reshape(-1, 5)
+        for k, values in enumerate(features):
+            updated[alive, k] = np.bincount(flat, values, minlength=rows * columns)[alive] / counts[alive]
+        inner[...] = updated.reshape(rows, columns, 5)
+    return enforceConnectivity(np.ascontiguousarray(labels, np.int32), lab[:height, :width])
+
+
+def connectedComponents(count: int, first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Find connected components of graph.
+
+    Roots of trees are hooked to smaller roots along edges,
+    then trees are flattened, until all edges are inside trees.
+
+    :param count: number of vertices
+    :param first: first vertices of edges
+    :param second: second vertices of edges
+    :return: the smallest vertex of component of every vertex
+    """
+    parent = np.arange(count)
+    while True:
+        a, b = parent[first], parent[second]
+        if np.array_equal(a, b):
+            return parent
+        np.minimum.at(parent, np.maximum(a, b), np.minimum(a, b))
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+
+def enforceConnectivity(labels: np.ndarray, colors: np.ndarray) -> np.ndarray:
+    """Keep the largest connected piece of every label, merge others into neighbours.
+
+    Image is processed as runs of pixels with the same label in rows.
+    Piece gets label of the piece, which run touches its first run from
+    the left, from the right or from above and has the closest mean color.
+    If that piece is merged too, its target is followed, until kept piece
+    is found. Runs of rare cyclic pieces get labels of the nearest kept
+    runs in the same row.
+
+    :param labels: int array of shape (height, width)
+    :param colors: float array of shape (height, width, channels)
+    :return: labels, which pixels are 4-connected
+    """
+    height, width = labels.shape
+    begins = np.ones((height, width), bool)
+    begins[:, 1:] = labels[:, 1:] != labels[:, :-1]
+    starts = np.flatnonzero(begins)
+    count = len(starts)
+    lengths = np.diff(starts, append=height * width)
+    run_labels = labels.ravel()[starts]
+    # runs of the same label in neighbour rows are connected
+    run_of_pixel = np.repeat(np.arange(count), lengths).reshape(height, width)
+    same = labels[1:] == labels[:-1]
+    edges = np.unique(run_of_pixel[:-1][same] * count + run_of_pixel[1:][same])
+    component = connectedComponents(count, *np.divmod(edges, count))
+    sizes = np.bincount(component, lengths, minlength=count)
+    roots = np.flatnonzero(component == np.arange(count))
+    # the largest component of label goes last among components of label
+    order = roots[np.lexsort((sizes[roots], run_labels[roots]))]
+    largest = order[np.append(run_labels[order][1:] != run_labels[order][:-1], True)]
+    kept = np.zeros(count, bool)
+    kept[largest] = True
+    if kept[roots].all():
+        return labels
+    # root of component is its first run, runs to the left, to the right
+    # and above it belong to other components
+    indices = np.arange(count)
+    row, column = np.divmod(starts, width)
+    previous = np.maximum(indices - 1, 0)
+    following = np.minimum(indices + 1, count - 1)
+    candidates = np.stack([
+        np.where(row[previous] == row, previous, -1),
+        np.where(row[following] == row, following, -1),
+        np.where(row > 0, run_of_pixel[np.maximum(row - 1, 0), column], -1),
+    ], axis=1)
+    flat_colors = colors.reshape(height * width, -1)
+    means = np.add.reduceat(flat_colors, starts, axis=0) / lengths[:, None]
+    distances = ((means[candidates] - means[:, None]) ** 2).sum(axis=2)
+    distances[candidates < 0] = np.inf
+    nearest = candidates[indices, np.argmin(distances, axis=1)]
+    neighbour = np.where(nearest >= 0, nearest, indices)
+    target = np.where(kept, indices, component[neighbour])
+    for _ in range(32):
+        target = target[target]
+    resolved = kept[target[component]]
+    run_labels = np.where(resolved, run_labels[target[component]], run_labels)
+    if not resolved.all():
+        left = np.maximum.accumulate(np.where(resolved, indices, -1))
+        right = np.minimum.accumulate(np.where(resolved, indices, count)[::-1])[::-1]
+        source = np.where(
+            (left >= 0) & (row[np.maximum(left, 0)] == row), left,
+            np.where((right < count) & (row[np.minimum(right, count - 1)] == row), right, indices))
+        run_labels = run_labels[source]
+    return np.repeat(run_labels, lengths).reshape(height, width).astype(np.int32)
+
+
+def labelBoxes(labels: np.ndarray) -> np.ndarray:
+    """Return bounding boxes of labels.
+
+    :param labels: non-negative int array of shape (height, width)
+    :return: array of shape (max label + 1, 4) with top, left, bottom + 1 and right + 1,
+        boxes of missing labels are empty
+    """
+    boxes = np.zeros((int(labels.max()) + 1, 4), np.int32)
+    for flat, size, first, last in (
+            (labels.ravel(), labels.shape[1], 0, 2),
+            (labels.T.ravel(), labels.shape[0], 1, 3)):
+        present, begin = np.unique(flat, return_index=True)
+        _, end = np.unique(flat[::-1], return_index=True)
+        boxes[present, first] = begin // size
+        boxes[present, last] = (len(flat) - 1 - end) // size + 1
+    return boxes
+
+
+def computeSuperpixels(
+        path: str,
+        segments: int,
+        max_pixels: int) -> typing.Tuple[np.ndarray, np.ndarray, int, int]:
+    """Decode image and compute its superpixels (runs in worker process).
+
+    Large image is downscaled to max_pixels before computation.
+
+    :param path: image file path
+    :param segments: approximate number of superpixels
+    :param max_pixels: max number of pixels, which are processed
+    :return: labels, their bounding boxes and size of original image
+    """
+    image = QtGui.QImage(path)
+    if image.isNull():
+        raise ValueError(f"Can't read image {path}")
+    width, height = image.width(), image.height()
+    scale = min(1., math.sqrt(max_pixels / (width * height)))
+    if scale < 1.:
+        image = image.scaled(
+            max(1, round(width * scale)), max(1, round(height * scale)),
+            Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+    pixels = channelArray(imageArray(image))[..., ::-1]
+    labels = slic(pixels, segments)
+    return labels, labelBoxes(labels), width, height
+
+
+class SuperpixelMap:
+    """Superpixel labels of image.
+
+    Labels may be computed for downscaled image, they are mapped
+    to pixels of original image.
+    """
+
+    def __init__(self, labels: np.ndarray, boxes: np.ndarray, width: int, height: int):
+        """Create map.
+
+        :param labels: superpixel of every pixel
+        :param boxes: bounding boxes of superpixels in labels
+        :param width: width of original image
+        :param height: height of original image
+        """
+        self.labels = labels
+        self.boxes = boxes
+        self.width = width
+        self.height = height
+
+    def label(self, x: int, y: int) -> typing.Optional[int]:
+        """Return superpixel of image pixel or None if pixel is outside image.
+
+        :param x: column of image pixel
+        :param y: row of image pixel
+        """
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        rows, columns = self.labels.shape
+        return int(self.labels[y * rows // self.height, x * columns // self.width])
+
+    def runs(self, selected: typing.Iterable[int]) -> np.ndarray:
+        """Return runs of image pixels, which belong to selected superpixels.
+
+        :param selected: superpixels
+        :return: runs as array of shape (n, 3) with row, first and last + 1 column
+        """
+        selected = np.fromiter(selected, np.int32)
+        boxes = self.boxes[selected]
+        top, left = boxes[:, :2].min(axis=0)
+        bottom, right = boxes[:, 2:].max(axis=0)
+        runs = maskRuns(np.isin(self.labels[top:bottom, left:right], selected))
+        runs += np.array([top, left, left], np.int32)
+        return scaleRuns(runs, self.labels.shape, self.width, self.height)
+
+
+class Superpixels:
+    """Compute superpixels of images in background and cache them on disk.
+
+    Cache is looked up in a thread, superpixels of images, which are not
+    cached, are computed in a separate process, started by spawn method,
+    so it doesn't inherit state of GUI process. The process is started
+    on the first computation.
+    """
+
+    DIRECTORY = '.dl_markup_superpixels'
+    """Cache directory inside output directory."""
+
+    def __init__(self, segments: int = 2000, max_pixels: int = 2 * 2**20):
+        """Create computer of superpixels.
+
+        :param segments: approximate number of superpixels of image
+        :param max_pixels: larger images are downscaled before computation
+        """
+        self.segments = segments
+        self.max_pixels = max_pixels
+        self.__loader = ThreadPoolExecutor(2, thread_name_prefix='dl_markup-superpixels')
+        self.__processes = None
+        # callback of finished request is called by the thread, which adds it
+        self.__lock = threading.RLock()
+        self.__requests = {}
+        self.__computations = set()
+
+    def request(self, path: str, cache_dir: str) -> Future:
+        """Start loading or computation of superpixels.
+
+        Computations of previously requested images, which haven't
+        started yet, are cancelled.
+
+        :param path: image file path
+        :param cache_dir: directory of cached superpixels
+        :return: future of SuperpixelMap
+        """
+        with self.__lock:
+            future = self.__requests.pop((path, cache_dir), None)
+            for computation in self.__computations:
+                computation.cancel()
+            for request in self.__requests.values():
+                request.cancel()
+            self.__requests.clear()
+            if future is None or future.cancelled():
+                future = self.__loader.submit(self.__load, path, cache_dir)
+                future.add_done_callback(partial(self.__forget, (path, cache_dir)))
+            self.__requests[path, cache_dir] = future
+            return future
+
+    def __forget(self, key: typing.Tuple[str, str], future: Future):
+        with self.__lock:
+            if self.__requests.get(key) is future:
+                del self.__requests[key]
+
+    def cachePath(self, path: str, cache_dir: str) -> str:
+        """Return cache file of image, which is named by hash of image file.
+
+        :param path: image file path
+        :param cache_dir: directory of cached superpixels
+        """
+        digest = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(2**20), b''):
+                digest.update(chunk)
+        name = f'{digest.hexdigest()}-{self.segments}-{self.max_pixels}.npz'
+        return os.path.join(cache_dir, name)
+
+    def __load(self, path: str, cache_dir: str) -> SuperpixelMap:
+        cache_path = self.cachePath(path, cache_dir)
+        if os.path.exists(cache_path):
+            with np.load(cache_path) as data:
+                return SuperpixelMap(data['labels'], data['boxes'], *data['size'].tolist())
+        with self.__lock:
+            if self.__processes is None:
+                self.__processes = ProcessPoolExecutor(
+                    1, mp_context=multiprocessing.get_context('spawn'))
+            computation = self.__processes.submit(
+                computeSuperpixels, path, self.segments, self.max_pixels)
+            self.__computations.add(computation)
+        try:
+            labels, boxes, width, height = computation.result()
+        finally:
+            with self.__lock:
+                self.__computations.discard(computation)
+        os.makedirs(cache_dir, exist_ok=True)
+        # other application can read the same cache
+        tmp_path = os.path.join(cache_dir, f'.{uuid.uuid4().hex}.tmp.npz')
+        np.savez_compressed(tmp_path, labels=labels, boxes=boxes, size=np.array([width, height]))
+        os.replace(tmp_path, cache_path)
+        return SuperpixelMap(labels, boxes, width, height)
+
+    def close(self):
+        """Drop requests, which haven't started yet."""
+        with self.__lock:
+            for future in [*self.__requests.values(), *self.__computations]:
+                future.cancel()
+            self.__loader.shutdown(wait=False)
+            if self.__processes is not None:
+                self.__processes.shutdown(wait=False)
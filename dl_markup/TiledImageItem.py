@@ -0,0 +1,290 @@
+from PyQt5 import QtGui, QtCore, QtWidgets
+
+import math
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TiledImageItem(QtWidgets.QGraphicsObject):
+    """Drawing item for images, which are too large to be decoded at once.
+
+    Image is represented as pyramid of tiles: level 0 has full
+    resolution, each next level is twice smaller. Only tiles visible
+    on canvas are decoded (in background threads) and cached, so
+    memory usage is bounded by screen size instead of image size.
+    While tile is being decoded, the coarser cached tile is drawn.
+
+    Tiles are decoded directly from the file, if its decoder supports
+    clip rect and scaled size (e.g. JPEG). Otherwise the image is decoded
+    once in background thread and its pyramid is written to temporary
+    directory, so every tile is read from its own small file.
+    """
+
+    MAX_DECODE_BYTES = 2**30
+    """Images without clip rect support, which need more memory, are refused."""
+
+    tileReady = QtCore.pyqtSignal(object, QtGui.QImage)
+    """Emitted from decoding thread with tile key and tile image."""
+
+    def __init__(
+            self,
+            path: str,
+            tile_size: int = 512,
+            max_bytes: int = 256 * 2**20,
+            max_workers: int = 2,
+            max_decode_bytes: int = MAX_DECODE_BYTES,
+            *args,
+            **kwargs):
+        """Initialize TiledImageItem.
+
+        :param path: image file path
+        :param tile_size: side of tile in pixels
+        :param max_bytes: max total size of cached tiles
+        :param max_workers: number of decoding threads
+        :param max_decode_bytes: max size of image decoded at once
+        :raises ValueError: if image can't be decoded by tiles and is too large
+        """
+        super().__init__(*args, **kwargs)
+        native = self.check(path, max_decode_bytes)
+        self.path = path
+        self.tile_size = tile_size
+        self.max_bytes = max_bytes
+        self.__size = self.imageSize(path)
+        # the coarsest level fits into single tile
+        longest = max(self.__size.width(), self.__size.height(), 1)
+        self.levels = max(0, math.ceil(math.log2(longest / tile_size))) + 1
+        self.__cache = OrderedDict()
+        self.__cache_bytes = 0
+        # futures of tiles being decoded
+        self.__pending = {}
+        self.__lock = threading.Lock()
+        self.__closed = False
+        self.__executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix='dl_markup-tile')
+        self.__tiles_dir = None
+        self.__pyramid = None
+        if not native:
+            self.__tiles_dir = tempfile.TemporaryDirectory(prefix='dl_markup-tiles-')
+            # submitted first, so tiles requested later wait for it
+            self.__pyramid = self.__executor.submit(self.__buildPyramid)
+        self.tileReady.connect(self.__store)
+        # paint receives exposed rectangle, so only visible tiles are decoded
+        flag = QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption
+        self.setFlag(flag)
+        # overview is decoded first and then kept in cache
+        self.__request((self.levels - 1, 0, 0))
+
+    @staticmethod
+    def imageSize(path: str) -> QtCore.QSize:
+        """Read image size from file header without decoding.
+
+        :param path: image file path
+        """
+        return QtGui.QImageReader(path).size()
+
+    @classmethod
+    def check(cls, path: str, max_decode_bytes: int = MAX_DECODE_BYTES) -> bool:
+        """Check if image can be shown by tiles.
+
+        Return True if tiles are decoded directly from the file
+        and False if image has to be decoded once into pyramid.
+
+        :param path: image file path
+        :param max_decode_bytes: max size of image decoded at once
+        :raises ValueError: if image can't be decoded by tiles and is too large
+        """
+        reader = QtGui.QImageReader(path)
+        if reader.supportsOption(QtGui.QImageIOHandler.ClipRect) and \
+                reader.supportsOption(QtGui.QImageIOHandler.ScaledSize):
+            return True
+        size = reader.size()
+        if size.width() * size.height() * 4 > max_decode_bytes:
+            fmt = bytes(reader.format()).decode() or 'unknown'
+            raise ValueError(
+                f"Image {path} ({size.width()}x{size.height()}) is too large: "
+                f"{fmt} format can't be decoded by tiles, "
+                f"convert it to JPEG or a smaller image")
+        return False
+
+    def width(self) -> int:
+        """Return full resolution width."""
+        return self.__size.width()
+
+    def height(self) -> int:
+        """Return full resolution height."""
+        return self.__size.height()
+
+    def boundingRect(self) -> QtCore.QRectF:
+        """Create bounding box for current item."""
+        return QtCore.QRectF(0, 0, self.__size.width(), self.__size.height())
+
+    def __tileRect(self, key: tuple) -> QtCore.QRect:
+        """Return part of full resolution image covered by tile."""
+        level, col, row = key
+        side = self.tile_size << level
+        rect = QtCore.QRect(col * side, row * side, side, side)
+        return rect.intersected(QtCore.QRect(QtCore.QPoint(0, 0), self.__size))
+
+    def __levelRect(self, key: tuple) -> QtCore.QRect:
+        """Return part of level image covered by tile."""
+        level = key[0]
+        rect = self.__tileRect(key)
+        return QtCore.QRect(
+            rect.x() >> level,
+            rect.y() >> level,
+            max(1, rect.width() >> level),
+            max(1, rect.height() >> level),
+        )
+
+    def __tilePath(self, key: tuple) -> str:
+        return os.path.join(self.__tiles_dir.name, '{}_{}_{}.bmp'.format(*key))
+
+    def __buildPyramid(self) -> bool:
+        """Decode image once and write tiles of all levels (called in background thread)."""
+        image = QtGui.QImageReader(self.path).read()
+        if image.isNull():
+            print("Can't read image", self.path)
+            return False
+        for level in range(self.levels):
+            if level > 0:
+                image = image.scaled(
+                    max(1, self.__size.width() >> level),
+                    max(1, self.__size.height() >> level),
+                    transformMode=QtCore.Qt.SmoothTransformation)
+            side = self.tile_size << level
+            for row in range(math.ceil(self.__size.height() / side)):
+                for col in range(math.ceil(self.__size.width() / side)):
+                    if self.__closed:
+                        return False
+                    key = (level, col, row)
+                    rect = self.__levelRect(key).intersected(image.rect())
+                    image.copy(rect).save(self.__tilePath(key), 'bmp')
+        return True
+
+    def __decode(self, key: tuple) -> QtGui.QImage:
+        """Decode single tile (called in background thread)."""
+        if self.__pyramid is not None:
+            if not self.__pyramid.result():
+                return QtGui.QImage()
+            return QtGui.QImage(self.__tilePath(key))
+        rect = self.__levelRect(key)
+        reader = QtGui.QImageReader(self.path)
+        # decoders, which support these options, don't decode whole image
+        reader.setClipRect(self.__tileRect(key))
+        reader.setScaledSize(rect.size())
+        return reader.read()
+
+    def __load(self, key: tuple):
+        """Decode tile and pass it to GUI thread (called in background thread)."""
+        if self.__closed:
+            return
+        tile = self.__decode(key)
+        if not self.__closed:
+            self.tileReady.emit(key, tile)
+
+    def __request(self, key: tuple):
+        """Start decoding of tile."""
+        with self.__lock:
+            if key in self.__pending or self.__closed:
+                return
+            self.__pending[key] = self.__executor.submit(self.__load, key)
+
+    def __store(self, key: tuple, tile: QtGui.QImage):
+        """Put tile to cache and evict least recently used tiles."""
+        with self.__lock:
+            self.__pending.pop(key, None)
+        if tile.isNull():
+            return
+        self.__cache[key] = tile
+        self.__cache_bytes += tile.sizeInBytes()
+        top = (self.levels - 1, 0, 0)
+        while self.__cache_bytes > self.max_bytes:
+            evicted_key = next(iter(self.__cache))
+            if evicted_key == top:
+                # keep overview, it's the last resort for painting
+                self.__cache.move_to_end(top)
+                evicted_key = next(iter(self.__cache))
+                if evicted_key == top:
+                    break
+            self.__cache_bytes -= self.__cache.pop(evicted_key).sizeInBytes()
+        self.update(QtCore.QRectF(self.__tileRect(key)))
+
+    def __cached(self, key: tuple) -> QtGui.QImage:
+        tile = self.__cache.get(key)
+        if tile is not None:
+            self.__cache.move_to_end(key)
+        return tile
+
+    def __level(self, painter: QtGui.QPainter) -> int:
+        """Choose level, which resolution is close to screen resolution."""
+        lod = QtWidgets.QStyleOptionGraphicsItem.levelOfDetailFromTransform(
+            painter.worldTransform())
+        if lod <= 0:
+            return self.levels - 1
+        return min(self.levels - 1, max(0, int(math.floor(math.log2(1 / lod)))))
+
+    def paint(
+            self,
+            painter: QtGui.QPainter,
+            option: QtWidgets.QStyleOptionGraphicsItem,
+            widget: QtWidgets.QWidget):
+        """Paint visible tiles."""
+        level = self.__level(painter)
+        side = self.tile_size << level
+        exposed = option.exposedRect.intersected(self.boundingRect())
+        if exposed.isEmpty():
+            return
+        cols = range(int(exposed.left()) // side, int(math.ceil(exposed.right())) // side + 1)
+        rows = range(int(exposed.top()) // side, int(math.ceil(exposed.bottom())) // side + 1)
+        painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+        for row in rows:
+            for col in cols:
+                key = (level, col, row)
+                rect = self.__tileRect(key)
+                if rect.isEmpty():
+                    continue
+                tile = self.__cached(key)
+                if tile is None:
+                    self.__request(key)
+                    self.__paintCoarser(painter, key, rect)
+                    continue
+                painter.drawImage(QtCore.QRectF(rect), tile)
+
+    def __paintCoarser(self, painter: QtGui.QPainter, key: tuple, rect: QtCore.QRect):
+        """Paint part of the closest cached coarser tile."""
+        level, col, row = key
+        for coarse_level in range(level + 1, self.levels):
+            shift = coarse_level - level
+            coarse_key = (coarse_level, col >> shift, row >> shift)
+            tile = self.__cached(coarse_key)
+            if tile is None:
+                continue
+            coarse_rect = self.__tileRect(coarse_key)
+            scale = 1 << coarse_level
+            source = QtCore.QRectF(
+                (rect.x() - coarse_rect.x()) / scale,
+                (rect.y() - coarse_rect.y()) / scale,
+                rect.width() / scale,
+                rect.height() / scale,
+            )
+            painter.drawImage(QtCore.QRectF(rect), tile, source)
+            return
+
+    def close(self):
+        """Stop decoding threads and remove temporary tiles.
+
+        Queued tiles are cancelled and running ones are not emitted.
+        """
+        with self.__lock:
+            self.__closed = True
+            for future in self.__pending.values():
+                future.cancel()
+            self.__pending.clear()
+        self.__executor.shutdown(wait=False)
+        if self.__pyramid is not None:
+            self.__pyramid.cancel()
+            # pyramid can be still being written
+            self.__pyramid.add_done_callback(lambda _: self.__tiles_dir.cleanup())
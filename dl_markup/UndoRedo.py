@@ -1,13 +1,19 @@
 from abc import ABC, abstractmethod
+from collections import deque
+import typing
 
-from PyQt5 import QtWidgets
+from PyQt5 import QtCore, QtGui, QtWidgets
 
 from .Scene import Scene
+from .MaskItem import MaskItem
 
 
 class ICommand(ABC):
     """Abstract command."""
 
+    ITEM_BYTES = 512
+    """Approximate size of graphics item without its geometry."""
+
     @abstractmethod
     def execute(self):
         """Execute command."""
@@ -18,6 +24,48 @@ class ICommand(ABC):
         """Undo command execution."""
         pass
 
+    def size(self) -> int:
+        """Return approximate number of bytes kept for undo/redo.
+
+        Size shouldn't change while command is in history.
+        """
+        return 0
+
+    @classmethod
+    def itemSize(cls, item: typing.Optional[QtWidgets.QGraphicsItem]) -> int:
+        """Return approximate size of item with its path, polygon or runs of pixels.
+
+        :param item: markup item or None
+        """
+        if item is None:
+            return 0
+        size = cls.ITEM_BYTES
+        if callable(getattr(item, 'path', None)):
+            # element of path is x, y and type
+            size += 24 * item.path().elementCount()
+        elif isinstance(item, QtWidgets.QGraphicsPolygonItem):
+            size += 16 * item.polygon().size()
+        runs = getattr(item, 'runs', None)
+        if runs is not None:
+            # runs and rectangles of region
+            size += 2 * runs.nbytes
+        return size
+
+    def flatten(self):
+        """Free undo data, when command leaves history.
+
+        Command is executed at this moment, its result
+        becomes a permanent part of the scene.
+        """
+        pass
+
+    def droppedItems(self, executed: bool) -> typing.List[QtWidgets.QGraphicsItem]:
+        """Return items, which can't return to scene, when command leaves history.
+
+        :param executed: command is flattened (True) or dropped from redo history (False)
+        """
+        return []
+
 
 class AddCommand(ICommand):
     """Command adding new item to scene."""
@@ -33,73 +81,415 @@ class AddCommand(ICommand):
         """
         self.__item = item
         self.__scene = scene
+        self.__parent = item.parentItem()
+        # tools usually create items already placed on scene
+        self.__attached = item.scene() is scene
+        self.__size = self.itemSize(item)
+
+    @property
+    def item(self) -> QtWidgets.QGraphicsItem:
+        """Item added by command."""
+        return self.__item
+
+    def size(self) -> int:
+        """Return size of added item."""
+        return self.__size
+
+    def droppedItems(self, executed: bool) -> typing.List[QtWidgets.QGraphicsItem]:
+        """Return added item, if command is dropped undone."""
+        return [] if executed else [self.__item]
 
     def execute(self):
         """Add item to scene."""
-        if self.__item not in self.__scene.items():
+        if self.__attached:
+            return
+        if self.__parent is not None:
+            self.__item.setParentItem(self.__parent)
+        else:
             self.__scene.addItem(self.__item)
+        self.__attached = True
 
     def un_execute(self):
         """Remove item from scene."""
+        if not self.__attached:
+            return
+        self.__parent = self.__item.parentItem()
         self.__scene.removeItem(self.__item)
+        self.__attached = False
+
+
+class ReplaceCommand(ICommand):
+    """Command replacing items with their changed copies.
+
+    Copy takes place of its item in painting order. Item without
+    copy is removed, on undo it's put back below the nearest item,
+    which was painted over it.
+    """
+
+    def __init__(
+            self,
+            pairs: typing.List[typing.Tuple[QtWidgets.QGraphicsItem, typing.Optional[QtWidgets.QGraphicsItem]]],
+            scene: Scene):
+        """Initialize new command.
+
+        :param pairs: items on scene and their copies or None
+        :param scene: scene to operate with
+        """
+        self.__pairs = pairs
+        self.__scene = scene
+        # the nearest items painted over replaced items
+        self.__above = None
+        self.__size = sum(self.itemSize(old) + self.itemSize(new) for old, new in pairs)
+
+    @property
+    def pairs(self) -> typing.List[typing.Tuple[QtWidgets.QGraphicsItem, typing.Optional[QtWidgets.QGraphicsItem]]]:
+        """Replaced items and their copies."""
+        return self.__pairs
+
+    def __itemAbove(self, item: QtWidgets.QGraphicsItem) -> typing.Optional[QtWidgets.QGraphicsItem]:
+        """Return the nearest top-level item painted over item."""
+        # only overlapping items are found by scene index
+        above = None
+        for other in self.__scene.items(item.sceneBoundingRect(), QtCore.Qt.IntersectsItemBoundingRect):
+            if other is item:
+                return above
+            if other.parentItem() is None and other.zValue() == item.zValue():
+                above = other
+        return None
+
+    def execute(self):
+        """Put copies in place of items."""
+        if self.__above is None:
+            self.__above = [
+                self.__itemAbove(old) if new is None else None
+                for old, new in self.__pairs]
+        # removed top-level item makes scene reorder all items on the next
+        # addition, so items are first added, then ordered, then removed
+        for old, new in self.__pairs:
+            if new is not None:
+                self.__scene.addItem(new)
+                new.stackBefore(old)
+        for old, _ in self.__pairs:
+            self.__scene.removeItem(old)
+
+    def un_execute(self):
+        """Put items back in place of copies."""
+        for old, _ in self.__pairs:
+            self.__scene.addItem(old)
+        for old, new in self.__pairs:
+            if new is not None:
+                old.stackBefore(new)
+        # item above may be replaced item, which is in place now
+        for (old, new), above in zip(self.__pairs, self.__above):
+            if new is None and above is not None and above.scene() is self.__scene:
+                old.stackBefore(above)
+        for _, new in self.__pairs:
+            if new is not None:
+                self.__scene.removeItem(new)
+
+    def size(self) -> int:
+        """Return size of replaced items and their copies."""
+        return self.__size
+
+    def droppedItems(self, executed: bool) -> typing.List[QtWidgets.QGraphicsItem]:
+        """Return replaced items or their copies, which aren't on scene."""
+        if executed:
+            return [old for old, _ in self.__pairs]
+        return [new for _, new in self.__pairs if new is not None]
+
+    def flatten(self):
+        """Drop replaced items, copies stay on scene."""
+        self.__pairs = []
+        self.__above = []
+
+
+class PaintCommand(ICommand):
+    """Command painting item into mask buffer.
+
+    Item is removed from scene after painting,
+    command keeps only changed part of the buffer.
+    """
+
+    def __init__(
+            self,
+            item: QtWidgets.QGraphicsItem,
+            mask: MaskItem):
+        """Initialize new command.
 
+        :param item: item to be painted
+        :param mask: mask buffer to paint in
+        """
+        self.__item = item
+        self.__mask = mask
+        self.__rect = None
+        self.__before = None
+        self.__after = None
+
+    @classmethod
+    def restored(
+            cls,
+            mask: MaskItem,
+            rect: QtCore.QRect,
+            before: QtGui.QImage,
+            after: QtGui.QImage) -> 'PaintCommand':
+        """Create command from patches of command, which was executed before.
+
+        Executed command sets the patch after painting.
+
+        :param mask: mask buffer
+        :param rect: changed part of the buffer
+        :param before: the part before painting
+        :param after: the part after painting
+        """
+        command = cls(None, mask)
+        command.__rect = rect
+        command.__before = before
+        command.__after = after
+        return command
+
+    @property
+    def patches(self) -> typing.Tuple[QtCore.QRect, QtGui.QImage, QtGui.QImage]:
+        """Changed part of the buffer and its patches before and after painting."""
+        return self.__rect, self.__before, self.__after
+
+    def execute(self):
+        """Paint item into mask."""
+        if self.__item is None:
+            self.__mask.setPatch(self.__rect, self.__after)
+            return
+        self.__rect = self.__mask.rasterRect(self.__item)
+        self.__before = self.__mask.patch(self.__rect)
+        self.__mask.paintItem(self.__item)
+        self.__after = self.__mask.patch(self.__rect)
+        scene = self.__item.scene()
+        if scene is not None:
+            scene.removeItem(self.__item)
+        self.__item = None
+
+    def un_execute(self):
+        """Restore mask."""
+        self.__mask.setPatch(self.__rect, self.__before)
+
+    def size(self) -> int:
+        """Return size of stored mask patches."""
+        return sum(
+            patch.sizeInBytes()
+            for patch in (self.__before, self.__after)
+            if patch is not None)
+
+    def flatten(self):
+        """Drop stored mask patches, painted item stays in mask."""
+        self.__before = None
+        self.__after = None
+
+
+class UndoRedo(QtCore.QObject):
+    """Class for saving drawing history and performing undo/redo functionality.
+
+    Every state of the scene has a generation number, so checking for
+    unsaved changes is a comparison of current and saved generations.
+    Undoing back to the saved state makes the scene unmodified again.
+
+    History is bounded by number of commands and by size of undo data.
+    The oldest commands above the limits are flattened: their results
+    become a permanent base of the scene and can't be undone.
+    """
+
+    modifiedChanged = QtCore.pyqtSignal(bool)
+    """Emitted when scene becomes different from saved state or returns to it."""
+
+    itemAdded = QtCore.pyqtSignal(object)
+    """Emitted with new item before command adding it is executed."""
+
+    itemsReplaced = QtCore.pyqtSignal(object)
+    """Emitted with pairs of items and their copies before command replacing them is executed."""
+
+    undone = QtCore.pyqtSignal(int)
+    """Emitted with number of undone actions."""
+
+    redone = QtCore.pyqtSignal(int)
+    """Emitted with number of redone actions."""
+
+    itemsDropped = QtCore.pyqtSignal(object)
+    """Emitted with items, which have left both history and scene for good."""
 
-class UndoRedo:
-    """Class for saving drawing history and performing undo/redo functionality."""
+    cleared = QtCore.pyqtSignal()
+    """Emitted after history is cleared."""
 
-    def __init__(self, scene: Scene):
+    def __init__(
+            self,
+            scene: Scene,
+            max_commands: int = 1000,
+            max_bytes: int = 256 * 2**20):
         """Initialize UndoRedo object.
 
         :param scene: scene for drawing
+        :param max_commands: max number of commands in history
+        :param max_bytes: max size of undo data in history
         """
-        self.__undo_commands = []
+        super().__init__()
+        self.max_commands = max_commands
+        self.max_bytes = max_bytes
+        # pairs of command and generation of the state after its execution
+        self.__undo_commands = deque()
         self.__redo_commands = []
+        self.__history_bytes = 0
         self.__container = scene
+        self.__last_generation = 0
+        # generation of the state before the first command in history
+        self.__base_generation = 0
+        self.__saved_generation = 0
+
+    @property
+    def generation(self) -> int:
+        """Number of the current state of the scene."""
+        if self.__undo_commands:
+            return self.__undo_commands[-1][1]
+        return self.__base_generation
+
+    @property
+    def modified(self) -> bool:
+        """Check if scene differs from saved state."""
+        return self.generation != self.__saved_generation
+
+    def mark_saved(self):
+        """Remember current state as saved."""
+        modified = self.modified
+        self.__saved_generation = self.generation
+        if modified:
+            self.modifiedChanged.emit(False)
+
+    def __new_generation(self) -> int:
+        self.__last_generation += 1
+        return self.__last_generation
+
+    def __notify(self, modified: bool):
+        """Emit modifiedChanged if modification status differs from the given one."""
+        if self.modified != modified:
+            self.modifiedChanged.emit(self.modified)
 
     def undo(self, levels: int):
         """Undo last actions.
 
         :param levels: number of actions to undo
         """
-        for _ in range(levels):
-            if not self.__undo_commands:
-                break
-            command = self.__undo_commands.pop()
+        modified = self.modified
+        count = min(levels, len(self.__undo_commands))
+        for _ in range(count):
+            command, generation = self.__undo_commands.pop()
             command.un_execute()
-            self.__redo_commands.append(command)
+            self.__redo_commands.append((command, generation))
+        if count:
+            self.undone.emit(count)
+        self.__notify(modified)
 
     def redo(self, levels: int):
         """Redo actions, which were undone.
 
         :param levels: number of actions to redo
         """
-        for _ in range(levels):
-            if not self.__redo_commands:
-                break
-            command = self.__redo_commands.pop()
+        modified = self.modified
+        count = min(levels, len(self.__redo_commands))
+        for _ in range(count):
+            command, generation = self.__redo_commands.pop()
             command.execute()
-            self.__undo_commands.append(command)
+            self.__undo_commands.append((command, generation))
+        if count:
+            self.redone.emit(count)
+        self.__notify(modified)
 
     def insert_in_undo_redo(self, command: ICommand):
         """Insert command to history.
 
         :param command: command to be inserted
         """
-        self.__undo_commands.append(command)
+        modified = self.modified
+        self.__undo_commands.append((command, self.__new_generation()))
+        self.__history_bytes += command.size()
+        dropped = []
+        for redo_command, _ in self.__redo_commands:
+            self.__history_bytes -= redo_command.size()
+            dropped.extend(redo_command.droppedItems(False))
         self.__redo_commands.clear()
+        dropped.extend(self.__fold())
+        if dropped:
+            self.itemsDropped.emit(dropped)
+        self.__notify(modified)
+
+    def __fold(self) -> typing.List[QtWidgets.QGraphicsItem]:
+        """Flatten the oldest commands exceeding history limits.
+
+        :return: items, which are dropped with flattened commands
+        """
+        dropped = []
+        while self.__undo_commands and (
+                len(self.__undo_commands) > self.max_commands or
+                self.__history_bytes > self.max_bytes):
+            command, generation = self.__undo_commands.popleft()
+            self.__history_bytes -= command.size()
+            dropped.extend(command.droppedItems(True))
+            command.flatten()
+            self.__base_generation = generation
+        return dropped
+
+    @property
+    def commands(self) -> typing.Tuple[typing.List[ICommand], typing.List[ICommand]]:
+        """Return commands, which can be undone and redone.
+
+        Undo list is ordered from the oldest command to the newest one,
+        redo list is ordered as commands would be redone.
+        """
+        undo = [command for command, _ in self.__undo_commands]
+        redo = [command for command, _ in reversed(self.__redo_commands)]
+        return undo, redo
+
+    @property
+    def history_bytes(self) -> int:
+        """Return approximate size of undo data in history."""
+        return self.__history_bytes
 
     def insert_in_undo_redo_add(
             self,
             item: QtWidgets.QGraphicsItem):
-        """Insert and execute AddCommand.
+        """Insert and execute command adding item to scene.
+
+        With raster backend item is painted into mask.
 
-        :param item: AddCommand to be executed and added to history
+        :param item: item to be added by executed command
         """
-        command = AddCommand(item, self.__container)
+        self.itemAdded.emit(item)
+        mask = self.__container.mask_item
+        if mask is not None:
+            command = PaintCommand(item, mask)
+        else:
+            command = AddCommand(item, self.__container)
+        command.execute()
+        self.insert_in_undo_redo(command)
+        if mask is not None:
+            # painted item is kept only in the mask
+            self.itemsDropped.emit([item])
+
+    def insert_in_undo_redo_replace(
+            self,
+            pairs: typing.List[typing.Tuple[QtWidgets.QGraphicsItem, typing.Optional[QtWidgets.QGraphicsItem]]]):
+        """Insert and execute command replacing items with their copies.
+
+        :param pairs: items on scene and their copies or None
+        """
+        self.itemsReplaced.emit(pairs)
+        command = ReplaceCommand(pairs, self.__container)
         command.execute()
         self.insert_in_undo_redo(command)
 
     def clear(self):
-        """Clear all history."""
+        """Clear all history.
+
+        History is cleared together with scene, so it's a new state.
+        """
+        modified = self.modified
         self.__undo_commands.clear()
         self.__redo_commands.clear()
+        self.__history_bytes = 0
+        self.__base_generation = self.__new_generation()
+        self.cleared.emit()
+        self.__notify(modified)
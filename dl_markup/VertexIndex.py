@@ -0,0 +1,99 @@
+from PyQt5 import QtCore, QtWidgets
+
+import math
+import typing
+from collections import defaultdict
+
+
+class VertexIndex:
+    """Grid hash of polygon vertices in scene coordinates.
+
+    Vertices are put into square cells, so search of the nearest vertex
+    looks only at a few cells around the point and its cost doesn't depend
+    on number of annotations.
+
+    Vertices belong to polygon items. Vertices of items, which are not on
+    scene (e.g. undone), are skipped by search, so index follows undo and
+    redo without updates. Items are removed, when they leave history.
+    """
+
+    def __init__(self, cell_size: float = 16.):
+        """Create empty index.
+
+        :param cell_size: side of grid cell in scene pixels
+        """
+        self.cell_size = cell_size
+        self.__cells = defaultdict(list)
+        self.__owners = {}
+
+    def __cell(self, x: float, y: float) -> typing.Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def addItem(self, item: QtWidgets.QGraphicsItem):
+        """Add vertices of polygon item, other items are ignored.
+
+        :param item: item placed on scene
+        """
+        if not isinstance(item, QtWidgets.QGraphicsPolygonItem) or item in self.__owners:
+            return
+        keys = []
+        for point in item.mapToScene(item.polygon()):
+            key = self.__cell(point.x(), point.y())
+            self.__cells[key].append((point.x(), point.y(), item))
+            keys.append(key)
+        self.__owners[item] = keys
+
+    def addItems(self, items: typing.Iterable[QtWidgets.QGraphicsItem]):
+        """Add vertices of polygon items.
+
+        :param items: items placed on scene
+        """
+        for item in items:
+            self.addItem(item)
+
+    def removeItem(self, item: QtWidgets.QGraphicsItem):
+        """Remove vertices of item.
+
+        :param item: previously added item
+        """
+        for key in set(self.__owners.pop(item, ())):
+            cell = [entry for entry in self.__cells[key] if entry[2] is not item]
+            if cell:
+                self.__cells[key] = cell
+            else:
+                del self.__cells[key]
+
+    def removeItems(self, items: typing.Iterable[QtWidgets.QGraphicsItem]):
+        """Remove vertices of items.
+
+        :param items: previously added items, other items are ignored
+        """
+        for item in items:
+            self.removeItem(item)
+
+    def clear(self):
+        """Remove all vertices."""
+        self.__cells.clear()
+        self.__owners.clear()
+
+    def nearest(self, point: QtCore.QPointF, radius: float) -> typing.Optional[QtCore.QPointF]:
+        """Return the nearest vertex not farther than radius.
+
+        :param point: point in scene coordinates
+        :param radius: max distance in scene pixels
+        """
+        x, y = point.x(), point.y()
+        left, top = self.__cell(x - radius, y - radius)
+        right, bottom = self.__cell(x + radius, y + radius)
+        best, best_distance = None, radius * radius
+        for i in range(left, right + 1):
+            for j in range(top, bottom + 1):
+                for vx, vy, owner in self.__cells.get((i, j), ()):
+                    distance = (vx - x) ** 2 + (vy - y) ** 2
+                    if distance <= best_distance and owner.scene() is not None:
+                        best, best_distance = (vx, vy), distance
+        return None if best is None else QtCore.QPointF(*best)
+
+    def __len__(self) -> int:
+        """Return number of indexed items."""
+        return len(self.__owners)
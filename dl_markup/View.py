@@ -6,6 +6,7 @@ from PyQt5.QtWidgets import QToolBar
 from PyQt5.QtWidgets import QMainWindow
 from PyQt5.QtWidgets import QLabel
 from PyQt5.QtWidgets import QPushButton
+from PyQt5.QtWidgets import QMessageBox
 from PyQt5.QtCore import QCoreApplication
 from PyQt5.QtCore import Qt
 
@@ -26,8 +27,12 @@ class View(QMainWindow):
         :param canvas: object for drawing
         """
         super().__init__()
-        self.setWindowTitle("DL Markup")
+        # '[*]' is replaced with '*' when canvas has unsaved changes
+        self.setWindowTitle("DL Markup[*]")
+        canvas.undo_redo.modifiedChanged.connect(self.setWindowModified)
         self._createToolbar(model, canvas)
+        # report background saving progress
+        model.saveQueue.statusChanged.connect(self.statusBar().showMessage)
 
         mainLayout = QVBoxLayout()
 
@@ -45,11 +50,14 @@ class View(QMainWindow):
         vertLayout = QVBoxLayout()
 
         # display list of images in input dir
-        fileList = QListView()
-        fileList.setModel(model.listModel)
-        fileList.clicked.connect(
-            partial(model.open, fileList.selectedIndexes))
-        vertLayout.addWidget(fileList, 2)
+        self.listModel = model.listModel
+        self.fileList = QListView()
+        self.fileList.setModel(self.listModel)
+        # rows aren't measured one by one, so huge lists stay responsive
+        self.fileList.setUniformItemSizes(True)
+        self.fileList.clicked.connect(
+            partial(model.open, self._selectedIndexes))
+        vertLayout.addWidget(self.fileList, 2)
 
         toolLayout = self._createToolLayout(canvas)
         vertLayout.addLayout(toolLayout, 1)
@@ -58,6 +66,14 @@ class View(QMainWindow):
         layout.addWidget(canvas, 4)
         layout.addLayout(vertLayout, 1)
 
+        # recovery is offered, when images with unsaved changes are listed
+        if model.unfinished:
+            self.statusBar().showMessage(
+                QCoreApplication.translate('View', 'Unsaved changes can be restored for: ') +
+                ', '.join(model.unfinished))
+            self._recovery = partial(self._offerRecovery, model)
+            model.scanner.finished.connect(self._recovery)
+
     def _createToolLayout(self, canvas: Canvas):
         """Store markup tools and color palette.
 
@@ -77,18 +93,23 @@ class View(QMainWindow):
             QCoreApplication.translate('View', 'Brush'))
         polygon = QPushButton(
             QCoreApplication.translate('View', 'Polygon'))
-        brush.setCheckable(True)
-        polygon.setCheckable(True)
-        # brush pressed by default
-        brush.setChecked(True)
+        fill = QPushButton(
+            QCoreApplication.translate('View', 'Fill'))
+        superpixel = QPushButton(
+            QCoreApplication.translate('View', 'Superpixel'))
+        smart_region = QPushButton(
+            QCoreApplication.translate('View', 'Smart region'))
+        eraser = QPushButton(
+            QCoreApplication.translate('View', 'Eraser'))
         # at each moment only one button is pressed
-        buttons = [brush, polygon]
+        buttons = [brush, polygon, fill, superpixel, smart_region, eraser]
         slot = partial(canvas.changeTool, buttons)
-        brush.clicked.connect(slot)
+        for button in buttons:
+            button.setCheckable(True)
+            button.clicked.connect(slot)
+            btLayout.addWidget(button)
+        # brush pressed by default
         brush.clicked.emit()
-        polygon.clicked.connect(slot)
-        btLayout.addWidget(brush)
-        btLayout.addWidget(polygon)
         toolBox.addLayout(btLayout)
         toolLayout.addLayout(toolBox)
         # user choose tool color by pressing button on palette
@@ -144,3 +165,74 @@ class View(QMainWindow):
             QCoreApplication.translate('View', 'Clear'),
             canvas.clear
         )
+        tools.addAction(
+            QCoreApplication.translate('View', 'Next unlabeled'),
+            partial(self._openNextUnlabeled, model)
+        )
+        hideLabeled = tools.addAction(
+            QCoreApplication.translate('View', 'Hide labeled'))
+        hideLabeled.setCheckable(True)
+        hideLabeled.toggled.connect(partial(self._hideLabeled, model))
+
+    def _selectedIndexes(self):
+        """Return indexes of ListModel, which are selected in file list."""
+        shown = self.fileList.model()
+        if shown is self.listModel:
+            return self.fileList.selectedIndexes()
+        rows = (
+            self.listModel.rowOf(shown.items[index.row()])
+            for index in self.fileList.selectedIndexes())
+        return [self.listModel.index(row) for row in rows if row is not None]
+
+    def _offerRecovery(self, model: Model, total: int):
+        """Ask to open the first listed image, which has unsaved changes left after crash."""
+        model.scanner.finished.disconnect(self._recovery)
+        row = model.unfinishedRow()
+        if row is None:
+            return
+        msg = QMessageBox()
+        msg.setIcon(QMessageBox.Question)
+        msg.setText(
+            QCoreApplication.translate('View', 'Unsaved changes of {} were left after crash.').format(
+                model.listModel.items[row]))
+        msg.setInformativeText(
+            QCoreApplication.translate('View', 'Do you want to open the image and restore them?'))
+        msg.setStandardButtons(QMessageBox.No | QMessageBox.Yes)
+        if msg.exec_() == QMessageBox.Yes:
+            self._openRow(model, row)
+
+    def _openNextUnlabeled(self, model: Model):
+        """Select and open the next image, which has no mask."""
+        row = model.nextUnlabeled()
+        if row is None:
+            self.statusBar().showMessage(
+                QCoreApplication.translate('View', 'All images are labeled'))
+            return
+        self._openRow(model, row)
+
+    def _openRow(self, model: Model, row: int):
+        """Select and open image.
+
+        :param model: application model
+        :param row: row of image in ListModel
+        """
+        shown = self.fileList.model()
+        shown_row = row
+        if shown is not self.listModel:
+            shown_row = shown.rowOf(self.listModel.items[row])
+        if shown_row is not None:
+            index = shown.index(shown_row)
+            self.fileList.setCurrentIndex(index)
+            self.fileList.scrollTo(index)
+        model.open(lambda: [self.listModel.index(row)])
+
+    def _hideLabeled(self, model: Model, hide: bool):
+        """Show only images without masks.
+
+        They are fetched from status index page by page, while list is scrolled.
+        """
+        if hide:
+            model.unlabeledModel.reset()
+            self.fileList.setModel(model.unlabeledModel)
+        else:
+            self.fileList.setModel(self.listModel)
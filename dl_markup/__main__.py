@@ -12,6 +12,42 @@ parser.add_argument(
     '--output_dir',
     default='./',
     help='Output directory for marked images')
+parser.add_argument(
+    '--backend',
+    default='vector',
+    choices=['vector', 'raster'],
+    help='Store markup as separate items (vector) or as mask buffer (raster)')
+parser.add_argument(
+    '--bsp_depth',
+    type=int,
+    default=0,
+    help='Depth of scene BSP index for vector backend (0 chooses it by number of items)')
+parser.add_argument(
+    '--mask_format',
+    default='rgb',
+    choices=['rgb', 'index', 'npy'],
+    help='Save colored masks (rgb) or class id masks as palette PNG (index) or numpy array (npy)')
+parser.add_argument(
+    '--recursive',
+    action='store_true',
+    help='List images in subdirectories of input directory')
+parser.add_argument(
+    '--annotator',
+    default=None,
+    help='Name of annotator, which is stored in status index (login name by default)')
+parser.add_argument(
+    '--simplify',
+    type=float,
+    default=None,
+    metavar='PIXELS',
+    help='Replace finished brush strokes with outlines simplified with tolerance PIXELS')
+parser.add_argument(
+    '--profile',
+    nargs='?',
+    const='dl_markup_trace.json',
+    default=None,
+    metavar='TRACE',
+    help='Show performance overlay and write Chrome trace to TRACE on exit')
 
 
 def main():
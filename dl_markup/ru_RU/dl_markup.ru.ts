@@ -75,5 +75,25 @@
         <source>Polygon</source>
         <translation>Многоугольник</translation>
     </message>
+    <message>
+        <location filename="dl_markup/View.py" line="91"/>
+        <source>Fill</source>
+        <translation>Заливка</translation>
+    </message>
+    <message>
+        <location filename="dl_markup/View.py" line="93"/>
+        <source>Superpixel</source>
+        <translation>Суперпиксель</translation>
+    </message>
+    <message>
+        <location filename="dl_markup/View.py" line="95"/>
+        <source>Smart region</source>
+        <translation>Умная область</translation>
+    </message>
+    <message>
+        <location filename="dl_markup/View.py" line="97"/>
+        <source>Eraser</source>
+        <translation>Ластик</translation>
+    </message>
 </context>
 </TS>
\ No newline at end of file
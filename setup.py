@@ -58,6 +58,7 @@ setup(
     entry_points={
         'console_scripts': [
             'dl_markup = dl_markup.__main__:main',
+            'dl_markup-remap = dl_markup.Remap:main',
         ],
     },
     cmdclass={
@@ -1,8 +1,11 @@
-from PyQt5 import QtWidgets
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtCore import Qt
 import pytest
 
 from dl_markup.UndoRedo import UndoRedo
 from dl_markup.Scene import Scene
+from dl_markup.Canvas import Canvas
+from dl_markup.FillTool import Fill
 
 
 @pytest.fixture
@@ -16,3 +19,41 @@ def scene_with_undo_redo():
     undo_redo.insert_in_undo_redo_add(item_2)
 
     return ((item_1, item_2), scene, undo_redo)
+
+
+def create_canvas(raster=False):
+    scene = Scene(0, 0, 512, 512, raster=raster)
+    undo_redo = UndoRedo(scene)
+    canvas = Canvas(scene, undo_redo)
+    img = QtGui.QPixmap(512, 512)
+    img.fill(QtGui.QColor(255, 255, 255))
+    scene.img = img
+    return canvas
+
+
+def mouse_event(canvas, event_type, x, y, button=Qt.LeftButton, modifiers=Qt.NoModifier):
+    pos = canvas.mapFromScene(QtCore.QPointF(x, y))
+    return QtGui.QMouseEvent(
+        event_type,
+        QtCore.QPointF(pos),
+        button,
+        button,
+        modifiers,
+    )
+
+
+def draw_stroke(canvas, points):
+    canvas.tool.mousePressEvent(
+        mouse_event(canvas, QtCore.QEvent.MouseButtonPress, *points[0]))
+    for x, y in points[1:]:
+        canvas.tool.mouseMoveEvent(
+            mouse_event(canvas, QtCore.QEvent.MouseMove, x, y))
+    canvas.tool.mouseReleaseEvent(
+        mouse_event(canvas, QtCore.QEvent.MouseButtonRelease, *points[-1]))
+
+
+def wait_fill():
+    # fill thread runs tasks in order, so empty task finishes after the region
+    Fill.executor().submit(lambda: None).result()
+    # deliver queued signal with the region
+    QtCore.QCoreApplication.sendPostedEvents(None, QtCore.QEvent.MetaCall)
@@ -0,0 +1,76 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from dl_markup import Annotations
+from dl_markup.BrushTool import RegionItem, StrokeItem
+from dl_markup.Geometry import strokeOutline
+
+
+def create_items():
+    stroke = StrokeItem(QtCore.QPointF(10, 10), 5, QtGui.QColor('#FF0000'))
+    stroke.lineTo(QtCore.QPointF(20, 30))
+    stroke.moveTo(QtCore.QPointF(50, 50))
+    stroke.lineTo(QtCore.QPointF(60, 40))
+    polygon = QtWidgets.QGraphicsPolygonItem(QtGui.QPolygonF([
+        QtCore.QPointF(0, 0),
+        QtCore.QPointF(100, 0),
+        QtCore.QPointF(50, 80),
+    ]))
+    polygon.setBrush(QtGui.QColor('#0000FF'))
+    return stroke, polygon
+
+
+def test_round_trip(qapp):
+    stroke, polygon = create_items()
+
+    loaded_stroke, loaded_polygon = Annotations.loads(
+        Annotations.dumps([stroke, polygon]))
+
+    assert isinstance(loaded_stroke, StrokeItem)
+    assert loaded_stroke.radius == 5
+    assert loaded_stroke.color == QtGui.QColor('#FF0000')
+    assert loaded_stroke.path() == stroke.path()
+    assert loaded_stroke.boundingRect() == stroke.boundingRect()
+    assert loaded_polygon.polygon() == polygon.polygon()
+    assert loaded_polygon.brush().color() == QtGui.QColor('#0000FF')
+
+
+def test_annotation_items(qapp):
+    scene = QtWidgets.QGraphicsScene()
+    background = scene.addRect(0, 0, 100, 100)
+    stroke, polygon = create_items()
+    for item in (polygon, stroke):
+        scene.addItem(item)
+    # stacking order changes like on undo and redo
+    scene.removeItem(polygon)
+    scene.addItem(polygon)
+    QtWidgets.QGraphicsPolygonItem(polygon.polygon(), background)
+
+    assert Annotations.annotationItems(scene) == [stroke, polygon]
+
+
+def test_save_load(qapp, tmp_path):
+    path = str(tmp_path / 'image.dlm')
+    scene = QtWidgets.QGraphicsScene()
+
+    Annotations.save(path, create_items())
+    items = Annotations.load(path, scene)
+
+    assert len(items) == 2
+    assert all(item.scene() is scene for item in items)
+    assert Annotations.annotationItems(scene) == items
+
+
+def test_region_round_trip(qapp):
+    stroke, _ = create_items()
+    outline = strokeOutline(stroke.path(), stroke.radius, 0.5)
+    region = RegionItem(outline, QtGui.QColor('#00FF00'))
+
+    loaded, = Annotations.loads(Annotations.dumps([region]))
+
+    assert isinstance(loaded, RegionItem)
+    assert loaded.color == QtGui.QColor('#00FF00')
+    # coordinates are stored as float32
+    delta = loaded.boundingRect().topLeft() - region.boundingRect().topLeft()
+    assert delta.manhattanLength() < 1e-3
+    assert loaded.path().contains(QtCore.QPointF(15, 20))
+    assert not loaded.path().contains(QtCore.QPointF(35, 35))
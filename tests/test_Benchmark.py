@@ -0,0 +1,336 @@
+"""Interaction benchmarks.
+
+Run them with::
+
+    DL_MARKUP_BENCHMARK=1 QT_QPA_PLATFORM=offscreen pytest tests/test_Benchmark.py --benchmark-json=benchmark.json
+
+Number of strokes on canvas is set by DL_MARKUP_BENCHMARK_SIZES
+(comma separated, '1000,10000,100000' by default), number of short strokes
+in dense scene benchmarks is set by DL_MARKUP_BENCHMARK_DENSE (50000 by default).
+"""
+import os
+
+import numpy as np
+import pytest
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from dl_markup.BrushTool import Brush, StrokeItem
+from dl_markup.EraserTool import Eraser
+from dl_markup.FillTool import Fill
+from dl_markup.Model import Model
+from dl_markup.PolygonTool import Polygon
+from dl_markup.Scene import Scene
+from dl_markup.SmartRegionTool import SmartRegion
+from dl_markup.UndoRedo import UndoRedo
+from dl_markup.Canvas import Canvas
+
+from fixtures import create_canvas, mouse_event, wait_fill
+
+if not os.environ.get('DL_MARKUP_BENCHMARK'):
+    pytest.skip('set DL_MARKUP_BENCHMARK=1 to run benchmarks', allow_module_level=True)
+pytest.importorskip('pytest_benchmark')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+SIZES = [
+    int(size) for size in
+    os.environ.get('DL_MARKUP_BENCHMARK_SIZES', '1000,10000,100000').split(',')]
+BACKENDS = ['vector', 'raster']
+DENSE_SIZE = int(os.environ.get('DL_MARKUP_BENCHMARK_DENSE', '50000'))
+INDEX_METHODS = {
+    'bsp': QtWidgets.QGraphicsScene.BspTreeIndex,
+    'noindex': QtWidgets.QGraphicsScene.NoIndex,
+}
+COLORS = ['#FF0000', '#00FF00', '#0000FF', '#FFFF00']
+
+
+def synthetic_strokes(count, points=16, seed=0, step=4.):
+    """Return random walks of shape (count, points, 2) inside 512x512 canvas."""
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(16, 496, (count, 1, 2))
+    steps = rng.normal(0, step, (count, points - 1, 2))
+    walk = np.concatenate([start, start + np.cumsum(steps, axis=1)], axis=1)
+    return np.clip(walk, 1, 510)
+
+
+def mouse_stream(count=256, seed=1):
+    """Return points of mouse moves along smooth curve."""
+    t = np.linspace(0, 4 * np.pi, count)
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0, 0.5, (count, 2))
+    return np.stack([256 + 200 * np.cos(t), 256 + 200 * np.sin(0.5 * t)], axis=1) + noise
+
+
+def fill_canvas(canvas, count, **kwargs):
+    """Add committed strokes to canvas, kwargs are passed to synthetic_strokes."""
+    for i, points in enumerate(synthetic_strokes(count, **kwargs)):
+        stroke = StrokeItem(QtCore.QPointF(*points[0]), 5., QtGui.QColor(COLORS[i % len(COLORS)]))
+        for x, y in points[1:]:
+            stroke.lineTo(QtCore.QPointF(x, y))
+        canvas.undo_redo.insert_in_undo_redo_add(stroke)
+
+
+@pytest.fixture(scope='module', params=[
+    (size, backend) for size in SIZES for backend in BACKENDS],
+    ids=lambda param: f'{param[0]}-{param[1]}')
+def filled_canvas(qapp, request):
+    size, backend = request.param
+    canvas = create_canvas(raster=backend == 'raster')
+    canvas.resize(600, 600)
+    canvas.show()
+    fill_canvas(canvas, size)
+    qapp.processEvents()
+    yield canvas
+    canvas.close()
+
+
+@pytest.fixture(scope='module', params=list(INDEX_METHODS))
+def dense_canvas(qapp, request):
+    """Canvas with many short strokes, scene is indexed by given method."""
+    canvas = create_canvas()
+    canvas.resize(600, 600)
+    canvas.show()
+    with canvas.scene.bulkInsert():
+        fill_canvas(canvas, DENSE_SIZE, points=4, step=2.)
+    canvas.scene.setItemIndexMethod(INDEX_METHODS[request.param])
+    # only part of the scene is visible
+    canvas.scale(4, 4)
+    canvas.centerOn(256, 256)
+    qapp.processEvents()
+    yield canvas
+    canvas.close()
+
+
+def record(benchmark, canvas):
+    benchmark.extra_info['scene_items'] = len(canvas.scene.items())
+    benchmark.extra_info['history'] = len(canvas.undo_redo.commands[0])
+
+
+def replay_moves(benchmark, qapp, canvas, rounds=64):
+    """Measure latency of single mouse move, including repaint."""
+    events = [
+        mouse_event(canvas, QtCore.QEvent.MouseMove, x, y)
+        for x, y in mouse_stream(rounds)]
+    events = iter(events)
+
+    def move():
+        canvas.mouseMoveEvent(next(events))
+        qapp.processEvents()
+
+    benchmark.pedantic(move, rounds=rounds, iterations=1, warmup_rounds=0)
+
+
+def test_brush_move(benchmark, qapp, filled_canvas):
+    canvas = filled_canvas
+    canvas.tool = Brush(canvas, QtGui.QColor(COLORS[0]))
+    x, y = mouse_stream(1)[0]
+    canvas.tool.mousePressEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonPress, x, y))
+
+    replay_moves(benchmark, qapp, canvas)
+    record(benchmark, canvas)
+
+    canvas.tool.mouseReleaseEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonRelease, x, y))
+    canvas.undo_redo.undo(1)
+
+
+def test_brush_stroke(benchmark, qapp, filled_canvas):
+    """Measure whole stroke, including coalesced geometry updates."""
+    canvas = filled_canvas
+    canvas.tool = Brush(canvas, QtGui.QColor(COLORS[0]))
+    points = mouse_stream()
+
+    def stroke():
+        canvas.tool.mousePressEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonPress, *points[0]))
+        for x, y in points[1:]:
+            canvas.mouseMoveEvent(mouse_event(canvas, QtCore.QEvent.MouseMove, x, y))
+            qapp.processEvents()
+        canvas.tool.mouseReleaseEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonRelease, *points[-1]))
+        qapp.processEvents()
+
+    benchmark.pedantic(stroke, setup=lambda: canvas.undo_redo.undo(1), rounds=5, iterations=1)
+    record(benchmark, canvas)
+
+
+def test_erase(benchmark, qapp, filled_canvas):
+    """Measure erasing by short stroke, which crosses a few of committed strokes."""
+    canvas = filled_canvas
+    canvas.tool = Eraser(canvas, QtGui.QColor(COLORS[0]))
+    canvas.tool.radius = 5
+    points = [(100 + 2 * i, 100 + i) for i in range(16)]
+    generation = canvas.undo_redo.generation
+
+    def erase():
+        canvas.tool.mousePressEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonPress, *points[0]))
+        for x, y in points[1:]:
+            canvas.tool.mouseMoveEvent(mouse_event(canvas, QtCore.QEvent.MouseMove, x, y))
+        canvas.tool.mouseReleaseEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonRelease, *points[-1]))
+        qapp.processEvents()
+
+    def setup():
+        if canvas.undo_redo.generation != generation:
+            canvas.undo_redo.undo(1)
+
+    benchmark.pedantic(erase, setup=setup, rounds=5, iterations=1)
+    record(benchmark, canvas)
+    setup()
+
+
+def test_polygon_move(benchmark, qapp, filled_canvas):
+    canvas = filled_canvas
+    canvas.tool = Polygon(canvas, QtGui.QColor(COLORS[1]))
+    for x, y in mouse_stream(8, seed=2):
+        canvas.tool.mousePressEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonPress, x, y))
+
+    replay_moves(benchmark, qapp, canvas)
+    record(benchmark, canvas)
+
+    canvas.tool.clear()
+
+
+def test_polygon_click(benchmark, qapp, filled_canvas):
+    """Measure click of polygon tool, which adds vertex."""
+    canvas = filled_canvas
+    canvas.tool = Polygon(canvas, QtGui.QColor(COLORS[1]))
+    points = iter(mouse_stream(1000, seed=3))
+
+    def click():
+        x, y = next(points)
+        canvas.tool.mousePressEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonPress, x, y))
+
+    benchmark.pedantic(click, rounds=200, iterations=1)
+    record(benchmark, canvas)
+
+    canvas.tool.clear()
+
+
+def test_segm(benchmark, filled_canvas):
+    benchmark(lambda: filled_canvas.scene.segm)
+    record(benchmark, filled_canvas)
+
+
+def test_save(benchmark, qapp, filled_canvas, tmp_path):
+    (tmp_path / 'input').mkdir()
+    model = Model(filled_canvas, str(tmp_path / 'input'), str(tmp_path / 'output'))
+    model.workingImageName = 'image.png'
+
+    def save():
+        model.save()
+        model.saveQueue.flush()
+
+    benchmark.pedantic(save, rounds=5, iterations=1)
+    record(benchmark, filled_canvas)
+    model.close()
+
+
+def test_undo(benchmark, filled_canvas):
+    undo_redo = filled_canvas.undo_redo
+
+    def setup():
+        undo_redo.redo(1)
+
+    benchmark.pedantic(lambda: undo_redo.undo(1), setup=setup, rounds=100)
+    record(benchmark, filled_canvas)
+    undo_redo.redo(1)
+
+
+def test_redo(benchmark, filled_canvas):
+    undo_redo = filled_canvas.undo_redo
+
+    def setup():
+        undo_redo.undo(1)
+
+    benchmark.pedantic(lambda: undo_redo.redo(1), setup=setup, rounds=100)
+    record(benchmark, filled_canvas)
+
+
+@pytest.mark.parametrize('exposed', [64, 600], ids=['brush', 'viewport'])
+def test_dense_repaint(benchmark, qapp, dense_canvas, exposed):
+    """Measure repaint of area updated by brush and of whole viewport."""
+    viewport = dense_canvas.viewport()
+    rect = QtCore.QRect(0, 0, exposed, exposed)
+    rect.moveCenter(viewport.rect().center())
+    benchmark(viewport.repaint, rect)
+    record(benchmark, dense_canvas)
+
+
+def test_dense_hit_test(benchmark, dense_canvas):
+    scene = dense_canvas.scene
+    points = [QtCore.QPointF(x, y) for x, y in mouse_stream(64, seed=4)]
+
+    def hit_test():
+        for point in points:
+            scene.items(point)
+
+    benchmark(hit_test)
+    record(benchmark, dense_canvas)
+
+
+@pytest.mark.parametrize('bulk', [True, False], ids=['bulk', 'indexed'])
+def test_dense_insert(benchmark, qapp, bulk):
+    """Measure loading of many annotations with and without suspended index."""
+    def setup():
+        canvas = create_canvas()
+        # build index, so inserted items update it
+        canvas.scene.items(QtCore.QPointF(0, 0))
+        return (canvas,), {}
+
+    def insert(canvas):
+        scene = canvas.scene
+        if bulk:
+            with scene.bulkInsert():
+                fill_canvas(canvas, DENSE_SIZE, points=4, step=2.)
+        else:
+            fill_canvas(canvas, DENSE_SIZE, points=4, step=2.)
+        # the first query after insert processes pending items
+        scene.items(QtCore.QPointF(256, 256))
+
+    benchmark.pedantic(insert, setup=setup, rounds=3, iterations=1)
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_fill(benchmark, qapp, backend):
+    """Measure fill of half of 12 MP image, upper half is smooth gradient, lower half is noise."""
+    width, height = 4000, 3000
+    rng = np.random.default_rng(5)
+    pixels = np.empty((height, width, 3), np.uint8)
+    pixels[:height // 2] = np.linspace(100, 140, width).astype(np.uint8)[None, :, None]
+    pixels[height // 2:] = rng.integers(0, 256, (height - height // 2, width, 3))
+    image = QtGui.QImage(pixels.data, width, height, 3 * width, QtGui.QImage.Format_RGB888)
+    scene = Scene(0, 0, width, height, raster=backend == 'raster')
+    canvas = Canvas(scene, UndoRedo(scene))
+    scene.img = QtGui.QPixmap.fromImage(image)
+    canvas.tool = Fill(canvas, QtGui.QColor(COLORS[2]))
+    press = mouse_event(canvas, QtCore.QEvent.MouseButtonPress, 10, 10)
+
+    def fill():
+        canvas.tool.mousePressEvent(press)
+        wait_fill()
+
+    benchmark.pedantic(fill, setup=lambda: canvas.undo_redo.undo(1), rounds=5, iterations=1)
+    record(benchmark, canvas)
+
+
+def test_smart_region(benchmark, qapp):
+    """Measure segmentation of noisy disc on 12 MP image from scribble to refined region."""
+    width, height = 4000, 3000
+    rng = np.random.default_rng(6)
+    rows, columns = np.ogrid[:height, :width]
+    disc = (rows - height / 2) ** 2 + (columns - width / 2) ** 2 < (height / 3) ** 2
+    gray = np.clip(np.where(disc, 180, 60) + rng.normal(0, 15, disc.shape), 0, 255).astype(np.uint8)
+    pixels = np.ascontiguousarray(np.repeat(gray[..., None], 3, axis=2))
+    image = QtGui.QImage(pixels.data, width, height, 3 * width, QtGui.QImage.Format_RGB888)
+    scene = Scene(0, 0, width, height)
+    canvas = Canvas(scene, UndoRedo(scene))
+    scene.img = QtGui.QPixmap.fromImage(image)
+    canvas.tool = SmartRegion(canvas, QtGui.QColor(COLORS[3]))
+    points = [(width / 2 - 100, height / 2), (width / 2 + 100, height / 2)]
+
+    def segment():
+        canvas.tool.clear()
+        canvas.tool.mousePressEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonPress, *points[0]))
+        canvas.tool.mouseReleaseEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonRelease, *points[1]))
+        canvas.tool.wait()
+
+    # the first segmentation starts process and sends image to it
+    benchmark.pedantic(segment, rounds=5, iterations=1, warmup_rounds=1)
+    region = canvas.tool.preview.boundingRect()
+    assert abs(region.width() - 2 * height / 3) < 8
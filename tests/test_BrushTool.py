@@ -0,0 +1,142 @@
+import numpy as np
+from PyQt5 import QtCore, QtGui
+
+from dl_markup.BrushTool import Brush, CylinderItem, RegionItem, StrokeItem
+
+from fixtures import create_canvas, draw_stroke, mouse_event
+
+
+def strokes(scene):
+    return [item for item in scene.items() if isinstance(item, StrokeItem)]
+
+
+def test_stroke_is_single_item(qapp):
+    canvas = create_canvas()
+
+    draw_stroke(canvas, [(10 + i, 20 + i) for i in range(100)])
+
+    assert len(strokes(canvas.scene)) == 1
+
+
+def test_stroke_is_single_undo_step(qapp):
+    canvas = create_canvas()
+
+    draw_stroke(canvas, [(10 + i, 20) for i in range(50)])
+    draw_stroke(canvas, [(10, 100 + i) for i in range(50)])
+    canvas.undo_redo.undo(1)
+
+    assert len(strokes(canvas.scene)) == 1
+
+
+def test_stroke_bounding_rect(qapp):
+    item = StrokeItem(QtCore.QPointF(10, 10), 5, QtGui.QColor(0, 255, 0))
+    item.lineTo(QtCore.QPointF(30, 20))
+
+    assert item.boundingRect() == QtCore.QRectF(5, 5, 30, 20)
+
+
+def test_cylinder_bounding_rect(qapp):
+    item = CylinderItem(
+        QtCore.QPointF(100, 100), QtCore.QPointF(120, 110), 5,
+        QtGui.QPen(QtCore.Qt.NoPen), QtGui.QBrush(QtGui.QColor(0, 255, 0)))
+
+    assert item.boundingRect() == QtCore.QRectF(95, 95, 30, 20)
+    assert item.shape().contains(QtCore.QPointF(110, 105))
+    assert not item.shape().contains(QtCore.QPointF(96, 114))
+
+
+def test_raster_stroke_painted_into_mask(qapp):
+    canvas = create_canvas(raster=True)
+    mask = canvas.scene.mask_item
+
+    draw_stroke(canvas, [(10 + i, 20) for i in range(50)])
+
+    assert not strokes(canvas.scene)
+    assert mask.image.pixelColor(30, 20) == canvas.tool.color
+    assert mask.image.pixelColor(30, 100) == QtGui.QColor(0, 0, 0)
+
+
+def test_raster_stroke_undo_redo(qapp):
+    canvas = create_canvas(raster=True)
+    mask = canvas.scene.mask_item
+
+    draw_stroke(canvas, [(10 + i, 20) for i in range(50)])
+    canvas.undo_redo.undo(1)
+    assert mask.image.pixelColor(30, 20) == QtGui.QColor(0, 0, 0)
+
+    canvas.undo_redo.redo(1)
+    assert mask.image.pixelColor(30, 20) == canvas.tool.color
+
+
+def test_cursor_cache(qapp):
+    canvas = create_canvas()
+    brush = canvas.tool
+
+    cursor = brush.cursor()
+    canvas.zoom = 1.001
+
+    assert brush.cursor() is cursor
+
+
+def test_large_cursor(qapp):
+    canvas = create_canvas()
+    canvas.zoom = 10
+
+    cursor = canvas.tool.cursor()
+
+    assert cursor.pixmap().width() == 2 * canvas.tool.radius * 10 + 2
+
+
+def test_stroke_decimation(qapp):
+    canvas = create_canvas()
+
+    # mouse with high polling rate moves by fractions of pixel
+    points = [(10 + 0.1 * i, 20 + 0.05 * i) for i in range(1000)]
+    draw_stroke(canvas, points)
+
+    path = strokes(canvas.scene)[0].path()
+    assert path.elementCount() < len(points) / 10
+    # stroke ends under the cursor
+    end = path.currentPosition() - QtCore.QPointF(*points[-1])
+    assert end.manhattanLength() <= 1
+
+
+def test_moves_coalesced_per_frame(qapp, qtbot):
+    canvas = create_canvas()
+    brush = canvas.tool
+    brush.mousePressEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonPress, 10, 20))
+    for i in range(1, 20):
+        brush.mouseMoveEvent(mouse_event(canvas, QtCore.QEvent.MouseMove, 10 + 5 * i, 20))
+
+    # geometry is created once per frame
+    assert brush.stroke is None
+    qtbot.waitUntil(lambda: brush.stroke is not None)
+    assert brush.stroke.path().currentPosition() == QtCore.QPointF(105, 20)
+
+    brush.mouseReleaseEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonRelease, 105, 20))
+    assert len(canvas.undo_redo.commands[0]) == 1
+
+
+def test_stroke_simplified_on_release(qapp, monkeypatch):
+    canvas = create_canvas()
+    monkeypatch.setattr(Brush, 'simplify_tolerance', 0.5)
+
+    draw_stroke(canvas, [(100 + 100 * np.cos(t), 100 + 50 * np.sin(t)) for t in np.linspace(0, 3, 300)])
+
+    assert not strokes(canvas.scene)
+    regions = [item for item in canvas.scene.items() if isinstance(item, RegionItem)]
+    assert len(regions) == 1
+    assert regions[0].path().contains(QtCore.QPointF(200, 100))
+    assert len(canvas.undo_redo.commands[0]) == 1
+
+
+def test_dot_simplified_on_release(qapp, monkeypatch):
+    canvas = create_canvas()
+    monkeypatch.setattr(Brush, 'simplify_tolerance', 0.5)
+
+    draw_stroke(canvas, [(50, 50), (50, 50)])
+
+    regions = [item for item in canvas.scene.items() if isinstance(item, RegionItem)]
+    assert len(regions) == 1
+    assert not regions[0].path().isEmpty()
+    assert regions[0].path().contains(QtCore.QPointF(50, 50))
@@ -0,0 +1,46 @@
+import numpy as np
+from PyQt5 import QtGui
+
+from dl_markup.ClassMap import ClassMap, imageToRgb, rgbToImage
+
+
+def create_mask():
+    image = QtGui.QImage(7, 3, QtGui.QImage.Format_RGB32)
+    image.fill(QtGui.QColor(0, 0, 0))
+    image.setPixelColor(1, 1, QtGui.QColor('#FF0000'))
+    image.setPixelColor(6, 2, QtGui.QColor('#0000FF'))
+    image.setPixelColor(0, 2, QtGui.QColor('#123456'))
+    return image
+
+
+def test_to_ids(qapp):
+    class_map = ClassMap(['#00FF00', '#FF0000', '#0000FF'])
+
+    ids = class_map.toIds(create_mask())
+
+    assert ids.dtype == np.uint8
+    assert ids.shape == (3, 7)
+    assert ids[1, 1] == 2
+    assert ids[2, 6] == 3
+    # unknown color is background
+    assert ids[2, 0] == 0
+    assert np.count_nonzero(ids) == 2
+
+
+def test_indexed_image(qapp, tmp_path):
+    class_map = ClassMap(['#00FF00', '#FF0000', '#0000FF'])
+    ids = class_map.toIds(create_mask())
+    path = str(tmp_path / 'mask.png')
+
+    class_map.save(ids, path, 'png')
+    image = QtGui.QImage(path)
+
+    assert image.format() == QtGui.QImage.Format_Indexed8
+    assert image.pixelIndex(1, 1) == 2
+    assert image.pixelIndex(6, 2) == 3
+
+
+def test_rgb_round_trip(qapp):
+    rgb = imageToRgb(create_mask())
+
+    assert np.array_equal(imageToRgb(rgbToImage(rgb)), rgb)
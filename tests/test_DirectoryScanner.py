@@ -0,0 +1,65 @@
+from dl_markup.DirectoryScanner import DirectoryScanner
+
+
+def create_files(root, names):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b'')
+
+
+def test_walk(tmp_path):
+    create_files(tmp_path, [
+        'a.png', 'b.JPG', 'notes.txt', 'sub/c.bmp', '.hidden/d.png'])
+
+    flat = DirectoryScanner()
+    assert sorted(flat.walk(str(tmp_path))) == ['a.png', 'b.JPG']
+
+    recursive = DirectoryScanner(recursive=True)
+    assert sorted(recursive.walk(str(tmp_path))) == ['a.png', 'b.JPG', 'sub/c.bmp']
+
+
+def test_batches(qapp, qtbot, tmp_path):
+    names = [f'{i:03}.png' for i in range(100)]
+    create_files(tmp_path, names)
+
+    scanner = DirectoryScanner(batch_size=30)
+    batches = []
+    scanner.found.connect(batches.append)
+    with qtbot.waitSignal(scanner.finished) as blocker:
+        scanner.start(str(tmp_path))
+
+    assert blocker.args == [100]
+    assert all(len(batch) <= 30 for batch in batches)
+    assert sorted(sum(batches, [])) == names
+
+
+def test_restart(qapp, qtbot, tmp_path):
+    create_files(tmp_path, ['a.png', 'other/b.png'])
+
+    scanner = DirectoryScanner()
+    found = []
+    scanner.found.connect(found.extend)
+    scanner.start(str(tmp_path))
+    # batches of cancelled scan are dropped
+    with qtbot.waitSignal(scanner.finished):
+        scanner.start(str(tmp_path / 'other'))
+
+    assert found == ['b.png']
+
+
+def test_watch(qapp, qtbot, tmp_path):
+    create_files(tmp_path, ['a.png', 'sub/b.png'])
+
+    scanner = DirectoryScanner(recursive=True, watch_delay=10)
+    with qtbot.waitSignal(scanner.finished):
+        scanner.start(str(tmp_path))
+
+    with qtbot.waitSignal(scanner.found) as blocker:
+        create_files(tmp_path, ['c.png', 'notes.txt', 'new/d.png'])
+    assert sorted(blocker.args[0]) == ['c.png', 'new/d.png']
+
+    with qtbot.waitSignal(scanner.removed) as blocker:
+        (tmp_path / 'a.png').unlink()
+        (tmp_path / 'sub' / 'b.png').unlink()
+    assert sorted(blocker.args[0]) == ['a.png', 'sub/b.png']
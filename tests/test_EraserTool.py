@@ -0,0 +1,117 @@
+import numpy as np
+from PyQt5 import QtCore, QtGui
+
+from dl_markup import Annotations
+from dl_markup.BrushTool import Brush, RegionItem, StrokeItem
+from dl_markup.EraserTool import Eraser
+from dl_markup.FillTool import FillItem, imageArray
+from dl_markup.PolygonTool import PolygonItem
+
+from fixtures import create_canvas, draw_stroke
+
+
+def erase(canvas, points):
+    canvas.tool = Eraser(canvas, canvas.tool.color)
+    canvas.tool.radius = 10
+    draw_stroke(canvas, points)
+
+
+def square(x, y, side, color='#0000FF'):
+    return PolygonItem(QtGui.QPolygonF(QtGui.QPolygonF(QtCore.QRectF(x, y, side, side))), QtGui.QColor(color))
+
+
+def test_erase_splits_stroke(qapp):
+    canvas = create_canvas()
+    canvas.tool = Brush(canvas, QtGui.QColor('#00FF00'))
+    draw_stroke(canvas, [(50 + i, 100) for i in range(0, 400, 4)])
+    stroke, = Annotations.annotationItems(canvas.scene)
+
+    erase(canvas, [(250, 50), (250, 150)])
+
+    region, = Annotations.annotationItems(canvas.scene)
+    assert isinstance(region, RegionItem)
+    assert region.color == QtGui.QColor('#00FF00')
+    assert len(region.path().toSubpathPolygons()) == 2
+    assert region.contains(QtCore.QPointF(100, 100))
+    assert not region.contains(QtCore.QPointF(250, 100))
+    # the whole eraser stroke is one undo step
+    canvas.undo_redo.undo(1)
+    assert Annotations.annotationItems(canvas.scene) == [stroke]
+    canvas.undo_redo.redo(1)
+    assert Annotations.annotationItems(canvas.scene) == [region]
+
+
+def test_erase_touches_only_intersecting_items(qapp):
+    canvas = create_canvas()
+    squares = [square(x, 200, 40) for x in range(0, 500, 50)]
+    for item in squares:
+        canvas.undo_redo.insert_in_undo_redo_add(item)
+
+    erase(canvas, [(110, 180), (130, 260)])
+
+    items = Annotations.annotationItems(canvas.scene)
+    # the square at 100 is replaced in place, others are kept
+    assert items[:2] == squares[:2] and items[3:] == squares[3:]
+    assert isinstance(items[2], RegionItem)
+    assert items[2].color == QtGui.QColor('#0000FF')
+    assert items[2].contains(QtCore.QPointF(135, 220))
+    assert not items[2].contains(QtCore.QPointF(120, 220))
+
+
+def test_erased_item_is_restored_in_order(qapp):
+    canvas = create_canvas()
+    below, erased, above = square(0, 0, 30), square(100, 100, 10, '#FF0000'), square(95, 95, 30)
+    for item in (below, erased, above):
+        canvas.undo_redo.insert_in_undo_redo_add(item)
+
+    erase(canvas, [(100, 105), (110, 105)])
+
+    assert Annotations.annotationItems(canvas.scene)[0] is below
+    assert isinstance(Annotations.annotationItems(canvas.scene)[1], RegionItem)
+    assert erased.scene() is None
+    canvas.undo_redo.undo(1)
+    # polygon has been erased completely, so remainder of larger square is painted over it
+    assert Annotations.annotationItems(canvas.scene) == [below, erased, above]
+
+
+def test_erase_fill(qapp):
+    canvas = create_canvas()
+    runs = np.array([[row, 0, 100] for row in range(100)], np.int32)
+    fill = FillItem(runs, QtGui.QColor('#FF00FF'))
+    canvas.undo_redo.insert_in_undo_redo_add(fill)
+
+    erase(canvas, [(50, 0), (50, 99)])
+
+    erased, = Annotations.annotationItems(canvas.scene)
+    assert isinstance(erased, FillItem)
+    assert erased.color == QtGui.QColor('#FF00FF')
+    assert erased.contains(QtCore.QPointF(20.5, 50.5))
+    assert not erased.contains(QtCore.QPointF(50.5, 50.5))
+    assert erased.boundingRect() == QtCore.QRectF(0, 0, 100, 100)
+
+
+def test_erase_raster(qapp):
+    canvas = create_canvas(raster=True)
+    canvas.tool = Brush(canvas, QtGui.QColor('#00FF00'))
+    draw_stroke(canvas, [(50 + i, 100) for i in range(0, 400, 4)])
+    green = QtGui.QColor('#00FF00').rgba()
+    assert imageArray(canvas.scene.segm)[100, 250] == green
+
+    erase(canvas, [(250, 50), (250, 150)])
+
+    segm = imageArray(canvas.scene.segm)
+    assert segm[100, 250] == QtGui.QColor(0, 0, 0).rgba()
+    assert segm[100, 100] == green
+    canvas.undo_redo.undo(1)
+    assert imageArray(canvas.scene.segm)[100, 250] == green
+
+
+def test_erase_nothing(qapp):
+    canvas = create_canvas()
+    canvas.undo_redo.insert_in_undo_redo_add(square(0, 0, 30))
+
+    erase(canvas, [(200, 200), (300, 300)])
+
+    assert len(canvas.undo_redo.commands[0]) == 1
+    # stroke of eraser is removed
+    assert not any(isinstance(item, StrokeItem) for item in canvas.scene.items())
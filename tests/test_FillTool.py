@@ -0,0 +1,191 @@
+from functools import partial
+
+import numpy as np
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from dl_markup import Annotations
+from dl_markup.BrushTool import Brush
+from dl_markup.Canvas import Canvas
+from dl_markup.FillTool import (
+    Fill, FillItem, channelArray, floodFill, imageArray, mergeRuns, pathRuns, subtractRuns)
+from dl_markup.PolygonTool import Polygon
+
+from fixtures import create_canvas, draw_stroke, mouse_event, wait_fill
+
+
+def reference_fill(inside, x, y):
+    """Return mask of 4-connected component of inside pixels around seed."""
+    region = np.zeros_like(inside)
+    stack = [(y, x)]
+    while stack:
+        r, c = stack.pop()
+        if not (0 <= r < inside.shape[0] and 0 <= c < inside.shape[1]):
+            continue
+        if region[r, c] or not inside[r, c]:
+            continue
+        region[r, c] = True
+        stack.extend([(r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)])
+    return region
+
+
+def runs_mask(runs, shape):
+    mask = np.zeros(shape, dtype=bool)
+    for row, start, end in runs:
+        mask[row, start:end] = True
+    return mask
+
+
+def test_flood_fill_matches_reference():
+    rng = np.random.default_rng(0)
+    # few colors make large irregular regions
+    image = rng.choice(np.array([0xFF000000, 0xFF101010, 0xFFFFFFFF], np.uint32), (40, 50))
+
+    runs = floodFill(image, 7, 5, 16, band=8)
+
+    inside = (image & 0xFF) <= 0x10
+    expected = reference_fill(inside, 7, 5)
+    assert np.array_equal(runs_mask(runs, image.shape), expected)
+    # runs are sorted and don't overlap
+    assert np.array_equal(runs, runs[np.lexsort((runs[:, 1], runs[:, 0]))])
+    assert len(runs) == len(np.unique(runs[:, :2], axis=0))
+
+
+def test_flood_fill_tolerance():
+    # red channel grows by 1 along row
+    image = (0xFF000000 + (np.arange(100, dtype=np.uint32) << 16))[None, :].repeat(3, axis=0)
+
+    runs = floodFill(image, 50, 1, 10)
+
+    assert runs.tolist() == [[0, 40, 61], [1, 40, 61], [2, 40, 61]]
+
+
+def test_flood_fill_labels():
+    image = np.full((10, 10), 0xFFFFFFFF, np.uint32)
+    labels = np.zeros((10, 10), np.uint32)
+    labels[:, 4] = 0xFFFF0000
+
+    runs = floodFill(image, 1, 1, 0, labels)
+
+    assert runs.tolist() == [[row, 0, 4] for row in range(10)]
+
+
+def test_channel_array(qapp):
+    image = QtGui.QImage(3, 2, QtGui.QImage.Format_RGB32)
+    image.fill(QtGui.QColor(10, 20, 30))
+
+    pixels = imageArray(image)
+    channels = channelArray(pixels)
+
+    assert channels.shape == (2, 3, 3)
+    assert (channels == [30, 20, 10]).all()
+    assert np.shares_memory(channels, pixels)
+
+
+def test_merge_runs():
+    runs = np.array([[0, 0, 2], [0, 2, 5], [0, 6, 7], [1, 7, 8], [2, 0, 1]])
+
+    assert mergeRuns(runs).tolist() == [[0, 0, 5], [0, 6, 7], [1, 7, 8], [2, 0, 1]]
+
+
+def test_subtract_runs():
+    runs = np.array([[0, 0, 10], [1, 0, 10], [5, 0, 3]])
+    erased = np.array([[0, 2, 4], [1, 8, 12], [2, 0, 5]])
+
+    assert subtractRuns(runs, erased).tolist() == [[0, 0, 2], [0, 4, 10], [1, 0, 8], [5, 0, 3]]
+
+
+def test_path_runs():
+    path = QtGui.QPainterPath()
+    path.addRect(QtCore.QRectF(2, 3, 4, 2))
+
+    assert pathRuns(path).tolist() == [[3, 2, 6], [4, 2, 6]]
+
+
+def test_fill_item():
+    runs = np.array([[2, 1, 4], [3, 0, 2]])
+    item = FillItem(runs, QtGui.QColor('#FF0000'))
+
+    assert item.boundingRect() == QtCore.QRectF(0, 2, 4, 2)
+    assert item.shape().contains(QtCore.QPointF(3.5, 2.5))
+    assert not item.shape().contains(QtCore.QPointF(3.5, 3.5))
+
+    image = QtGui.QImage(5, 5, QtGui.QImage.Format_RGB32)
+    image.fill(0)
+    painter = QtGui.QPainter(image)
+    item.paint(painter, None, None)
+    painter.end()
+    painted = imageArray(image) == QtGui.QColor('#FF0000').rgba()
+    assert np.array_equal(painted, runs_mask(runs, (5, 5)))
+
+
+def fill_left_half(canvas):
+    """Split canvas by stroke and fill left part."""
+    color = QtGui.QColor('#00FF00')
+    canvas.tool = Brush(canvas, color)
+    draw_stroke(canvas, [(256, 0), (256, 511)])
+    canvas.tool = Fill(canvas, color)
+    canvas.tool.mousePressEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonPress, 100, 100))
+    wait_fill()
+
+
+def test_fill_vector(qapp):
+    canvas = create_canvas()
+    fill_left_half(canvas)
+
+    items = Annotations.annotationItems(canvas.scene)
+    assert len(items) == 2
+    fill = items[1]
+    assert isinstance(fill, FillItem)
+    # stroke is a barrier
+    assert fill.boundingRect().left() == 0
+    assert 200 < fill.boundingRect().right() < 256
+    assert fill.boundingRect().height() == 512
+
+    # the whole region is one undo step
+    canvas.undo_redo.undo(1)
+    assert Annotations.annotationItems(canvas.scene) == items[:1]
+
+
+def test_fill_raster(qapp):
+    canvas = create_canvas(raster=True)
+    fill_left_half(canvas)
+
+    segm = imageArray(canvas.scene.segm)
+    green = QtGui.QColor('#00FF00').rgba()
+    blank = segm[0, -1]
+    assert (segm[:, :200] == green).all()
+    assert (segm[:, 300:] == blank).all()
+
+    canvas.undo_redo.undo(1)
+    segm = imageArray(canvas.scene.segm)
+    assert (segm[:, :200] == blank).all()
+
+
+def test_fill_round_trip(qapp):
+    runs = np.array([[2, 1, 4], [3, 0, 2], [70000, 5, 100000]])
+    fill = FillItem(runs, QtGui.QColor('#0000FF'))
+
+    loaded, = Annotations.loads(Annotations.dumps([fill]))
+
+    assert isinstance(loaded, FillItem)
+    assert loaded.color == QtGui.QColor('#0000FF')
+    assert np.array_equal(loaded.runs, runs)
+
+
+def test_change_tool(qapp):
+    canvas = create_canvas()
+    buttons = [QtWidgets.QPushButton() for _ in Canvas.TOOLS]
+    for button in buttons:
+        button.setCheckable(True)
+        button.clicked.connect(partial(canvas.changeTool, buttons))
+
+    buttons[2].click()
+    assert isinstance(canvas.tool, Fill)
+    assert [button.isChecked() for button in buttons] == [False, False, True, False, False, False]
+
+    buttons[1].click()
+    assert isinstance(canvas.tool, Polygon)
+    # click on pressed button keeps tool
+    buttons[1].click()
+    assert isinstance(canvas.tool, Polygon)
+    assert [button.isChecked() for button in buttons] == [False, True, False, False, False, False]
@@ -0,0 +1,85 @@
+import numpy as np
+from PyQt5 import QtCore, QtGui
+
+from dl_markup.Geometry import (
+    arrayToPolygon, polygonToArray, segmentDistances, simplify, simplifyRing, strokeOutline)
+
+
+def max_deviation(points, simplified):
+    """Max distance from points to simplified polyline."""
+    distances = np.full(len(points), np.inf)
+    for begin, end in zip(simplified[:-1], simplified[1:]):
+        distances = np.minimum(distances, segmentDistances(points, begin, end))
+    return distances.max()
+
+
+def random_walk(count, seed=0):
+    """Smooth curve sampled like mouse positions."""
+    rng = np.random.default_rng(seed)
+    velocity = np.cumsum(rng.normal(0, 0.1, (count, 2)), axis=0)
+    return np.cumsum(velocity, axis=0) * 0.1 + 256
+
+
+def test_simplify():
+    points = random_walk(2000)
+
+    simplified = simplify(points, 0.5)
+
+    assert len(simplified) < len(points) / 2
+    assert (simplified[0] == points[0]).all() and (simplified[-1] == points[-1]).all()
+    assert max_deviation(points, simplified) <= 0.5
+
+
+def test_simplify_ring():
+    angles = np.linspace(0, 2 * np.pi, 721)[:-1]
+    ring = np.stack([100 + 50 * np.cos(angles), 100 + 50 * np.sin(angles)], axis=1)
+
+    simplified = simplifyRing(ring, 0.25)
+
+    assert len(simplified) < len(ring) / 4
+    closed = np.concatenate([simplified, simplified[:1]])
+    assert max_deviation(ring, closed) <= 0.25
+
+
+def test_stroke_outline():
+    points = random_walk(300, seed=1)
+    path = QtGui.QPainterPath()
+    path.addPolygon(arrayToPolygon(points))
+    radius, tolerance = 5., 1.
+
+    outline = strokeOutline(path, radius, tolerance)
+
+    elements = sum(len(p) for p in outline.toSubpathPolygons())
+    assert elements < len(points)
+    # points near centerline are filled, points farther than radius aren't
+    rng = np.random.default_rng(2)
+    normals = rng.normal(0, 1, (len(points), 2))
+    normals /= np.hypot(normals[:, :1], normals[:, 1:])
+    for point in points + normals * (radius - tolerance):
+        assert outline.contains(QtCore.QPointF(*point))
+    outside = points + normals * (radius + tolerance)
+    distances = np.array([
+        min(segmentDistances(np.array([p]), b, e)[0] for b, e in zip(points[:-1], points[1:]))
+        for p in outside])
+    for point in outside[distances >= radius + tolerance]:
+        assert not outline.contains(QtCore.QPointF(*point))
+
+
+def test_stroke_outline_of_dot():
+    single = QtGui.QPainterPath(QtCore.QPointF(50, 50))
+    zero_length = QtGui.QPainterPath(QtCore.QPointF(50, 50))
+    zero_length.lineTo(50, 50)
+
+    for path in (single, zero_length):
+        outline = strokeOutline(path, 20., 0.5)
+
+        rect = outline.boundingRect()
+        assert abs(rect.width() - 40) <= 1 and abs(rect.height() - 40) <= 1
+        assert outline.contains(QtCore.QPointF(50, 50))
+        assert outline.contains(QtCore.QPointF(64, 64))
+
+
+def test_polygon_array_round_trip(qapp):
+    polygon = QtGui.QPolygonF([QtCore.QPointF(1.5, 2), QtCore.QPointF(3, 4.25)])
+
+    assert arrayToPolygon(polygonToArray(polygon)) == polygon
@@ -0,0 +1,51 @@
+from PyQt5 import QtGui
+import pytest
+
+from dl_markup.ImageLoader import ImageLoader
+
+
+@pytest.fixture
+def image_paths(qapp, tmp_path):
+    paths = []
+    for i in range(3):
+        image = QtGui.QImage(64, 32, QtGui.QImage.Format_RGB32)
+        image.fill(QtGui.QColor(i, 0, 0))
+        path = str(tmp_path / f'{i}.png')
+        image.save(path)
+        paths.append(path)
+    return paths
+
+
+def test_cache_hit(image_paths):
+    loader = ImageLoader()
+
+    first = loader.get(image_paths[0])
+    second = loader.get(image_paths[0])
+
+    assert not first.isNull()
+    assert second is first
+    assert loader.stats['hits'] == 1
+    assert loader.stats['misses'] == 1
+
+
+def test_prefetch(image_paths):
+    loader = ImageLoader()
+
+    loader.prefetch(image_paths)
+    image = loader.get(image_paths[2])
+
+    assert image.pixelColor(0, 0) == QtGui.QColor(2, 0, 0)
+    assert loader.stats['misses'] == 0
+
+
+def test_memory_bound(image_paths):
+    image_size = QtGui.QImage(image_paths[0]).sizeInBytes()
+    loader = ImageLoader(max_bytes=2 * image_size)
+
+    for path in image_paths:
+        loader.get(path)
+    # first image is evicted
+    loader.get(image_paths[0])
+
+    assert loader.stats['cached_bytes'] == 2 * image_size
+    assert loader.stats['misses'] == 4
@@ -0,0 +1,167 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from dl_markup import Annotations
+from dl_markup.BrushTool import RegionItem
+from dl_markup.EraserTool import Eraser
+from dl_markup.Journal import Journal
+from dl_markup.PolygonTool import PolygonItem
+
+from fixtures import create_canvas, draw_stroke
+
+
+def polygon_item(canvas, x):
+    polygon = QtWidgets.QGraphicsPolygonItem(
+        QtGui.QPolygonF([
+            QtCore.QPointF(x, 0),
+            QtCore.QPointF(x + 10, 0),
+            QtCore.QPointF(x, 10),
+        ]))
+    polygon.setBrush(QtGui.QColor('#FF0000'))
+    return polygon
+
+
+def annotations(canvas):
+    return Annotations.annotationItems(canvas.scene)
+
+
+def test_replay(qapp, tmp_path):
+    canvas = create_canvas()
+    journal = Journal(canvas, sync_interval=0)
+    journal.begin(str(tmp_path), 'image.png')
+    draw_stroke(canvas, [(10 + i, 20) for i in range(50)])
+    for x in (100, 200, 300):
+        canvas.undo_redo.insert_in_undo_redo_add(polygon_item(canvas, x))
+    canvas.undo_redo.undo(2)
+    journal.close()
+
+    restored = create_canvas()
+    restored_journal = Journal(restored, sync_interval=0)
+    assert Journal.unfinished(str(tmp_path)) == ['image.png']
+    assert restored_journal.begin(str(tmp_path), 'image.png')
+
+    assert len(annotations(restored)) == 2
+    assert restored.undo_redo.modified
+    restored.undo_redo.redo(2)
+    assert len(annotations(restored)) == 4
+    restored_journal.close()
+
+
+def test_replay_erase(qapp, tmp_path):
+    canvas = create_canvas()
+    journal = Journal(canvas, sync_interval=0)
+    journal.begin(str(tmp_path), 'image.png')
+    for x in (100, 200, 300):
+        canvas.undo_redo.insert_in_undo_redo_add(polygon_item(canvas, x))
+    canvas.tool = Eraser(canvas, QtGui.QColor('#FF0000'))
+    canvas.tool.radius = 2
+    # cut two triangles into pieces
+    draw_stroke(canvas, [(203, 0), (203, 20), (303, 20), (303, 0)])
+    journal.close()
+
+    restored = create_canvas()
+    restored_journal = Journal(restored, sync_interval=0)
+    assert restored_journal.begin(str(tmp_path), 'image.png')
+
+    kinds = [type(item) for item in annotations(restored)]
+    assert kinds == [PolygonItem, RegionItem, RegionItem]
+    restored.undo_redo.undo(1)
+    assert len(annotations(restored)) == 3
+    assert not any(isinstance(item, RegionItem) for item in annotations(restored))
+    restored_journal.close()
+
+
+def test_compaction(qapp, tmp_path):
+    canvas = create_canvas()
+    journal = Journal(canvas, sync_interval=0, compact_records=5)
+    journal.begin(str(tmp_path), 'image.png')
+    for x in range(12):
+        canvas.undo_redo.insert_in_undo_redo_add(polygon_item(canvas, 10 * x))
+    canvas.undo_redo.undo(1)
+    journal.close()
+
+    records = Journal.read(Journal.journalPath(str(tmp_path), 'image.png'))
+    # snapshot of 10 items in history and 3 appended records
+    assert len(records) == 15
+
+    restored = create_canvas()
+    Journal(restored).begin(str(tmp_path), 'image.png')
+    assert len(annotations(restored)) == 11
+    assert len(restored.undo_redo.commands[0]) == 11
+    assert len(restored.undo_redo.commands[1]) == 1
+
+
+def test_compaction_raster(qapp, tmp_path):
+    canvas = create_canvas(raster=True)
+    journal = Journal(canvas, sync_interval=0, compact_records=5)
+    journal.begin(str(tmp_path), 'image.png')
+    for x in range(12):
+        # replayed items are painted like decoded ones
+        polygon = PolygonItem(polygon_item(canvas, 10 * x).polygon(), QtGui.QColor('#FF0000'))
+        canvas.undo_redo.insert_in_undo_redo_add(polygon)
+    canvas.undo_redo.undo(1)
+    journal.close()
+
+    records = Journal.read(Journal.journalPath(str(tmp_path), 'image.png'))
+    # mask, patches of 9 commands, item of 10th command and 3 appended records
+    assert [kind for kind, _ in records[:3]] == [Journal.CLEAR, Journal.MASK, Journal.PATCH]
+    assert len(records) == 15
+
+    restored = create_canvas(raster=True)
+    Journal(restored).begin(str(tmp_path), 'image.png')
+    assert restored.scene.segm == canvas.scene.segm
+    assert len(restored.undo_redo.commands[0]) == 11
+    restored.undo_redo.undo(11)
+    canvas.undo_redo.undo(11)
+    assert restored.scene.segm == canvas.scene.segm
+    restored.undo_redo.redo(12)
+    canvas.undo_redo.redo(12)
+    assert restored.scene.segm == canvas.scene.segm
+
+
+def test_compaction_after_replace(qapp, tmp_path):
+    def record_kinds(added):
+        canvas = create_canvas()
+        canvas.undo_redo.max_commands = 2
+        journal = Journal(canvas, sync_interval=0, compact_records=3)
+        journal.begin(str(tmp_path), 'image.png')
+        for x in (100, 200):
+            canvas.undo_redo.insert_in_undo_redo_add(polygon_item(canvas, x))
+        canvas.tool = Eraser(canvas, QtGui.QColor('#FF0000'))
+        canvas.tool.radius = 2
+        draw_stroke(canvas, [(203, 0), (203, 20)])
+        for x in range(added):
+            canvas.undo_redo.insert_in_undo_redo_add(polygon_item(canvas, 300 + 20 * x))
+        journal.close()
+        return [kind for kind, _ in Journal.read(Journal.journalPath(str(tmp_path), 'image.png'))]
+
+    # history with replaced items isn't compacted
+    assert Journal.REPLACE in record_kinds(2)
+    # replace command has left history, so journal is compacted again
+    assert record_kinds(3) == [Journal.CLEAR, Journal.BASE] + [Journal.ADD] * 3
+
+
+def test_discard(qapp, tmp_path):
+    canvas = create_canvas()
+    journal = Journal(canvas)
+    journal.begin(str(tmp_path), 'image.png')
+    canvas.undo_redo.insert_in_undo_redo_add(polygon_item(canvas, 0))
+
+    journal.discard()
+    journal.close()
+
+    assert Journal.unfinished(str(tmp_path)) == []
+
+
+def test_base_polygons_snapped(qapp, tmp_path):
+    canvas = create_canvas()
+    canvas.undo_redo.max_commands = 2
+    journal = Journal(canvas, sync_interval=0, compact_records=3)
+    journal.begin(str(tmp_path), 'image.png')
+    for x in range(4):
+        canvas.undo_redo.insert_in_undo_redo_add(polygon_item(canvas, 20 * x))
+    journal.close()
+
+    restored = create_canvas()
+    Journal(restored).begin(str(tmp_path), 'image.png')
+    assert len(restored.vertex_index) == 4
+    assert restored.vertex_index.nearest(QtCore.QPointF(1, 1), 2) == QtCore.QPointF(0, 0)
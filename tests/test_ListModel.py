@@ -0,0 +1,63 @@
+from PyQt5.QtCore import QModelIndex
+
+from dl_markup.ListModel import ListModel, PagedListModel
+
+
+def test_row_signals(qapp):
+    model = ListModel(items=['a', 'b', 'c', 'd', 'e'])
+    inserted, removed = [], []
+    model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+    model.rowsRemoved.connect(lambda parent, first, last: removed.append((first, last)))
+
+    model.appendItems(['f', 'g'])
+    model.removeItems(['b', 'c', 'e', 'unknown'])
+
+    assert model.items == ['a', 'd', 'f', 'g']
+    assert inserted == [(5, 6)]
+    assert removed == [(4, 4), (1, 2)]
+
+    model.removeItems(['g'])
+    assert model.items == ['a', 'd', 'f']
+
+
+def test_row_of_after_changes(qapp):
+    model = ListModel(items=[str(i) for i in range(10)])
+    assert model.rowOf('5') == 5
+
+    model.removeItems(['1', '2', '7'])
+    model.appendItems(['10', '11'])
+    model.removeItems(['0', '10'])
+
+    assert model.items == ['3', '4', '5', '6', '8', '9', '11']
+    for row, item in enumerate(model.items):
+        assert model.rowOf(item) == row
+    assert model.rowOf('1') is None
+    assert model.rowOf('10') is None
+
+    model.removeItems(model.items[:5])
+    assert model.rowOf('11') == 1
+
+
+def test_paged_list(qapp):
+    names = [f'{i:03}' for i in range(100)]
+    calls = []
+
+    def fetch(after, limit):
+        calls.append(after)
+        return [name for name in names if name > after][:limit]
+
+    model = PagedListModel(fetch, lambda name: int(name) % 2 == 0, page_size=10)
+    assert model.canFetchMore(QModelIndex())
+    model.fetchMore(QModelIndex())
+    assert model.items == ['000', '002', '004', '006', '008']
+
+    # rows are fetched until item is reached
+    assert model.rowOf('030') == 15
+    assert calls == ['', '009', '019', '029']
+    assert model.rowOf('031') is None
+
+    model.reset()
+    assert model.items == []
+    assert model.rowOf('999') is None
+    assert len(model.items) == 50
+    assert not model.canFetchMore(QModelIndex())
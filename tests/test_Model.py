@@ -1,26 +1,37 @@
+import os
+import shutil
+
+import numpy as np
 from PyQt5.QtWidgets import QFileDialog
+from PyQt5.QtGui import QImage
+from PyQt5.QtCore import QModelIndex
 
 from dl_markup.Model import Model
 from dl_markup.Canvas import Canvas
+from dl_markup.Journal import Journal
+from dl_markup.StatusIndex import StatusIndex
 
 from fixtures import scene_with_undo_redo
 
 
 def test_select_input_directory_1(
         qapp,
+        qtbot,
         scene_with_undo_redo,
-        monkeypatch):
+        monkeypatch,
+        tmp_path):
     _, scene, undo_redo = scene_with_undo_redo
 
     canvas = Canvas(scene, undo_redo)
-    model = Model(canvas, './', './')
+    model = Model(canvas, './', str(tmp_path))
 
     monkeypatch.setattr(
         QFileDialog,
         'getExistingDirectory',
         lambda *args: './resources'
     )
-    model.selectInputDirectory()
+    with qtbot.waitSignal(model.scanner.finished):
+        model.selectInputDirectory()
 
     assert 'Lenna.png' in model.listModel.items
     assert model.inputDirectory.text() == './resources'
@@ -28,14 +39,18 @@ def test_select_input_directory_1(
 
 def test_select_input_directory_2(
         qapp,
+        qtbot,
         scene_with_undo_redo,
-        monkeypatch):
+        monkeypatch,
+        tmp_path):
     _, scene, undo_redo = scene_with_undo_redo
 
     canvas = Canvas(scene, undo_redo)
-    model = Model(canvas, './', './')
+    model = Model(canvas, './', str(tmp_path))
+    # batches of initial scan are delivered by event loop
+    qtbot.waitSignal(model.scanner.finished).wait()
 
-    init_items = model.listModel.items
+    init_items = list(model.listModel.items)
     init_text = model.inputDirectory.text()
 
     monkeypatch.setattr(
@@ -52,17 +67,97 @@ def test_select_input_directory_2(
 def test_select_output_directory(
         qapp,
         scene_with_undo_redo,
-        monkeypatch):
+        monkeypatch,
+        tmp_path):
     _, scene, undo_redo = scene_with_undo_redo
 
     canvas = Canvas(scene, undo_redo)
-    model = Model(canvas, './', './')
+    model = Model(canvas, './', str(tmp_path))
 
     monkeypatch.setattr(
         QFileDialog,
         'getExistingDirectory',
-        lambda *args: './resources'
+        lambda *args: str(tmp_path / 'masks')
     )
     model.selectOutputDirectory()
 
-    assert model.outputDirectory.text() == './resources'
+    assert model.outputDirectory.text() == str(tmp_path / 'masks')
+    assert model.statusIndex.path.startswith(str(tmp_path / 'masks'))
+
+
+def test_save_class_ids(
+        qapp,
+        scene_with_undo_redo,
+        tmp_path):
+    _, scene, undo_redo = scene_with_undo_redo
+
+    canvas = Canvas(scene, undo_redo)
+    canvas.updateBackgroundImage(QImage('./resources/Lenna.png'))
+    model = Model(canvas, './resources', str(tmp_path), mask_format='npy')
+    model.workingImageName = 'Lenna.png'
+
+    model.save()
+    model.saveQueue.close()
+
+    ids = np.load(tmp_path / 'Lenna.npy')
+    assert ids.shape == (scene.img.height(), scene.img.width())
+    assert ids.dtype == np.uint8
+
+
+def test_status_index(
+        qapp,
+        qtbot,
+        scene_with_undo_redo,
+        tmp_path):
+    _, scene, undo_redo = scene_with_undo_redo
+    (tmp_path / 'input').mkdir()
+    for name in ('a.png', 'b.png'):
+        shutil.copy('./resources/Lenna.png', tmp_path / 'input' / name)
+
+    canvas = Canvas(scene, undo_redo)
+    canvas.updateBackgroundImage(QImage('./resources/Lenna.png'))
+    model = Model(canvas, str(tmp_path / 'input'), str(tmp_path / 'output'), annotator='tester')
+    qtbot.waitSignal(model.scanner.finished).wait()
+    model.workingImageName = 'a.png'
+    assert model.nextUnlabeled() == model.listModel.rowOf('b.png')
+
+    model.save()
+    model.saveQueue.flush()
+
+    info = model.statusIndex.info('a.png')
+    assert info['status'] == StatusIndex.LABELED
+    assert info['annotator'] == 'tester'
+    assert info['mask_mtime'] == os.path.getmtime(tmp_path / 'output' / 'a.png')
+    assert sum(info['class_pixels'].values()) == scene.img.width() * scene.img.height()
+
+    # labeled images are filtered by index
+    model.unlabeledModel.reset()
+    model.unlabeledModel.fetchMore(QModelIndex())
+    assert model.unlabeledModel.items == ['b.png']
+
+    model.workingImageName = 'b.png'
+    assert model.nextUnlabeled() is None
+    model.close()
+
+
+def test_unfinished_journal(
+        qapp,
+        qtbot,
+        scene_with_undo_redo,
+        tmp_path):
+    _, scene, undo_redo = scene_with_undo_redo
+    (tmp_path / 'input').mkdir()
+    for name in ('a.png', 'b.png'):
+        shutil.copy('./resources/Lenna.png', tmp_path / 'input' / name)
+    # journal of image, which isn't listed, is skipped
+    for name in ('0.png', 'b.png'):
+        path = Journal.journalPath(str(tmp_path / 'output'), name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        open(path, 'wb').close()
+
+    canvas = Canvas(scene, undo_redo)
+    model = Model(canvas, str(tmp_path / 'input'), str(tmp_path / 'output'))
+    assert model.unfinished == ['0.png', 'b.png']
+    qtbot.waitSignal(model.scanner.finished).wait()
+    assert model.unfinishedRow() == model.listModel.rowOf('b.png')
+    model.close()
@@ -0,0 +1,74 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from dl_markup import Annotations
+from dl_markup.PolygonTool import Polygon, PolygonItem
+
+from fixtures import create_canvas, mouse_event
+
+
+def click(canvas, x, y):
+    canvas.tool.mousePressEvent(
+        mouse_event(canvas, QtCore.QEvent.MouseButtonPress, x, y))
+
+
+def test_draw_polygon(qapp):
+    canvas = create_canvas()
+    canvas.tool = Polygon(canvas, QtCore.Qt.red)
+
+    for x, y in [(10, 10), (100, 10), (100, 100)]:
+        click(canvas, x, y)
+    assert len(canvas.tool.verticies) == 3
+
+    # click on the first vertex closes polygon
+    click(canvas, 10, 10)
+
+    polygons = Annotations.annotationItems(canvas.scene)
+    assert len(polygons) == 1
+    assert polygons[0].polygon().count() == 3
+    assert canvas.tool.verticies == []
+
+
+def vertex_centers(polygon):
+    return [
+        vertex.scenePos() + vertex.rect().center()
+        for vertex in polygon.verticies]
+
+
+def test_snap_to_committed_vertex(qapp):
+    canvas = create_canvas()
+    canvas.tool = Polygon(canvas, QtCore.Qt.red)
+    for x, y in [(10, 10), (100, 10), (100, 100), (10, 10)]:
+        click(canvas, x, y)
+    assert len(canvas.vertex_index) == 1
+
+    # the second polygon shares border with the first one
+    canvas.tool = Polygon(canvas, QtCore.Qt.blue)
+    for x, y in [(103, 12), (98, 97), (200, 100)]:
+        click(canvas, x, y)
+    centers = vertex_centers(canvas.tool)
+    assert centers[0] == QtCore.QPointF(100, 10)
+    assert centers[1] == QtCore.QPointF(100, 100)
+    assert centers[2] == QtCore.QPointF(200, 100)
+    canvas.tool.clear()
+
+    # undone polygon is not snapped to
+    canvas.undo_redo.undo(1)
+    click(canvas, 103, 12)
+    assert vertex_centers(canvas.tool) == [QtCore.QPointF(103, 12)]
+
+    # polygon is removed from index, when it can't be redone
+    canvas.tool.clear()
+    canvas.undo_redo.insert_in_undo_redo_add(QtWidgets.QGraphicsRectItem(0, 0, 1, 1))
+    assert len(canvas.vertex_index) == 0
+
+
+def test_polygon_item_shape_cached(qapp):
+    points = QtGui.QPolygonF([QtCore.QPointF(0, 0), QtCore.QPointF(10, 0), QtCore.QPointF(0, 10)])
+    item = PolygonItem(points, QtCore.Qt.red)
+    shape = item.shape()
+    assert item.shape() is shape
+    assert shape.contains(QtCore.QPointF(2, 2))
+
+    item.setPolygon(points.translated(100, 100))
+    assert not item.shape().contains(QtCore.QPointF(2, 2))
+    assert item.shape().contains(QtCore.QPointF(102, 102))
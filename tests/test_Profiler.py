@@ -0,0 +1,45 @@
+import json
+
+from dl_markup.Profiler import Profiler, ProfilerOverlay, RollingHistogram
+from dl_markup.Scene import Scene
+
+from fixtures import create_canvas, draw_stroke
+
+
+def test_rolling_histogram():
+    histogram = RollingHistogram(window=4)
+    for value in [1., 1., 1e-3, 1e-3, 1e-3, 1e-3]:
+        histogram.add(value)
+
+    # the slow values have left the window
+    assert len(histogram) == 4
+    assert histogram.total == 6
+    assert abs(histogram.mean - 1e-3) < 1e-9
+    assert 1e-3 < histogram.percentile(95) < 1.5e-3
+
+
+def test_instrument(qapp, tmp_path):
+    segm = Scene.__dict__['segm']
+    profiler = Profiler()
+    profiler.enable()
+    try:
+        canvas = create_canvas()
+        overlay = ProfilerOverlay(profiler, canvas)
+        draw_stroke(canvas, [(10 + i, 20) for i in range(10)])
+        canvas.scene.segm
+        canvas.scene.segm
+        overlay.refresh()
+    finally:
+        profiler.disable()
+    assert Scene.__dict__['segm'] is segm
+
+    summary = profiler.summary()
+    assert summary['Scene.segm']['count'] == 2
+    assert summary['Brush.mouseMoveEvent']['count'] == 9
+    assert 'Scene.segm' in overlay.text()
+
+    path = tmp_path / 'trace.json'
+    profiler.dumpTrace(str(path))
+    events = json.loads(path.read_text())['traceEvents']
+    assert len(events) == 11
+    assert all(event['ph'] == 'X' and event['dur'] >= 0 for event in events)
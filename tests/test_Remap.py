@@ -0,0 +1,49 @@
+import numpy as np
+from PyQt5 import QtGui
+
+from dl_markup.Remap import main
+from dl_markup.ClassMap import imageToRgb
+
+
+def create_mask(path):
+    image = QtGui.QImage(8, 4, QtGui.QImage.Format_RGB32)
+    image.fill(QtGui.QColor('#000000'))
+    image.setPixelColor(1, 1, QtGui.QColor('#FF0000'))
+    image.setPixelColor(2, 1, QtGui.QColor('#0000FF'))
+    image.save(path)
+
+
+def test_remap_colors(qapp, tmp_path):
+    for i in range(3):
+        create_mask(str(tmp_path / f'{i}.png'))
+
+    ret = main([str(tmp_path), '--map', '#FF0000=#0000FF', '--workers', '2'])
+
+    assert ret == 0
+    for i in range(3):
+        rgb = imageToRgb(QtGui.QImage(str(tmp_path / f'{i}.png')))
+        assert rgb[1, 1] == 0x0000FF
+        assert rgb[1, 2] == 0x0000FF
+        assert rgb[0, 0] == 0
+
+
+def test_remap_to_class_ids(qapp, tmp_path):
+    input_dir = tmp_path / 'input'
+    output_dir = tmp_path / 'output'
+    input_dir.mkdir()
+    create_mask(str(input_dir / 'mask.png'))
+
+    ret = main([
+        str(input_dir),
+        '--output_dir', str(output_dir),
+        '--map', '#FF0000=#0000FF',
+        '--mask_format', 'npy',
+        '--workers', '1',
+    ])
+
+    assert ret == 0
+    ids = np.load(output_dir / 'mask.npy')
+    # '#0000FF' is the fourth color of palette
+    assert ids[1, 1] == 4
+    assert ids[1, 2] == 4
+    assert np.count_nonzero(ids) == 2
@@ -0,0 +1,38 @@
+import os
+
+from dl_markup.SaveQueue import SaveQueue
+
+
+def write_text(text, path):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def test_submit_and_flush(qapp, tmp_path):
+    queue = SaveQueue(max_workers=2, max_pending=2)
+    paths = [str(tmp_path / f'{i}.txt') for i in range(5)]
+
+    for i, path in enumerate(paths):
+        queue.submit(path, lambda tmp, i=i: write_text(str(i), tmp))
+    queue.close()
+
+    assert queue.pending == 0
+    for i, path in enumerate(paths):
+        with open(path) as f:
+            assert f.read() == str(i)
+    # temporary files are moved to their places
+    assert sorted(os.listdir(tmp_path)) == sorted(os.path.basename(p) for p in paths)
+
+
+def test_failed_write(qapp, tmp_path):
+    queue = SaveQueue()
+    path = str(tmp_path / 'failed.txt')
+
+    def fail(tmp):
+        write_text('partial', tmp)
+        raise IOError("disk is full")
+
+    queue.submit(path, fail)
+    queue.close()
+
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,43 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from dl_markup.Scene import Scene
+
+
+def test_bulk_insert(qapp):
+    scene = Scene(0, 0, 512, 512, bsp_depth=6)
+    assert scene.bspTreeDepth() == 6
+
+    with scene.bulkInsert():
+        assert scene.itemIndexMethod() == QtWidgets.QGraphicsScene.NoIndex
+        # nested bulk insert keeps indexing suspended
+        with scene.bulkInsert():
+            for i in range(100):
+                scene.addRect(10 * i, 10 * i, 4, 4)
+        assert scene.itemIndexMethod() == QtWidgets.QGraphicsScene.NoIndex
+
+    assert scene.itemIndexMethod() == QtWidgets.QGraphicsScene.BspTreeIndex
+    assert scene.bspTreeDepth() == 6
+    assert len(scene.items(QtCore.QPointF(252, 252))) == 1
+    assert scene.items(QtCore.QPointF(257, 257)) == []
+
+
+def test_segm_snapshot(qapp):
+    scene = Scene(0, 0, 64, 64)
+    image = QtGui.QPixmap(64, 64)
+    image.fill(QtGui.QColor(255, 255, 255))
+    scene.img = image
+    assert scene.image.size() == QtCore.QSize(64, 64)
+    assert scene.image is scene.image
+    rect = scene.addRect(0, 0, 10, 10, QtGui.QPen(QtCore.Qt.NoPen), QtGui.QColor('#FF0000'))
+
+    render = scene.segmSnapshot()
+    # markup changed after snapshot is not rendered
+    rect.setRect(0, 0, 20, 20)
+    pool = ThreadPoolExecutor(1)
+    segm = pool.submit(render).result()
+    pool.shutdown()
+    assert segm.pixelColor(5, 5) == QtGui.QColor('#FF0000')
+    assert segm.pixelColor(15, 15) == scene.segm.pixelColor(30, 30)
+    assert scene.segm.pixelColor(15, 15) == QtGui.QColor('#FF0000')
@@ -0,0 +1,179 @@
+import numpy as np
+from PyQt5 import QtCore, QtGui
+from PyQt5.QtCore import Qt
+
+from dl_markup import Annotations
+from dl_markup.FillTool import FillItem, imageArray
+from dl_markup.Segmentation import (
+    BACKGROUND, FOREGROUND, Segmenter, boundaryBand, downscale, drawSeeds, watershed)
+from dl_markup.SmartRegionTool import SmartRegion
+
+from fixtures import create_canvas, mouse_event
+
+
+def disc_levels(size=64, noise=10):
+    """Return gradient levels of noisy disc and the disc."""
+    rng = np.random.default_rng(0)
+    rows, columns = np.mgrid[:size, :size]
+    disc = (rows - size / 2) ** 2 + (columns - size / 2) ** 2 < (size / 4) ** 2
+    image = disc * 100. + rng.normal(0, noise, disc.shape)
+    dy, dx = np.gradient(image)
+    return np.clip(np.hypot(dx, dy) * 2, 0, 255).astype(np.uint8), disc
+
+
+def test_watershed_stops_at_edges():
+    levels, disc = disc_levels()
+    markers = np.zeros(disc.shape, np.int8)
+    markers[32, 32] = FOREGROUND
+    markers[0] = BACKGROUND
+
+    labels = watershed(levels, markers)
+
+    assert set(np.unique(labels)) == {FOREGROUND, BACKGROUND}
+    assert ((labels == FOREGROUND) != disc).sum() < 0.02 * disc.sum()
+
+
+def test_watershed_progress():
+    levels, disc = disc_levels()
+    markers = np.zeros(disc.shape, np.int8)
+    markers[32, 32] = FOREGROUND
+    markers[0] = BACKGROUND
+    areas = []
+
+    watershed(levels, markers, lambda labels: areas.append((labels == FOREGROUND).sum()))
+
+    # region grows monotonically from the seed
+    assert areas[0] < areas[-1]
+    assert areas == sorted(areas)
+
+
+def test_downscale():
+    pixels = np.arange(5 * 3).reshape(5, 3, 1).astype(np.uint8)
+
+    small = downscale(pixels, 2)
+
+    # blocks at right and bottom are smaller
+    assert small[..., 0].tolist() == [[2, 4], [8, 10], [13, 14]]
+
+
+def test_draw_seeds():
+    markers = np.zeros((10, 10), np.int8)
+    scribble = (FOREGROUND, np.array([[6., 4.], [12., 4.]]))
+
+    drawSeeds(markers, [scribble], (4, 2, 14, 16), scale=2)
+
+    assert np.flatnonzero(markers[2] == FOREGROUND).tolist() == [3, 4, 5, 6]
+    # outside of box, which is scaled to columns 2..6 and rows 1..7, is background
+    assert (markers[:, :2] == BACKGROUND).all() and (markers[:, 7:] == BACKGROUND).all()
+    assert (markers[0] == BACKGROUND).all() and (markers[8:] == BACKGROUND).all()
+    # center of box is foreground
+    assert markers[4, 4] == FOREGROUND
+
+
+def test_boundary_band():
+    mask = np.zeros((9, 9), bool)
+    mask[3:6, 3:6] = True
+
+    band = boundaryBand(mask)
+
+    assert band[4, 4] and band[2, 2] and band[1, 4]
+    assert not band[0, 4] and not band[4, 8] and not band[8, 8]
+
+
+def square_canvas():
+    """Canvas with dark square at 100..300 and a smart region tool."""
+    canvas = create_canvas()
+    image = QtGui.QPixmap(canvas.scene.img)
+    painter = QtGui.QPainter(image)
+    painter.fillRect(100, 100, 200, 200, QtGui.QColor('#202020'))
+    painter.end()
+    canvas.scene.img = image
+    canvas.tool = SmartRegion(canvas, QtGui.QColor('#FF0000'))
+    return canvas
+
+
+def scribble(canvas, points, **kwargs):
+    tool = canvas.tool
+    tool.mousePressEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonPress, *points[0], **kwargs))
+    for x, y in points[1:]:
+        tool.mouseMoveEvent(mouse_event(canvas, QtCore.QEvent.MouseMove, x, y, **kwargs))
+    tool.mouseReleaseEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonRelease, *points[-1], **kwargs))
+
+
+def key(canvas, key):
+    canvas.tool.keyPressEvent(QtGui.QKeyEvent(QtCore.QEvent.KeyPress, key, Qt.NoModifier))
+
+
+def test_smart_region(qapp):
+    canvas = square_canvas()
+    tool = canvas.tool
+    scene_items = canvas.scene.items()
+
+    scribble(canvas, [(150, 150), (250, 250)])
+    scribble(canvas, [(20, 20), (20, 480)], button=Qt.RightButton)
+    tool.wait()
+
+    assert tool.preview is not None
+    assert tool.preview.boundingRect() == QtCore.QRectF(100, 100, 200, 200)
+    key(canvas, Qt.Key_Return)
+
+    items = Annotations.annotationItems(canvas.scene)
+    assert len(items) == 1
+    assert isinstance(items[0], FillItem)
+    assert items[0].color == QtGui.QColor('#FF0000')
+    assert items[0].boundingRect() == QtCore.QRectF(100, 100, 200, 200)
+    # seeds and preview are removed
+    assert set(canvas.scene.items()) == set(items + scene_items)
+    canvas.undo_redo.undo(1)
+    assert Annotations.annotationItems(canvas.scene) == []
+
+
+def test_smart_region_box_raster(qapp):
+    canvas = create_canvas(raster=True)
+    image = QtGui.QPixmap(canvas.scene.img)
+    painter = QtGui.QPainter(image)
+    painter.fillRect(100, 100, 200, 200, QtGui.QColor('#202020'))
+    painter.end()
+    canvas.scene.img = image
+    canvas.tool = SmartRegion(canvas, QtGui.QColor('#FF0000'))
+
+    scribble(canvas, [(80, 80), (320, 320)], modifiers=Qt.ShiftModifier)
+    # region is added, when it's refined
+    key(canvas, Qt.Key_Return)
+    canvas.tool.wait()
+
+    segm = imageArray(canvas.scene.segm)
+    red = QtGui.QColor('#FF0000').rgba()
+    # pixels at corners of square are equally close to both sides
+    assert (segm[101:299, 101:299] == red).all()
+    assert (segm[:99] != red).all() and (segm[301:] != red).all()
+    assert abs((segm == red).sum() - 200 * 200) < 100
+
+
+def test_smart_region_cancel(qapp):
+    canvas = square_canvas()
+    tool = canvas.tool
+    scene_items = canvas.scene.items()
+
+    scribble(canvas, [(150, 150), (250, 250)])
+    key(canvas, Qt.Key_Escape)
+    tool.wait()
+
+    assert canvas.scene.items() == scene_items
+    assert tool.preview is None
+    assert len(canvas.undo_redo.commands[0]) == 0
+
+
+def test_segmenter_resends_image(qapp):
+    image = square_canvas().scene.img
+    segmenter = Segmenter()
+    # process doesn't keep image, e.g. it has been restarted
+    segmenter._Segmenter__key = image.cacheKey()
+    results = []
+
+    scribbles = [(FOREGROUND, np.array([[150., 150.], [250., 250.]]))]
+    segmenter.segment(image, scribbles, None, lambda runs, final: results.append(final))
+    segmenter.wait()
+    segmenter.close()
+
+    assert results and results[-1]
@@ -0,0 +1,59 @@
+import numpy as np
+
+from dl_markup.StatusIndex import StatusIndex
+
+
+def test_import_masks(tmp_path):
+    (tmp_path / 'a.npy').write_bytes(b'')
+    (tmp_path / 'sub').mkdir()
+    (tmp_path / 'sub' / 'c.png').write_bytes(b'')
+
+    index = StatusIndex(str(tmp_path))
+    assert index.importing
+    # images added before import get status of imported masks
+    index.addImages(['a.jpg', 'b.jpg', 'sub/c.jpg', 'd.jpg'])
+    index.removeImages(['d.jpg'])
+    assert index.status('a.jpg') is None
+    index.importMasks(str(tmp_path))
+
+    assert not index.importing
+    assert index.names(StatusIndex.LABELED) == {'a.jpg', 'sub/c.jpg'}
+    assert index.names(StatusIndex.UNLABELED) == {'b.jpg'}
+    index.close()
+
+
+def test_next(tmp_path):
+    index = StatusIndex(str(tmp_path))
+    index.importMasks(str(tmp_path))
+    names = [f'{i:04}.png' for i in range(100)]
+    index.addImages(names)
+    index.setStatus('0001.png', StatusIndex.LABELED)
+
+    assert index.next(StatusIndex.UNLABELED, limit=3) == ['0000.png', '0002.png', '0003.png']
+    assert index.next(StatusIndex.UNLABELED, '0097.png') == ['0098.png', '0099.png']
+
+    index.removeImages(['0000.png', '0001.png'])
+    assert index.status('0000.png') is None
+    assert index.status('0001.png') == StatusIndex.LABELED
+    index.close()
+
+
+def test_update_mask(tmp_path):
+    index = StatusIndex(str(tmp_path))
+    index.importMasks(str(tmp_path))
+    index.addImages(['a.png'])
+
+    ids = np.array([[0, 0, 2], [2, 2, 5]], dtype=np.uint8)
+    index.updateMask('a.png', ids, 123., 'tester')
+    index.close()
+
+    # status is kept between sessions
+    index = StatusIndex(str(tmp_path))
+    index.addImages(['a.png'])
+    assert index.info('a.png') == {
+        'status': StatusIndex.LABELED,
+        'mask_mtime': 123.,
+        'annotator': 'tester',
+        'class_pixels': {0: 2, 2: 3, 5: 1},
+    }
+    index.close()
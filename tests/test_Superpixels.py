@@ -0,0 +1,146 @@
+import os
+from concurrent.futures import Future
+
+import numpy as np
+from PyQt5 import QtCore, QtGui
+
+from dl_markup import Annotations
+from dl_markup.FillTool import FillItem, floodFill
+from dl_markup.SuperpixelTool import Superpixel
+from dl_markup.Superpixels import (
+    SuperpixelMap, Superpixels, enforceConnectivity, labelBoxes, slic)
+
+from fixtures import create_canvas, mouse_event
+
+
+def is_connected(labels, label):
+    ys, xs = np.nonzero(labels == label)
+    runs = floodFill(labels.astype(np.uint32), int(xs[0]), int(ys[0]), 0)
+    return int((runs[:, 2] - runs[:, 1]).sum()) == len(ys)
+
+
+def two_halves(height=60, width=80):
+    """Return noisy image with dark left and bright right half."""
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 20, (height, width, 3)).astype(np.uint8)
+    pixels[:, width // 2:] += 200
+    return pixels
+
+
+def test_slic_follows_edges():
+    pixels = two_halves()
+
+    labels = slic(pixels, segments=48)
+
+    assert labels.shape == (60, 80)
+    assert 30 <= len(np.unique(labels)) <= 60
+    left = np.unique(labels[:, :40])
+    right = np.unique(labels[:, 40:])
+    assert not np.intersect1d(left, right).size
+    assert all(is_connected(labels, label) for label in np.unique(labels))
+
+
+def test_enforce_connectivity():
+    labels = np.array([
+        [0, 0, 1, 1],
+        [0, 3, 3, 0],
+        [2, 2, 2, 2],
+    ])
+    colors = np.zeros((3, 4, 1))
+    colors[0, 2:] = colors[1, 3] = 1.
+
+    connected = enforceConnectivity(labels, colors)
+
+    # the piece of 0 at the right merges into the neighbour of the closest color
+    assert connected.tolist() == [
+        [0, 0, 1, 1],
+        [0, 3, 3, 1],
+        [2, 2, 2, 2],
+    ]
+
+
+def test_label_boxes():
+    labels = np.array([
+        [0, 0, 2],
+        [0, 2, 2],
+    ])
+
+    assert labelBoxes(labels).tolist() == [[0, 0, 2, 2], [0, 0, 0, 0], [0, 1, 2, 3]]
+
+
+def test_runs_of_downscaled_labels():
+    labels = np.array([
+        [0, 1],
+        [2, 3],
+    ], np.int32)
+    superpixels = SuperpixelMap(labels, labelBoxes(labels), 5, 4)
+
+    assert superpixels.label(4, 0) == 1
+    assert superpixels.label(5, 0) is None
+    # columns 0..2 belong to the first label column, rows 0..1 to the first label row
+    assert superpixels.runs([1]).tolist() == [[0, 3, 5], [1, 3, 5]]
+    assert superpixels.runs([0, 3]).tolist() == [[0, 0, 3], [1, 0, 3], [2, 3, 5], [3, 3, 5]]
+
+
+def test_cache(qapp, tmp_path):
+    path = str(tmp_path / 'image.png')
+    pixels = np.ascontiguousarray(two_halves())
+    QtGui.QImage(pixels.data, 80, 60, 240, QtGui.QImage.Format_RGB888).save(path)
+    cache_dir = str(tmp_path / Superpixels.DIRECTORY)
+
+    superpixels = Superpixels(segments=48)
+    computed = superpixels.request(path, cache_dir).result()
+    superpixels.close()
+
+    assert (computed.width, computed.height) == (80, 60)
+    assert os.listdir(cache_dir) == [os.path.basename(superpixels.cachePath(path, cache_dir))]
+    superpixels = Superpixels(segments=48)
+    loaded = superpixels.request(path, cache_dir).result()
+    superpixels.close()
+    assert np.array_equal(loaded.labels, computed.labels)
+    assert np.array_equal(loaded.boxes, computed.boxes)
+
+
+def superpixel_canvas(ready=True):
+    """Canvas with 8x8 superpixels of 64x64 pixels."""
+    canvas = create_canvas()
+    labels = (np.arange(8)[:, None] * 8 + np.arange(8)[None, :]).astype(np.int32)
+    canvas.superpixels = Future()
+    if ready:
+        canvas.superpixels.set_result(SuperpixelMap(labels, labelBoxes(labels), 512, 512))
+    canvas.tool = Superpixel(canvas, QtGui.QColor('#FF0000'))
+    return canvas
+
+
+def test_paint_superpixels(qapp):
+    canvas = superpixel_canvas()
+    tool = canvas.tool
+
+    tool.mousePressEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonPress, 10, 10))
+    for x in (30, 70, 100):
+        tool.mouseMoveEvent(mouse_event(canvas, QtCore.QEvent.MouseMove, x, 10))
+    tool.mouseReleaseEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonRelease, 100, 10))
+
+    items = Annotations.annotationItems(canvas.scene)
+    assert len(items) == 1
+    assert isinstance(items[0], FillItem)
+    assert items[0].boundingRect() == QtCore.QRectF(0, 0, 128, 64)
+    # superpixels added one by one are merged into the same runs as the whole selection
+    superpixel_map = canvas.superpixels.result()
+    labels = {superpixel_map.label(x, 10) for x in (10, 30, 70, 100)}
+    assert np.array_equal(items[0].runs, superpixel_map.runs(labels))
+    assert items[0].shape().contains(QtCore.QPointF(127.5, 63.5))
+    assert not items[0].shape().contains(QtCore.QPointF(128.5, 10))
+    canvas.undo_redo.undo(1)
+    assert Annotations.annotationItems(canvas.scene) == []
+
+
+def test_superpixels_not_ready(qapp):
+    canvas = superpixel_canvas(ready=False)
+    tool = canvas.tool
+
+    tool.mousePressEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonPress, 10, 10))
+    tool.mouseReleaseEvent(mouse_event(canvas, QtCore.QEvent.MouseButtonRelease, 10, 10))
+
+    assert Annotations.annotationItems(canvas.scene) == []
+    assert len(canvas.undo_redo.commands[0]) == 0
@@ -0,0 +1,55 @@
+from PyQt5 import QtCore, QtGui
+import pytest
+
+from dl_markup.Scene import Scene
+from dl_markup.TiledImageItem import TiledImageItem
+
+
+def create_image(path):
+    image = QtGui.QImage(1000, 600, QtGui.QImage.Format_RGB32)
+    image.fill(QtGui.QColor(255, 0, 0))
+    painter = QtGui.QPainter(image)
+    painter.fillRect(500, 0, 500, 600, QtGui.QColor(0, 0, 255))
+    painter.end()
+    image.save(path)
+
+
+def render(scene, width, height):
+    target = QtGui.QImage(width, height, QtGui.QImage.Format_RGB32)
+    painter = QtGui.QPainter(target)
+    scene.render(painter, QtCore.QRectF(0, 0, width, height))
+    painter.end()
+    return target
+
+
+@pytest.mark.parametrize('fmt', ['jpg', 'png'])
+def test_tiled_image(qapp, qtbot, tmp_path, fmt):
+    path = str(tmp_path / f'image.{fmt}')
+    create_image(path)
+    scene = Scene(0, 0, 512, 512)
+
+    scene.setTiledImage(path)
+    item = scene.img_item
+
+    assert item.levels == 2
+    assert scene.sceneRect() == QtCore.QRectF(0, 0, 1000, 600)
+    # overview is decoded in background thread
+    qtbot.waitUntil(lambda: render(scene, 1000, 600).pixelColor(800, 300).blue() > 0)
+    # it's painted while tiles are decoded
+    render(scene, 1000, 600)
+    qtbot.wait(200)
+    target = render(scene, 1000, 600)
+    assert target.pixelColor(100, 300).red() > 0
+    assert target.pixelColor(800, 300).blue() > 0
+    item.close()
+
+
+def test_refuse_large_image_without_clip_rect(qapp, tmp_path):
+    png_path = str(tmp_path / 'image.png')
+    jpg_path = str(tmp_path / 'image.jpg')
+    create_image(png_path)
+    create_image(jpg_path)
+
+    assert TiledImageItem.check(jpg_path, max_decode_bytes=1024)
+    with pytest.raises(ValueError):
+        TiledImageItem(png_path, max_decode_bytes=1024)
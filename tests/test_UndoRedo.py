@@ -1,3 +1,8 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from dl_markup.Scene import Scene
+from dl_markup.UndoRedo import UndoRedo
+
 from fixtures import scene_with_undo_redo
 
 
@@ -39,3 +44,106 @@ def test_redo_2(qapp, scene_with_undo_redo):
     assert len(scene.items()) == 2
     assert item_1 in scene.items()
     assert item_2 in scene.items()
+
+
+def test_modified(qapp, scene_with_undo_redo):
+    _, scene, undo_redo = scene_with_undo_redo
+
+    assert undo_redo.modified
+    undo_redo.mark_saved()
+    assert not undo_redo.modified
+
+    undo_redo.undo(1)
+    assert undo_redo.modified
+
+    # back to saved state
+    undo_redo.redo(1)
+    assert not undo_redo.modified
+
+
+def test_modified_after_clear(qapp, scene_with_undo_redo):
+    _, scene, undo_redo = scene_with_undo_redo
+    undo_redo.mark_saved()
+
+    undo_redo.clear()
+
+    assert undo_redo.modified
+
+
+def test_modified_changed_signal(qapp, scene_with_undo_redo):
+    _, scene, undo_redo = scene_with_undo_redo
+    undo_redo.mark_saved()
+    signals = []
+    undo_redo.modifiedChanged.connect(signals.append)
+
+    undo_redo.undo(1)
+    undo_redo.undo(1)
+    undo_redo.redo(2)
+
+    assert signals == [True, False]
+
+
+def test_max_commands(qapp, scene_with_undo_redo):
+    (item_1, item_2), scene, undo_redo = scene_with_undo_redo
+    undo_redo.max_commands = 1
+    item_3 = QtWidgets.QGraphicsRectItem(0, 0, 10, 10)
+
+    undo_redo.insert_in_undo_redo_add(item_3)
+    undo_redo.undo(3)
+
+    # only the last command is left in history
+    assert len(scene.items()) == 2
+    assert item_1 in scene.items()
+    assert item_2 in scene.items()
+
+
+def test_max_bytes(qapp, scene_with_undo_redo):
+    (item_1, item_2), scene, undo_redo = scene_with_undo_redo
+    polygon = QtGui.QPolygonF([QtCore.QPointF(i, i % 7) for i in range(1000)])
+    undo_redo.max_bytes = 3 * 16 * 1000
+
+    # vector items are counted by size of their geometry
+    for _ in range(3):
+        undo_redo.insert_in_undo_redo_add(QtWidgets.QGraphicsPolygonItem(polygon))
+    assert 2 * 16 * 1000 < undo_redo.history_bytes <= undo_redo.max_bytes
+    assert len(undo_redo.commands[0]) == 2
+
+    undo_redo.undo(5)
+    assert len(scene.items()) == 3
+    assert item_1 in scene.items()
+    assert item_2 in scene.items()
+
+
+def test_items_dropped(qapp, scene_with_undo_redo):
+    (item_1, item_2), scene, undo_redo = scene_with_undo_redo
+    dropped = []
+    undo_redo.itemsDropped.connect(dropped.extend)
+    item_3 = QtWidgets.QGraphicsRectItem(0, 0, 10, 10)
+    copy_1 = QtWidgets.QGraphicsRectItem(0, 0, 5, 5)
+
+    # undone item leaves history with redo
+    undo_redo.undo(1)
+    undo_redo.insert_in_undo_redo_add(item_3)
+    assert dropped == [item_2]
+
+    # replaced item leaves history, when command is flattened
+    undo_redo.max_commands = 1
+    undo_redo.insert_in_undo_redo_replace([(item_1, copy_1)])
+    assert dropped == [item_2]
+    undo_redo.insert_in_undo_redo_add(QtWidgets.QGraphicsRectItem(0, 0, 1, 1))
+    assert dropped == [item_2, item_1]
+
+
+def test_redo_restores_parent(qapp):
+    scene = Scene(0, 0, 512, 512)
+    undo_redo = UndoRedo(scene)
+    parent = QtWidgets.QGraphicsRectItem(0, 0, 100, 100)
+    scene.addItem(parent)
+    item = QtWidgets.QGraphicsEllipseItem(0, 0, 10, 10, parent)
+
+    undo_redo.insert_in_undo_redo_add(item)
+    undo_redo.undo(1)
+    assert item.scene() is None
+
+    undo_redo.redo(1)
+    assert item.parentItem() is parent
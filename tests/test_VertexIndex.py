@@ -0,0 +1,46 @@
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from dl_markup.VertexIndex import VertexIndex
+
+
+def polygon_item(scene, points):
+    item = QtWidgets.QGraphicsPolygonItem(QtGui.QPolygonF([QtCore.QPointF(x, y) for x, y in points]))
+    scene.addItem(item)
+    return item
+
+
+def test_nearest(qapp):
+    scene = QtWidgets.QGraphicsScene()
+    index = VertexIndex(cell_size=10.)
+    index.addItem(polygon_item(scene, [(5, 5), (50, 5), (50, 50)]))
+    index.addItem(polygon_item(scene, [(19, 5), (60, 60), (5, 60)]))
+    # stroke items are ignored
+    index.addItem(QtWidgets.QGraphicsRectItem(0, 0, 10, 10))
+    assert len(index) == 2
+
+    # the nearest vertex may be in neighbouring cell
+    assert index.nearest(QtCore.QPointF(11, 5), 8) == QtCore.QPointF(5, 5)
+    assert index.nearest(QtCore.QPointF(13, 5), 8) == QtCore.QPointF(19, 5)
+    assert index.nearest(QtCore.QPointF(30, 30), 8) is None
+    assert index.nearest(QtCore.QPointF(40, 40), 20) == QtCore.QPointF(50, 50)
+
+
+def test_removed_items_are_skipped(qapp):
+    scene = QtWidgets.QGraphicsScene()
+    index = VertexIndex()
+    first = polygon_item(scene, [(5, 5), (50, 5), (50, 50)])
+    second = polygon_item(scene, [(6, 6), (60, 60), (5, 60)])
+    index.addItems([first, second])
+
+    assert index.nearest(QtCore.QPointF(6, 6), 4) == QtCore.QPointF(6, 6)
+    # item removed from scene, e.g. by undo
+    scene.removeItem(second)
+    assert index.nearest(QtCore.QPointF(6, 6), 4) == QtCore.QPointF(5, 5)
+    scene.addItem(second)
+    assert index.nearest(QtCore.QPointF(6, 6), 4) == QtCore.QPointF(6, 6)
+
+    index.removeItem(second)
+    assert index.nearest(QtCore.QPointF(6, 6), 4) == QtCore.QPointF(5, 5)
+    index.clear()
+    assert len(index) == 0
+    assert index.nearest(QtCore.QPointF(6, 6), 4) is None